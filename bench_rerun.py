@@ -0,0 +1,44 @@
+"""Benchmark der Rerun-Latenz der Streamlit-App
+
+Führt die App headless über Streamlits AppTest aus und misst, wie lange ein
+Rerun ohne laufenden Download dauert.
+
+Aufruf: python bench_rerun.py [anzahl_reruns]
+"""
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from main import RERUN_BUDGET_MS
+
+
+def summarize(name, durations_ms):
+    """Gib p50/p95/max einer Messreihe aus"""
+    durations_ms = sorted(durations_ms)
+    p50 = durations_ms[len(durations_ms) // 2]
+    p95 = durations_ms[min(len(durations_ms) - 1, int(len(durations_ms) * 0.95))]
+    status = "OK" if p95 <= RERUN_BUDGET_MS else "ÜBER BUDGET"
+    print(f"{name:<20} n={len(durations_ms):<4} p50={p50:7.1f}ms  p95={p95:7.1f}ms  "
+          f"max={durations_ms[-1]:7.1f}ms  [{status}, Budget {RERUN_BUDGET_MS}ms]")
+
+
+def timed_run(app):
+    start = time.perf_counter()
+    app.run()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    app = AppTest.from_file("main.py", default_timeout=60)
+    cold = timed_run(app)
+    print(f"Kaltstart: {cold:.1f}ms")
+
+    # Leerlauf: Rerun ohne Eingabe (z.B. Klick auf ein Widget ohne Wirkung)
+    summarize("Leerlauf-Rerun", [timed_run(app) for _ in range(runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,34 @@ import time
 import re
 import threading
 from queue import Queue
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, quote
+import urllib.request
 import base64
 import hashlib
 from datetime import datetime, timedelta
-import resource
+from collections import deque
 import gc
+import shutil
 import sys
+import argparse
+import json
+import uuid
+import socket
+import sqlite3
+import signal
+import hmac
+import ipaddress
+import functools
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import zipfile
-import io
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import itertools
+import random
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # ===== SICHERHEITSKONFIGURATION =====
 MAX_DOWNLOADS_PER_IP = 10  # Max Downloads pro IP pro Stunde
@@ -28,26 +46,167 @@ MAX_PLAYLIST_SIZE = 50  # Max Playlist-Größe
 MAX_MIX_SIZE = 150  # Max Mix-Größe
 RATE_LIMIT_SECONDS = 40 # Mindestabstand zwischen Downloads
 MAX_ZIP_SIZE_MB = 50  # Max ZIP-Größe für automatischen Download
+SELECTION_PAGE_SIZE = 50  # Zeilen pro Seite in der Titelauswahl
+PLAYLIST_PAGE_SIZE = 10  # Einträge pro Seite beim Playlist-Streaming
+HEDGE_DELAY_SECONDS = 3  # Verzögerung bis zum Start der nächsten URL-Variante
+ESTIMATED_MP3_KBPS = 245  # Mittlere MP3-Bitrate (VBR V0) für Größenschätzungen
+SIZE_REJECT_TOLERANCE = 1.1  # Vorab-Ablehnung erst ab 10% über dem Limit (Schätzung ist ungenau)
+
+# YT-DLP NETZWERK
+YTDLP_SOCKET_TIMEOUT_SECONDS = 45  # Socket-Timeout bei Downloads und Mix-Extraktion
+YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS = 30  # Socket-Timeout bei Metadaten und flachen Playlist-Abfragen
+YTDLP_RETRIES = 5  # retries/fragment_retries beim Download
+
+# LAUFZEIT-KONFIGURATION (typisiert, aus Umgebung/Datei, Hot-Reload ohne Neustart)
+CONFIG_FILE_PATH = os.environ.get('YTAC_CONFIG_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ytac_config.json'))  # JSON-Datei mit Limits
+CONFIG_ENV_PREFIX = 'YTAC_'  # Umgebungsvariablen wie YTAC_MAX_PLAYLIST_SIZE=100
+ADMIN_TOKEN = os.environ.get('YTAC_ADMIN_TOKEN', '')  # Bearer-Token der Admin-Endpunkte (leer: deaktiviert)
+
+# LAUFZEIT KONFIGURATION
+HOUSEKEEPING_INTERVAL_SECONDS = 300  # Intervall der Hintergrund-Bereinigung
+RERUN_BUDGET_MS = 250  # Zielzeit für einen Streamlit-Rerun ohne Download
+
+# RESSOURCEN-GOVERNOR (Schwellen mit Hysterese)
+RESOURCE_SAMPLE_SECONDS = 2  # Abtastintervall der Live-Metriken
+MAX_PROCESS_RSS_MB = 500  # Aktueller RSS des Prozesses
+MIN_TEMP_FREE_MB = 1024  # Freier Platz im Temp-Dateisystem
+MAX_LOAD_PER_CPU = 2.0  # Load Average (1 min) pro CPU-Kern
+MAX_FFMPEG_CPU_PERCENT = 90  # CPU-Last der FFmpeg-Kindprozesse pro Kern
+RESOURCE_RESUME_RATIO = 0.8  # Wieder freigeben erst bei 80% der Schwelle
+
+# PLAYER-CLIENTS (adaptive Reihenfolge mit Circuit Breaker)
+DEFAULT_PLAYER_CLIENTS = ['web', 'web_embedded', 'ios', 'tv', 'web_creator', 'android']  # Startreihenfolge für Downloads
+FLAT_PLAYER_CLIENTS = ['web', 'android']  # Startreihenfolge für flache Playlist-Extraktion
+CLIENT_WINDOW_SECONDS = 900  # Gleitendes Fenster der Erfolgsstatistik
+CLIENT_WINDOW_MAX_EVENTS = 200  # Max. gespeicherte Ergebnisse pro Client
+CLIENT_BREAKER_FAILURES = 3  # Aufeinanderfolgende Fehler bis der Client gesperrt wird
+CLIENT_BREAKER_COOLDOWN_SECONDS = 300  # Sperrdauer bis zum Probe-Versuch (half-open)
+CLIENT_LATENCY_PENALTY_SECONDS = 60  # Latenz, die den Score um 0.1 senkt
+
+# RETRY-STRATEGIE (Fehlerklassen, Backoff, Budgets)
+RETRY_MAX_ATTEMPTS_PER_JOB = 6  # Max. Versuche pro Video über alle Formate
+RETRY_MAX_TRANSIENT_PER_JOB = 3  # Max. Wiederholungen bei vorübergehenden Fehlern pro Video
+RETRY_BASE_DELAY_SECONDS = 2  # Basis für exponentiellen Backoff
+RETRY_MAX_DELAY_SECONDS = 30  # Obergrenze einer Wartezeit
+RETRY_GLOBAL_BUDGET = 30  # Max. Wiederholungen prozessweit im Fenster
+RETRY_GLOBAL_WINDOW_SECONDS = 300  # Fenster des globalen Retry-Budgets
+
+# NEGATIV-CACHE (bekannt nicht ladbare Videos, TTL je nach Grund)
+NEGATIVE_CACHE_TTL_PRIVATE = 1800  # Privat - kann jederzeit wieder freigegeben werden
+NEGATIVE_CACHE_TTL_UNAVAILABLE = 3600  # Entfernt/nicht verfügbar
+NEGATIVE_CACHE_TTL_RESTRICTED = 3600  # Altersfreigabe, Mitglieder, Ländersperre
+NEGATIVE_CACHE_TTL_TOO_LONG = 21600  # Länger als MAX_VIDEO_DURATION
+NEGATIVE_CACHE_MAX_ENTRIES = 5000  # Max. Einträge im Speicher
+
+# VORSCHAU-CLIPS (kurzer Anfang per Range-Request, eigener Cache und eigene Plätze)
+PREVIEW_SECONDS = 30  # Länge einer Vorschau
+PREVIEW_BITRATE_KBPS = 64  # Bitrate der Vorschau-MP3
+PREVIEW_FETCH_MARGIN_SECONDS = 10  # Zusätzlich geladene Sekunden (Container-Header, VBR)
+PREVIEW_SOURCE_DEFAULT_KBPS = 160  # Angenommene Quellbitrate ohne Formatangabe
+PREVIEW_CACHE_TTL_SECONDS = 900  # Aufbewahrung erzeugter Vorschauen
+PREVIEW_CACHE_MAX_ENTRIES = 200  # Max. Vorschauen im Speicher (je ca. 240 KB)
+PREVIEW_MAX_ACTIVE = 4  # Max. gleichzeitig erzeugte Vorschauen (unabhängig von Download-Plätzen)
+PREVIEW_TIMEOUT_SECONDS = 30  # Abbruch von Abruf bzw. FFmpeg
+MAX_PREVIEWS_PER_IP = 30  # Neu erzeugte Vorschauen pro IP pro Stunde (Cache-Treffer zählen nicht)
+
+# VERTEILTER WORKER-MODUS
+DISTRIBUTED_MODE = False  # Tracks über die gemeinsame Queue an Worker-Prozesse verteilen
+QUEUE_DB_PATH = os.path.join(tempfile.gettempdir(), 'ytac_queue.sqlite3')  # Gemeinsame SQLite-Queue
+SHARED_RESULTS_DIR = os.path.join(tempfile.gettempdir(), 'ytac_results')  # Gemeinsamer Ergebnisspeicher
+JOB_LEASE_SECONDS = 120  # Lease-Dauer; ohne Heartbeat wird der Job neu vergeben
+WORKER_HEARTBEAT_SECONDS = 15  # Heartbeat-Intervall der Worker
+JOB_MAX_ATTEMPTS = 3  # Max. Zustellversuche pro Job
+WORKER_POLL_SECONDS = 2  # Wartezeit eines Workers bei leerer Queue
+JOB_WAIT_TIMEOUT_SECONDS = 1800  # Max. Wartezeit der UI auf ein Queue-Ergebnis
+QUEUE_RETENTION_SECONDS = 86400  # Abgeschlossene Jobs nach 24h entfernen
+
+# ABBRUCH (Cancel-Button, Verbindungsabbruch, API)
+CANCEL_POLL_SECONDS = 0.25  # Prüfintervall beim Warten auf FFmpeg und in der Session-Überwachung
+CANCEL_DISCONNECT_GRACE_SECONDS = 1  # Getrennte Sessions gelten erst danach als verlassen
+FFMPEG_TIMEOUT_SECONDS = 600  # Obergrenze für eine einzelne FFmpeg-Konvertierung
+
+# WATCHDOG (Deadline je Pipeline-Phase, Stillstandserkennung über Heartbeats)
+STAGE_DEADLINE_EXTRACT_SECONDS = 120  # Metadaten/Formatliste von YouTube holen
+STAGE_DEADLINE_FETCH_SECONDS = 300  # Audiospur übertragen
+STAGE_DEADLINE_TRANSCODE_SECONDS = 300  # FFmpeg-Konvertierung zu MP3
+STAGE_DEADLINE_ARCHIVE_SECONDS = 120  # Track in ZIP schreiben
+STAGE_STALL_SECONDS = 60  # Übertragung ohne Fortschritt gilt danach als hängend
+UI_JOB_POLL_SECONDS = 1  # Aktualisierung von Fortschritt und Abbrechen-Knopf laufender UI-Jobs
+
+# BATCH-CHECKPOINTS (fertige Tracks überleben Abbruch, Neustart und Reconnect)
+BATCH_CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), 'ytac_checkpoints')  # Journal und fertige MP3s je Batch
+BATCH_CHECKPOINT_TTL_SECONDS = 21600  # Unvollständige Checkpoints nach 6h ohne Fortschritt entfernen
+UI_RESULT_TTL_SECONDS = 3600  # Fertige ZIP-Teile der UI bleiben so lange abrufbar (danach Haushaltung)
+
+# INKREMENTELLER PLAYLIST-SYNC (Batch-CLI)
+SYNC_MANIFEST_DIRNAME = '.ytac_sync'  # Unterordner des Ausgabeverzeichnisses mit einem Manifest je Playlist-ID
+
+# FAIR-SHARE-SCHEDULER (serverweiter Download-Pool, Vergabe je Track)
+DOWNLOAD_POOL_SIZE = 4  # Startwert gleichzeitiger Track-Downloads im Prozess (UI und API zusammen)
+SMALL_SELECTION_MAX_TRACKS = 10  # Auswahl bis zu dieser Größe läuft als kleine Auswahl
+SCHEDULER_AGING_SECONDS = 120  # Wartende steigen danach eine Prioritätsklasse auf (kein Verhungern)
+SCHEDULER_WAIT_SAMPLES = 200  # Gespeicherte Wartezeiten je Klasse für das p95
+SCHEDULER_OWNER_TTL_SECONDS = 3600  # Fairness-Historie inaktiver Sessions/IPs verwerfen
+
+# ADAPTIVE PARALLELITÄT (AIMD auf der Poolgröße, ausgewertet je Messfenster)
+ADAPTIVE_MIN_CONCURRENCY = 1  # Untergrenze der Poolgröße
+ADAPTIVE_MAX_CONCURRENCY = 12  # Obergrenze der Poolgröße
+ADAPTIVE_WINDOW_SECONDS = 30  # Länge eines Messfensters
+ADAPTIVE_MIN_SAMPLES = 3  # Fertige Tracks pro Fenster, bevor ohne Drosselung entschieden wird
+ADAPTIVE_THROTTLE_RATIO = 0.1  # Anteil 403/429-Fehler, ab dem multiplikativ gesenkt wird
+ADAPTIVE_BACKOFF_FACTOR = 0.7  # Multiplikator beim Absenken
+ADAPTIVE_LATENCY_TOLERANCE = 1.5  # Track-Durchsatz darf so weit unter die Basislinie fallen
+ADAPTIVE_QUEUE_WAIT_SECONDS = 2  # Wartezeit, ab der der Pool als ausgelastet gilt (Bedarf für mehr Plätze)
+
+# PROFILING (opt-in je Job, Artefakte unter PROFILE_DIR/<Job-ID>)
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'ytac_profiles')  # Ablage der Profile
+PROFILE_SLOW_SECONDS = 0  # Jobs mit Stichproben-Profil; gespeichert nur, wenn länger (0: aus)
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.02  # Abtastintervall des Stichproben-Profilers
+PROFILE_TRACEMALLOC_FRAMES = 10  # Stacktiefe der tracemalloc-Aufzeichnung
+PROFILE_TOP_ENTRIES = 40  # Zeilen in den Textberichten
+PROFILE_RETENTION_SECONDS = 86400  # Profile nach 24h entfernen
 
 # SERVER KONFIGURATION
 DEFAULT_PORT = 8501
 DEFAULT_HOST = "0.0.0.0"
+API_ENABLED = True  # JSON-API neben der UI starten
+API_HOST = "127.0.0.1"  # Bind-Adresse der JSON-API (öffentlich nur hinter Proxy bzw. mit API_TOKEN)
+API_PORT = 8502  # Port der JSON-API
+API_TOKEN = os.environ.get('YTAC_API_TOKEN', '')  # Bearer-Token für Job-Endpunkte (leer: nur lokale Clients)
+API_TRUSTED_PROXIES = ()  # Direkte Peers, deren X-Forwarded-For übernommen wird, z. B. ('127.0.0.1',)
+API_RESULT_TTL_SECONDS = 1800  # Aufbewahrung fertiger API-Ergebnisse
+API_MAX_BODY_BYTES = 65536  # Max. Größe eines API-Requests
+API_MAX_RUNNING_JOBS = 16  # API-Jobs gleichzeitig in Bearbeitung (Tracks teilt der Scheduler zu)
+API_PUBLIC_URL = ""  # Öffentliche Basis-URL der API für den Browser (leer: gleicher Host, Port API_PORT; hinter einem Reverse-Proxy Pflicht)
+STREAM_CHUNK_BYTES = 16384  # Blockgröße der progressiven MP3-Auslieferung
+STREAM_TICKET_TTL_SECONDS = 600  # Gültigkeit eines Stream-Tickets aus der UI
+STREAM_TICKET_MAX_USES = 3  # Max. Abrufe pro Ticket (Player + Speichern)
+STREAM_MAX_ACTIVE = 6  # Max. gleichzeitige Streams pro Prozess
 
-# Globale Variablen für Rate Limiting
-if 'download_queue' not in st.session_state:
-    st.session_state.download_queue = {}
-if 'ip_downloads' not in st.session_state:
-    st.session_state.ip_downloads = {}
-if 'active_downloads' not in st.session_state:
-    st.session_state.active_downloads = 0
-if 'last_download_time' not in st.session_state:
-    st.session_state.last_download_time = {}
-if 'playlist_videos' not in st.session_state:
-    st.session_state.playlist_videos = []
-if 'selected_videos' not in st.session_state:
-    st.session_state.selected_videos = []
-if 'batch_download_in_progress' not in st.session_state:
-    st.session_state.batch_download_in_progress = False
+def has_streamlit_context():
+    """Läuft der aktuelle Thread innerhalb eines Streamlit-Skriptlaufs?"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except Exception:
+        return False
+
+# Globale Variablen für Rate Limiting (nur im Streamlit-Lauf, nicht headless)
+if has_streamlit_context():
+    if 'download_queue' not in st.session_state:
+        st.session_state.download_queue = {}
+    if 'active_downloads' not in st.session_state:
+        st.session_state.active_downloads = 0
+    if 'playlist_videos' not in st.session_state:
+        st.session_state.playlist_videos = []
+    if 'selected_videos' not in st.session_state:
+        st.session_state.selected_videos = set()
+    if 'batch_download_in_progress' not in st.session_state:
+        st.session_state.batch_download_in_progress = False
+    if 'playlist_stream' not in st.session_state:
+        st.session_state.playlist_stream = None
+    if 'playlist_dropped' not in st.session_state:
+        st.session_state.playlist_dropped = []
 
 # ===== WERBEPLATZHALTER (VERSTECKT) =====
 AD_SLOT_HEADER = """
@@ -104,6 +263,125 @@ AD_SLOT_FOOTER = """
 -->
 """
 
+# Analytics (versteckt)
+ANALYTICS_SNIPPET = """
+<script>
+// Google Analytics / Tracking Code hier einfügen
+// gtag('config', 'GA_MEASUREMENT_ID');
+
+function trackDownload(filename) {
+    // Analytics Event
+}
+
+function trackPlaylistDownload(count) {
+    // Playlist Download Tracking
+}
+
+function trackMixDownload(count) {
+    // Mix Download Tracking
+}
+
+function trackAdClick(slot) {
+    // Ad Click Tracking
+}
+
+function trackSpecialUrlConversion(type) {
+    // Track special URL conversions
+}
+</script>
+"""
+
+# CSS zum Verstecken des Deploy Buttons, Menüs und Streamlit Branding
+HIDE_STREAMLIT_STYLE = """
+<style>
+.stDeployButton {
+    display: none !important;
+}
+
+header[data-testid="stHeader"] {
+    display: none !important;
+}
+
+[data-testid="stToolbar"] {
+    display: none !important;
+}
+
+.stAppHeader {
+    display: none !important;
+}
+
+footer {
+    visibility: hidden !important;
+    height: 0% !important;
+}
+
+#MainMenu {
+    visibility: hidden !important;
+}
+
+.stAppFooter {
+    display: none !important;
+}
+
+[data-testid="stDecoration"] {
+    display: none !important;
+}
+
+[data-testid="stStatusWidget"] {
+    display: none !important;
+}
+
+.viewerBadge_container__1QSob {
+    display: none !important;
+}
+
+.stAppViewContainer > .main .block-container {
+    padding-top: 1rem !important;
+}
+
+.stActionButton {
+    display: none !important;
+}
+
+.video-item {
+    border: 1px solid #ddd;
+    border-radius: 8px;
+    padding: 10px;
+    margin: 5px 0;
+    background-color: #f9f9f9;
+}
+
+.selected-video {
+    background-color: #e3f2fd !important;
+    border-color: #2196f3 !important;
+}
+
+.download-section {
+    background-color: #f0f8ff;
+    padding: 20px;
+    border-radius: 10px;
+    border: 2px solid #4CAF50;
+    margin: 20px 0;
+}
+
+.special-url-info {
+    background-color: #fff3cd;
+    padding: 15px;
+    border-radius: 8px;
+    border-left: 4px solid #ffc107;
+    margin: 15px 0;
+}
+
+.mix-info {
+    background-color: #e8f5e8;
+    padding: 15px;
+    border-radius: 8px;
+    border-left: 4px solid #28a745;
+    margin: 15px 0;
+}
+</style>
+"""
+
 def get_client_ip():
     """Hole Client IP für Rate Limiting"""
     try:
@@ -115,6 +393,29 @@ def get_client_ip():
     except:
         return 'unknown'
 
+def get_client_key():
+    """Schlüssel für IP-Limits und Fair-Share: die Client-IP, ohne erkennbare IP
+    (kein X-Forwarded-For, Streamlit ohne st.context) die Session - sonst teilten
+    sich alle Besucher den Eimer 'unknown'."""
+    client_ip = get_client_ip()
+    return client_ip if client_ip != 'unknown' else f"session:{get_session_id()}"
+
+def is_admin_viewer():
+    """Admin in der UI: einmal die App-URL mit ?admin=<YTAC_ADMIN_TOKEN> öffnen.
+    Das Token wird danach aus der URL entfernt und gilt für die Session."""
+    if not ADMIN_TOKEN:
+        return False
+    if st.session_state.get('is_admin'):
+        return True
+    token = st.query_params.get('admin', '') if hasattr(st, 'query_params') else ''
+    if not token:
+        return False
+    del st.query_params['admin']
+    if hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        st.session_state.is_admin = True
+        return True
+    return False
+
 def get_session_id():
     """Erstelle Session ID"""
     try:
@@ -122,193 +423,1817 @@ def get_session_id():
     except:
         return 'default'
 
-def check_system_resources():
-    """Überprüfe Systemressourcen ohne psutil"""
+# ===== METRIKEN =====
+@st.cache_resource(show_spinner=False)
+def get_metrics_registry():
+    """Prozessweite Gauges und Counter"""
+    return {
+        'lock': threading.Lock(),
+        'gauges': {},
+        'counters': {}
+    }
+
+def set_gauge(name, value):
+    """Setze einen Messwert (letzter Wert gewinnt)"""
+    registry = get_metrics_registry()
+    with registry['lock']:
+        registry['gauges'][name] = value
+
+def inc_counter(name, amount=1):
+    """Erhöhe einen monotonen Zähler"""
+    registry = get_metrics_registry()
+    with registry['lock']:
+        registry['counters'][name] = registry['counters'].get(name, 0) + amount
+
+def get_metrics_snapshot():
+    """Kopie aller aktuellen Gauges und Counter"""
+    registry = get_metrics_registry()
+    with registry['lock']:
+        return {'gauges': dict(registry['gauges']), 'counters': dict(registry['counters'])}
+
+def render_metrics_text():
+    """Metriken im Prometheus-Textformat"""
+    snapshot = get_metrics_snapshot()
+    lines = []
+    typed = set()
+    for kind, values in (('gauge', snapshot['gauges']), ('counter', snapshot['counters'])):
+        for name, value in sorted(values.items()):
+            if value is None:
+                continue
+            # Gelabelte Metriken (name{label="x"}) teilen sich eine TYPE-Zeile
+            base_name = name.split('{', 1)[0]
+            if base_name not in typed:
+                typed.add(base_name)
+                lines.append(f"# TYPE {base_name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# ===== LAUFZEIT-KONFIGURATION =====
+# Zur Laufzeit änderbare Limits: Name -> (Typ, Minimum, Maximum). Default ist die gleichnamige Konstante
+RUNTIME_SETTINGS = {
+    'MAX_CONCURRENT_DOWNLOADS': (int, 1, 50),
+    'MAX_FILE_SIZE_MB': (int, 1, 2000),
+    'MAX_PLAYLIST_SIZE': (int, 1, 5000),
+    'MAX_MIX_SIZE': (int, 1, 5000),
+    'RATE_LIMIT_SECONDS': (int, 0, 3600),
+    'MAX_ZIP_SIZE_MB': (int, 1, 4000),
+    'YTDLP_SOCKET_TIMEOUT_SECONDS': (int, 1, 600),
+    'YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS': (int, 1, 600),
+    'YTDLP_RETRIES': (int, 0, 50),
+    'DOWNLOAD_POOL_SIZE': (int, 1, 64),
+    'ADAPTIVE_MIN_CONCURRENCY': (int, 1, 64),
+    'ADAPTIVE_MAX_CONCURRENCY': (int, 1, 64),
+    'PROFILE_SLOW_SECONDS': (int, 0, 86400)
+}
+# Einstellungen, deren Änderung sofort auf den Download-Pool wirkt
+POOL_SETTINGS = ('DOWNLOAD_POOL_SIZE', 'ADAPTIVE_MIN_CONCURRENCY', 'ADAPTIVE_MAX_CONCURRENCY')
+
+@st.cache_resource(show_spinner=False)
+def get_runtime_config():
+    """Prozessweite Konfiguration (Umgebung/Datei/Admin-API), beim ersten Zugriff geladen"""
+    config = {
+        'lock': threading.Lock(),
+        'loaded': {},
+        'loaded_sources': {},
+        'overrides': {},
+        'values': {},
+        'sources': {},
+        'generation': 0,
+        'loaded_at': None,
+        'file_mtime': None
+    }
+    loaded, sources, errors, mtime = read_config_sources()
+    if errors:
+        print(f"Konfiguration ungültig, verwende Defaults: {'; '.join(errors)}")
+    else:
+        _commit_runtime_config(config, loaded, sources, {}, mtime)
+    return config
+
+def get_setting(name):
+    """Aktueller Wert einer Laufzeit-Einstellung (Default: gleichnamige Konstante)"""
+    return get_runtime_config()['values'].get(name, globals()[name])
+
+def coerce_setting(name, raw):
+    """Rohwert aus Umgebung, Datei oder API in den Typ der Einstellung wandeln und prüfen"""
+    kind, minimum, maximum = RUNTIME_SETTINGS[name]
+    if isinstance(raw, bool) or (isinstance(raw, float) and not raw.is_integer()):
+        raise ValueError("ganze Zahl erwartet")
+    try:
+        value = kind(raw.strip() if isinstance(raw, str) else raw)
+    except (TypeError, ValueError):
+        raise ValueError("ganze Zahl erwartet")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"erlaubt sind {minimum} bis {maximum}")
+    return value
+
+def read_config_sources():
+    """Umgebung (YTAC_<NAME>) und Konfigurationsdatei lesen; die Datei hat Vorrang.
+    
+    Liefert (werte, quellen, fehler, datei_mtime). Bei Fehlern soll der Aufrufer
+    nichts übernehmen - halb gültige Konfigurationen werden nie aktiv.
+    """
+    values, sources, errors = {}, {}, []
+    for name in RUNTIME_SETTINGS:
+        raw = os.environ.get(CONFIG_ENV_PREFIX + name)
+        if raw is None:
+            continue
+        try:
+            values[name] = coerce_setting(name, raw)
+            sources[name] = 'env'
+        except ValueError as e:
+            errors.append(f"{CONFIG_ENV_PREFIX}{name}: {str(e)}")
+    
+    mtime = None
+    if os.path.exists(CONFIG_FILE_PATH):
+        try:
+            mtime = os.path.getmtime(CONFIG_FILE_PATH)
+            with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("JSON-Objekt erwartet")
+        except (OSError, ValueError) as e:
+            errors.append(f"{CONFIG_FILE_PATH}: {str(e)}")
+            data = {}
+        for key, raw in data.items():
+            name = str(key).upper()
+            if name not in RUNTIME_SETTINGS:
+                errors.append(f"{CONFIG_FILE_PATH}: unbekannte Einstellung '{key}'")
+                continue
+            try:
+                values[name] = coerce_setting(name, raw)
+                sources[name] = 'file'
+            except ValueError as e:
+                errors.append(f"{CONFIG_FILE_PATH}: {name}: {str(e)}")
+    return values, sources, errors, mtime
+
+def _commit_runtime_config(config, loaded, loaded_sources, overrides, mtime):
+    """Neue Werte übernehmen (Lock muss gehalten werden). Liefert (änderungen, fehler)"""
+    values = {**loaded, **overrides}
+    low = values.get('ADAPTIVE_MIN_CONCURRENCY', ADAPTIVE_MIN_CONCURRENCY)
+    high = values.get('ADAPTIVE_MAX_CONCURRENCY', ADAPTIVE_MAX_CONCURRENCY)
+    if low > high:
+        return {}, [f"ADAPTIVE_MIN_CONCURRENCY ({low}) größer als ADAPTIVE_MAX_CONCURRENCY ({high})"]
+    
+    changes = {}
+    for name in RUNTIME_SETTINGS:
+        old = config['values'].get(name, globals()[name])
+        new = values.get(name, globals()[name])
+        if old != new:
+            changes[name] = {'old': old, 'new': new}
+    config['loaded'], config['loaded_sources'] = loaded, loaded_sources
+    config['overrides'] = overrides
+    config['values'] = values
+    config['sources'] = {**loaded_sources, **{name: 'api' for name in overrides}}
+    config['generation'] += 1
+    config['loaded_at'] = time.time()
+    config['file_mtime'] = mtime
+    set_gauge('ytac_config_generation', config['generation'])
+    return changes, []
+
+def _apply_config_changes(changes):
+    """Geänderte Werte bekanntgeben; Poolgrößen wirken sofort, laufende Tracks behalten ihren Platz"""
+    if not changes:
+        return
+    print("Konfiguration geändert: " + ", ".join(
+        f"{name} {change['old']} -> {change['new']}" for name, change in sorted(changes.items())
+    ))
+    inc_counter('ytac_config_reloads_total')
+    if not any(name in changes for name in POOL_SETTINGS):
+        return
+    scheduler = get_track_scheduler()
+    with scheduler['lock']:
+        capacity = scheduler['capacity']
+        if 'DOWNLOAD_POOL_SIZE' in changes:
+            capacity = changes['DOWNLOAD_POOL_SIZE']['new']
+        scheduler['capacity'] = max(get_setting('ADAPTIVE_MIN_CONCURRENCY'), min(get_setting('ADAPTIVE_MAX_CONCURRENCY'), capacity))
+        _dispatch_track_slots(scheduler)
+
+def reload_runtime_config():
+    """Umgebung und Datei neu einlesen (Admin-API, SIGHUP, Dateiänderung).
+    
+    API-Overrides bleiben erhalten. Liefert (änderungen, fehler); bei Fehlern
+    bleibt die bisherige Konfiguration vollständig aktiv.
+    """
+    loaded, sources, errors, mtime = read_config_sources()
+    config = get_runtime_config()
+    with config['lock']:
+        if not errors:
+            changes, errors = _commit_runtime_config(config, loaded, sources, dict(config['overrides']), mtime)
+    if errors:
+        print(f"Konfiguration nicht neu geladen: {'; '.join(errors)}")
+        inc_counter('ytac_config_reload_errors_total')
+        return {}, errors
+    _apply_config_changes(changes)
+    return changes, []
+
+def set_runtime_overrides(updates):
+    """Einstellungen über die Admin-API setzen (None entfernt den Override).
+    
+    Overrides haben Vorrang vor Umgebung und Datei. Liefert (änderungen, fehler).
+    """
+    errors = []
+    config = get_runtime_config()
+    with config['lock']:
+        overrides = dict(config['overrides'])
+        for key, raw in updates.items():
+            name = str(key).upper()
+            if name not in RUNTIME_SETTINGS:
+                errors.append(f"unbekannte Einstellung '{key}'")
+            elif raw is None:
+                overrides.pop(name, None)
+            else:
+                try:
+                    overrides[name] = coerce_setting(name, raw)
+                except ValueError as e:
+                    errors.append(f"{name}: {str(e)}")
+        if not errors:
+            changes, errors = _commit_runtime_config(
+                config, config['loaded'], config['loaded_sources'], overrides, config['file_mtime']
+            )
+    if errors:
+        return {}, errors
+    _apply_config_changes(changes)
+    return changes, []
+
+def reload_runtime_config_if_changed():
+    """Konfigurationsdatei bei geändertem Zeitstempel neu laden (Haushaltung)"""
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE_PATH)
+    except OSError:
+        mtime = None
+    if mtime != get_runtime_config()['file_mtime']:
+        reload_runtime_config()
+
+def describe_runtime_config():
+    """Sicht der Admin-API: Werte, Defaults, Grenzen und Herkunft jeder Einstellung"""
+    config = get_runtime_config()
+    with config['lock']:
+        values, sources = dict(config['values']), dict(config['sources'])
+        generation, loaded_at = config['generation'], config['loaded_at']
+    return {
+        'generation': generation,
+        'loaded_at': loaded_at,
+        'config_file': CONFIG_FILE_PATH,
+        'settings': {
+            name: {
+                'value': values.get(name, globals()[name]),
+                'default': globals()[name],
+                'min': minimum,
+                'max': maximum,
+                'source': sources.get(name, 'default')
+            }
+            for name, (_, minimum, maximum) in RUNTIME_SETTINGS.items()
+        }
+    }
+
+def install_config_reload_signal():
+    """SIGHUP lädt die Konfiguration neu. Nur aus dem Hauptthread möglich
+    (Batch, Worker, reine API) - unter Streamlit greifen Admin-API und Dateiänderung."""
+    if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+        return False
+    
+    def on_sighup(signum, frame):
+        # Nicht im Signal-Handler selbst laden - der Hauptthread könnte gerade den Lock halten
+        threading.Thread(target=reload_runtime_config, name='config-reload', daemon=True).start()
+    
+    signal.signal(signal.SIGHUP, on_sighup)
+    return True
+
+# ===== RESSOURCEN-GOVERNOR =====
+def read_process_rss_mb():
+    """Aktueller (nicht Spitzen-) RSS des Prozesses aus /proc/self/statm"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_temp_free_mb():
+    """Freier Platz im Dateisystem des Temp-Verzeichnisses"""
+    try:
+        return shutil.disk_usage(tempfile.gettempdir()).free / (1024 * 1024)
+    except OSError:
+        return None
+
+def read_load_per_cpu():
+    """1-Minuten Load Average normiert auf die Anzahl CPU-Kerne"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+def read_child_ffmpeg_cpu_ticks():
+    """CPU-Ticks (utime+stime) aller direkten FFmpeg-Kindprozesse"""
+    ticks = {}
+    own_pid = os.getpid()
     try:
-        # Memory Check mit resource module (nur Linux/Unix)
+        pids = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return None
+    
+    for pid in pids:
         try:
-            import resource
-            max_memory = resource.getrlimit(resource.RLIMIT_AS)[0]
-            if max_memory != resource.RLIM_INFINITY:
-                current_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-                # Konvertierung je nach System (Linux: KB, macOS: Bytes)
-                if current_memory > 1000000:  # Wahrscheinlich Bytes
-                    current_memory_mb = current_memory / (1024 * 1024)
-                else:  # Wahrscheinlich KB
-                    current_memory_mb = current_memory / 1024
-                
-                if current_memory_mb > 500:  # 500MB Limit
-                    return False, f"Speicher-Limit erreicht ({current_memory_mb:.1f}MB)"
-        except:
-            pass
+            with open(f'/proc/{pid}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue  # Prozess bereits beendet
+        
+        # Format: pid (comm) state ppid ... utime stime ...
+        comm = stat[stat.index('(') + 1:stat.rindex(')')]
+        fields = stat[stat.rindex(')') + 2:].split()
+        if int(fields[1]) == own_pid and comm.startswith(('ffmpeg', 'ffprobe')):
+            ticks[int(pid)] = int(fields[11]) + int(fields[12])
+    return ticks
+
+def sample_resources(governor):
+    """Ein Messdurchlauf: Werte lesen, Hysterese anwenden, Metriken setzen"""
+    now = time.monotonic()
+    ffmpeg_ticks = read_child_ffmpeg_cpu_ticks()
+    
+    ffmpeg_cpu_percent = None
+    if ffmpeg_ticks is not None:
+        elapsed = now - governor['last_sample']
+        previous = governor['last_ffmpeg_ticks']
+        used_ticks = sum(t - previous.get(pid, t) for pid, t in ffmpeg_ticks.items())
+        if elapsed > 0:
+            cores = os.cpu_count() or 1
+            ffmpeg_cpu_percent = used_ticks / os.sysconf('SC_CLK_TCK') / elapsed / cores * 100
+    
+    readings = {
+        'process_rss_mb': read_process_rss_mb(),
+        'temp_free_mb': read_temp_free_mb(),
+        'load_per_cpu': read_load_per_cpu(),
+        'ffmpeg_processes': len(ffmpeg_ticks) if ffmpeg_ticks is not None else None,
+        'ffmpeg_cpu_percent': ffmpeg_cpu_percent
+    }
+    
+    # (Name, Wert, Schwelle, größer_ist_schlechter, Meldung)
+    checks = [
+        ('process_rss_mb', readings['process_rss_mb'], MAX_PROCESS_RSS_MB, True, "Speicher-Limit erreicht ({:.1f}MB)"),
+        ('temp_free_mb', readings['temp_free_mb'], MIN_TEMP_FREE_MB, False, "Zu wenig freier Speicherplatz ({:.0f}MB)"),
+        ('load_per_cpu', readings['load_per_cpu'], MAX_LOAD_PER_CPU, True, "Server-Last zu hoch ({:.2f} pro Kern)"),
+        ('ffmpeg_cpu_percent', readings['ffmpeg_cpu_percent'], MAX_FFMPEG_CPU_PERCENT, True, "FFmpeg-Auslastung zu hoch ({:.0f}%)")
+    ]
+    
+    with governor['lock']:
+        governor['last_sample'] = now
+        governor['last_ffmpeg_ticks'] = ffmpeg_ticks or {}
+        governor['readings'] = readings
+        
+        reasons = []
+        for name, value, limit, higher_is_worse, message in checks:
+            if value is None:
+                continue
+            tripped = name in governor['tripped']
+            # Hysterese: ausgelöst ab Schwelle, freigegeben erst mit Abstand dazu
+            if higher_is_worse:
+                threshold = limit * RESOURCE_RESUME_RATIO if tripped else limit
+                over = value > threshold
+            else:
+                threshold = limit / RESOURCE_RESUME_RATIO if tripped else limit
+                over = value < threshold
+            if over:
+                governor['tripped'].add(name)
+                reasons.append(message.format(value))
+            else:
+                governor['tripped'].discard(name)
+        
+        admitting = not reasons
+        if admitting != governor['admitting']:
+            print(f"Ressourcen-Governor: {'Annahme wieder offen' if admitting else 'Annahme gesperrt - ' + '; '.join(reasons)}")
+        governor['admitting'] = admitting
+        governor['reason'] = reasons[0] if reasons else "OK"
+    
+    for name, value in readings.items():
+        set_gauge(f"ytac_{name}", round(value, 3) if value is not None else None)
+    set_gauge('ytac_admission_open', 1 if admitting else 0)
+
+@st.cache_resource(show_spinner=False)
+def start_resource_governor():
+    """Starte einmal pro Prozess die Live-Abtastung der Ressourcen"""
+    governor = {
+        'lock': threading.Lock(),
+        'readings': {},
+        'tripped': set(),
+        'admitting': True,
+        'reason': "OK",
+        'last_sample': time.monotonic(),
+        'last_ffmpeg_ticks': {}
+    }
+    sample_resources(governor)
+    
+    def sampler_loop():
+        while True:
+            time.sleep(RESOURCE_SAMPLE_SECONDS)
+            try:
+                sample_resources(governor)
+            except Exception as e:
+                print(f"Ressourcen-Abtastung fehlgeschlagen: {str(e)}")
+    
+    threading.Thread(target=sampler_loop, name='resource-governor', daemon=True).start()
+    return governor
+
+def get_resource_readings():
+    """Letzte Messwerte des Governors"""
+    governor = start_resource_governor()
+    with governor['lock']:
+        return dict(governor['readings'])
+
+def check_system_resources():
+    """Überprüfe Systemressourcen anhand der Live-Messwerte des Governors"""
+    try:
+        governor = start_resource_governor()
+        with governor['lock']:
+            admitting, reason = governor['admitting'], governor['reason']
+        if not admitting:
+            return False, reason
         
         # Einfacher Load Check über aktive Downloads
-        if st.session_state.active_downloads >= MAX_CONCURRENT_DOWNLOADS:
+        if st.session_state.active_downloads >= get_setting('MAX_CONCURRENT_DOWNLOADS'):
             return False, "Server überlastet - zu viele aktive Downloads"
         
-        # Garbage Collection für Speicherfreigabe
-        gc.collect()
-        
         return True, "OK"
     except Exception as e:
         return True, "OK"  # Fallback
 
-def check_rate_limit(client_ip, session_id):
-    """Überprüfe Rate Limiting"""
+@st.cache_resource(show_spinner=False)
+def get_tracking_store():
+    """Prozessweiter Speicher für IP-/Session-Tracking (über alle Sessions geteilt)"""
+    return {
+        'lock': threading.Lock(),
+        'ip_downloads': {},
+        'ip_previews': {},
+        'last_download_time': {}
+    }
+
+def check_shared_rate_limit(client_ip, session_id):
+    """IP- und Intervall-Limits aus dem prozessweiten Tracking (UI und API)"""
     current_time = datetime.now()
     
+    store = get_tracking_store()
+    with store['lock']:
+        # IP Rate Limit (pro Stunde)
+        if client_ip in store['ip_downloads']:
+            ip_downloads = store['ip_downloads'][client_ip]
+            # Entferne Downloads älter als 1 Stunde
+            recent_downloads = [t for t in ip_downloads if current_time - t < timedelta(hours=1)]
+            store['ip_downloads'][client_ip] = recent_downloads
+            
+            if len(recent_downloads) >= MAX_DOWNLOADS_PER_IP:
+                return False, f"IP-Limit erreicht ({MAX_DOWNLOADS_PER_IP} Downloads/Stunde)"
+        
+        # Zeit zwischen Downloads
+        if session_id in store['last_download_time']:
+            time_since_last = (current_time - store['last_download_time'][session_id]).total_seconds()
+            if time_since_last < get_setting('RATE_LIMIT_SECONDS'):
+                remaining = get_setting('RATE_LIMIT_SECONDS') - int(time_since_last)
+                return False, f"Bitte warten Sie {remaining} Sekunden"
+    
+    return True, "OK"
+
+def check_rate_limit(client_ip, session_id):
+    """Überprüfe Rate Limiting"""
     # Session Rate Limit
     session_downloads = st.session_state.get('session_download_count', 0)
     if session_downloads >= MAX_DOWNLOADS_PER_SESSION:
         return False, f"Session-Limit erreicht ({MAX_DOWNLOADS_PER_SESSION} Downloads)"
     
-    # IP Rate Limit (pro Stunde)
-    if client_ip in st.session_state.ip_downloads:
-        ip_downloads = st.session_state.ip_downloads[client_ip]
-        # Entferne Downloads älter als 1 Stunde
-        recent_downloads = [t for t in ip_downloads if current_time - t < timedelta(hours=1)]
-        st.session_state.ip_downloads[client_ip] = recent_downloads
-        
-        if len(recent_downloads) >= MAX_DOWNLOADS_PER_IP:
-            return False, f"IP-Limit erreicht ({MAX_DOWNLOADS_PER_IP} Downloads/Stunde)"
-    
-    # Zeit zwischen Downloads
-    if session_id in st.session_state.last_download_time:
-        time_since_last = (current_time - st.session_state.last_download_time[session_id]).total_seconds()
-        if time_since_last < RATE_LIMIT_SECONDS:
-            remaining = RATE_LIMIT_SECONDS - int(time_since_last)
-            return False, f"Bitte warten Sie {remaining} Sekunden"
+    shared_ok, shared_msg = check_shared_rate_limit(client_ip, session_id)
+    if not shared_ok:
+        return False, shared_msg
     
     # Concurrent Downloads
-    if st.session_state.active_downloads >= MAX_CONCURRENT_DOWNLOADS:
+    if st.session_state.active_downloads >= get_setting('MAX_CONCURRENT_DOWNLOADS'):
         return False, "Zu viele gleichzeitige Downloads. Bitte warten Sie."
     
     return True, "OK"
 
+def reserve_preview(client_ip):
+    """Eine neu zu erzeugende Vorschau auf das Stundenkontingent der IP buchen: (ok, meldung)"""
+    current_time = datetime.now()
+    store = get_tracking_store()
+    with store['lock']:
+        recent = [t for t in store['ip_previews'].get(client_ip, []) if current_time - t < timedelta(hours=1)]
+        if len(recent) >= MAX_PREVIEWS_PER_IP:
+            store['ip_previews'][client_ip] = recent
+            return False, f"Vorschau-Limit erreicht ({MAX_PREVIEWS_PER_IP} Vorschauen/Stunde)"
+        recent.append(current_time)
+        store['ip_previews'][client_ip] = recent
+    return True, "OK"
+
+def refund_preview(client_ip):
+    """Gebuchte Vorschau zurückgeben, wenn keine erzeugt wurde"""
+    store = get_tracking_store()
+    with store['lock']:
+        recent = store['ip_previews'].get(client_ip)
+        if recent:
+            recent.pop()
+
+def record_shared_download(client_ip, session_id):
+    """Trage einen Download ins prozessweite IP-/Intervall-Tracking ein"""
+    current_time = datetime.now()
+    store = get_tracking_store()
+    with store['lock']:
+        # IP Tracking
+        store['ip_downloads'].setdefault(client_ip, []).append(current_time)
+        
+        # Last Download Time
+        store['last_download_time'][session_id] = current_time
+
 def update_download_tracking(client_ip, session_id):
     """Aktualisiere Download-Tracking"""
-    current_time = datetime.now()
-    
     # Session Counter
     if 'session_download_count' not in st.session_state:
         st.session_state.session_download_count = 0
     st.session_state.session_download_count += 1
     
-    # IP Tracking
-    if client_ip not in st.session_state.ip_downloads:
-        st.session_state.ip_downloads[client_ip] = []
-    st.session_state.ip_downloads[client_ip].append(current_time)
-    
-    # Last Download Time
-    st.session_state.last_download_time[session_id] = current_time
+    record_shared_download(client_ip, session_id)
     
     # Active Downloads Counter
     st.session_state.active_downloads += 1
 
+def release_download_slot():
+    """Gib einen aktiven Download-Slot der UI-Session frei (headless ohne Wirkung)"""
+    if not has_streamlit_context():
+        return
+    if st.session_state.get('active_downloads', 0) > 0:
+        st.session_state.active_downloads -= 1
+
 def cleanup_old_tracking_data():
     """Bereinige alte Tracking-Daten"""
     try:
         current_time = datetime.now()
         cutoff_time = current_time - timedelta(hours=2)
         
-        # Bereinige IP Downloads
-        for ip in list(st.session_state.ip_downloads.keys()):
-            st.session_state.ip_downloads[ip] = [
-                t for t in st.session_state.ip_downloads[ip] 
-                if t > cutoff_time
-            ]
-            # Entferne leere Einträge
-            if not st.session_state.ip_downloads[ip]:
-                del st.session_state.ip_downloads[ip]
-        
-        # Bereinige Last Download Times
-        for session_id in list(st.session_state.last_download_time.keys()):
-            if st.session_state.last_download_time[session_id] < cutoff_time:
-                del st.session_state.last_download_time[session_id]
+        store = get_tracking_store()
+        with store['lock']:
+            # Bereinige IP Downloads
+            for ip in list(store['ip_downloads'].keys()):
+                store['ip_downloads'][ip] = [
+                    t for t in store['ip_downloads'][ip]
+                    if t > cutoff_time
+                ]
+                # Entferne leere Einträge
+                if not store['ip_downloads'][ip]:
+                    del store['ip_downloads'][ip]
+            
+            # Bereinige Vorschau-Kontingente
+            for ip in list(store['ip_previews'].keys()):
+                store['ip_previews'][ip] = [t for t in store['ip_previews'][ip] if t > cutoff_time]
+                if not store['ip_previews'][ip]:
+                    del store['ip_previews'][ip]
+            
+            # Bereinige Last Download Times
+            for session_id in list(store['last_download_time'].keys()):
+                if store['last_download_time'][session_id] < cutoff_time:
+                    del store['last_download_time'][session_id]
     except:
         pass
 
-def test_yt_dlp_installation():
-    """Teste ob yt-dlp korrekt installiert ist"""
-    try:
-        import yt_dlp
-        print(f"yt-dlp Version: {yt_dlp.version.__version__}")
-        
-        # Teste mit einer einfachen URL
-        test_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"  # Rick Roll als Test
-        
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'socket_timeout': 15,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(test_url, download=False)
-            if info:
-                print("yt-dlp Installation erfolgreich getestet")
-                return True, "OK"
-            else:
-                return False, "Keine Info erhalten"
-                
-    except ImportError:
-        return False, "yt-dlp nicht installiert"
-    except Exception as e:
-        return False, f"yt-dlp Test fehlgeschlagen: {str(e)}"
-
-def check_ffmpeg_installation():
-    """Prüfe ob FFmpeg verfügbar ist"""
-    try:
-        import subprocess
-        result = subprocess.run(['ffmpeg', '-version'], 
-                              capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            print("FFmpeg ist verfügbar")
-            return True, "OK"
-        else:
-            return False, "FFmpeg nicht gefunden"
-    except FileNotFoundError:
-        return False, "FFmpeg nicht installiert"
-    except Exception as e:
-        return False, f"FFmpeg Test fehlgeschlagen: {str(e)}"
+# ===== HINTERGRUND-HAUSHALTUNG & RERUN-BUDGET =====
+def run_housekeeping():
+    """Periodische Aufräumarbeiten (läuft im Scheduler-Thread, nicht pro Rerun)"""
+    cleanup_old_tracking_data()
+    cleanup_api_jobs()
+    cleanup_negative_cache()
+    cleanup_stream_tickets()
+    cleanup_preview_cache()
+    cleanup_batch_checkpoints()
+    cleanup_ui_results()
+    cleanup_profiles()
+    cleanup_track_scheduler()
+    reload_runtime_config_if_changed()
+    if DISTRIBUTED_MODE:
+        cleanup_job_queue()
+    # Garbage Collection für Speicherfreigabe
+    gc.collect()
 
-def diagnose_download_issues():
-    """Diagnose möglicher Download-Probleme"""
-    issues = []
-    
-    # Teste yt-dlp
-    yt_dlp_ok, yt_dlp_msg = test_yt_dlp_installation()
-    if not yt_dlp_ok:
-        issues.append(f"yt-dlp Problem: {yt_dlp_msg}")
+@st.cache_resource(show_spinner=False)
+def start_housekeeping_scheduler():
+    """Starte einmal pro Prozess den Hintergrund-Thread für die Haushaltung"""
+    stop_event = threading.Event()
     
-    # Teste FFmpeg
-    ffmpeg_ok, ffmpeg_msg = check_ffmpeg_installation()
-    if not ffmpeg_ok:
-        issues.append(f"FFmpeg Problem: {ffmpeg_msg}")
+    def scheduler_loop():
+        while not stop_event.wait(HOUSEKEEPING_INTERVAL_SECONDS):
+            try:
+                run_housekeeping()
+            except Exception as e:
+                print(f"Haushaltung fehlgeschlagen: {str(e)}")
     
-    # Teste Temp-Verzeichnis
-    try:
-        temp_dir = tempfile.mkdtemp()
-        test_file = os.path.join(temp_dir, "test.txt")
-        with open(test_file, 'w') as f:
-            f.write("test")
-        os.remove(test_file)
-        os.rmdir(temp_dir)
-    except Exception as e:
-        issues.append(f"Temp-Verzeichnis Problem: {str(e)}")
+    thread = threading.Thread(target=scheduler_loop, name='housekeeping', daemon=True)
+    thread.start()
+    print(f"Haushaltungs-Scheduler gestartet (alle {HOUSEKEEPING_INTERVAL_SECONDS}s)")
+    return {'thread': thread, 'stop': stop_event}
+
+@st.cache_resource(show_spinner=False)
+def get_rerun_stats():
+    """Prozessweite Messwerte der Rerun-Dauer"""
+    return {
+        'lock': threading.Lock(),
+        'durations_ms': deque(maxlen=500),
+        'over_budget': 0
+    }
+
+def record_rerun_duration(duration_ms):
+    """Erfasse die Dauer eines Reruns und melde Überschreitungen des Budgets"""
+    stats = get_rerun_stats()
+    with stats['lock']:
+        stats['durations_ms'].append(duration_ms)
+        if duration_ms > RERUN_BUDGET_MS:
+            stats['over_budget'] += 1
+    if duration_ms > RERUN_BUDGET_MS:
+        print(f"Rerun über Budget: {duration_ms:.0f}ms (Budget {RERUN_BUDGET_MS}ms)")
+
+def get_rerun_latency_summary():
+    """Fasse die gemessenen Rerun-Dauern zusammen (p50/p95/max in ms)"""
+    stats = get_rerun_stats()
+    with stats['lock']:
+        durations = sorted(stats['durations_ms'])
+        over_budget = stats['over_budget']
+    if not durations:
+        return {'count': 0, 'p50_ms': 0, 'p95_ms': 0, 'max_ms': 0, 'over_budget': over_budget}
+    return {
+        'count': len(durations),
+        'p50_ms': durations[len(durations) // 2],
+        'p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+        'max_ms': durations[-1],
+        'over_budget': over_budget
+    }
+
+# ===== ABBRUCH (CANCELLATION TOKENS) =====
+STAGE_DEADLINES = {
+    'extract': STAGE_DEADLINE_EXTRACT_SECONDS,
+    'fetch': STAGE_DEADLINE_FETCH_SECONDS,
+    'transcode': STAGE_DEADLINE_TRANSCODE_SECONDS,
+    'archive': STAGE_DEADLINE_ARCHIVE_SECONDS
+}
+# Phasen mit regelmäßigen Heartbeats (Progress-Hook); nur hier wird Stillstand erkannt
+HEARTBEAT_STAGES = ('fetch',)
+# Phasen, die der Watchdog abbrechen kann (FFmpeg-Prozess bzw. Prüfstelle danach);
+# 'archive' schreibt in Python ins ZIP - dort wird die Deadline nur gemeldet
+ABORTABLE_STAGES = ('extract', 'fetch', 'transcode')
+
+class DownloadCancelled(Exception):
+    """Job wurde abgebrochen (Cancel-Button, Verbindungsabbruch oder API)"""
+
+class StageTimeout(Exception):
+    """Watchdog hat eine Phase wegen Deadline oder Stillstand beendet (wiederholbar)"""
+
+@st.cache_resource(show_spinner=False)
+def get_cancel_registry():
+    """Alle laufenden Jobs mit ihrem Abbruch-Token (prozessweit)"""
+    return {
+        'lock': threading.Lock(),
+        'tokens': {}
+    }
+
+def new_cancel_token(session_id=None, owner=None, priority=None):
+    """Token für einen Job anlegen. Mit session_id wird der Job abgebrochen,
+    sobald die Streamlit-Session die Verbindung verliert. owner (Session/IP) und
+    priority (PRIORITY_*) ordnen die Tracks des Jobs im Fair-Share-Scheduler ein;
+    ohne owner läuft der Job am Scheduler vorbei (CLI, Worker)."""
+    token = {
+        'id': uuid.uuid4().hex,
+        'session_id': session_id,
+        'owner': owner,
+        'priority': PRIORITY_PLAYLIST if priority is None else priority,
+        'event': threading.Event(),
+        'reason': None,
+        'lock': threading.Lock(),
+        'processes': set(),
+        'workspaces': set(),
+        'disconnected_since': None,
+        'stage': None,
+        'stage_started': None,
+        'heartbeat': None,
+        'stage_timeout': None,
+        'timeouts': []
+    }
+    registry = get_cancel_registry()
+    with registry['lock']:
+        registry['tokens'][token['id']] = token
+        set_gauge('ytac_running_jobs', len(registry['tokens']))
+    start_job_watchdog()
+    return token
+
+def release_cancel_token(token):
+    """Job ist beendet - Token austragen"""
+    registry = get_cancel_registry()
+    with registry['lock']:
+        registry['tokens'].pop(token['id'], None)
+        set_gauge('ytac_running_jobs', len(registry['tokens']))
+
+def enter_stage(token, stage):
+    """Neue Pipeline-Phase beginnen (None = keine überwachte Phase).
     
-    return issues
+    Ein noch nicht abgeholtes Watchdog-Timeout verfällt: die beendete Phase ist
+    trotzdem fertig geworden und darf den nächsten Track nicht mehr abbrechen."""
+    if token:
+        now = time.monotonic()
+        with token['lock']:
+            token['stage'] = stage
+            token['stage_timeout'] = None
+            token['stage_started'] = now
+            token['heartbeat'] = now
+        record_profile_stage(stage, now)
 
-def get_best_format_options():
-    """Get list of audio-first format options to try (MP3-Ausgabe)"""
-    # Wir wählen bestaudio (quelle egal), konvertieren aber stets zu MP3 via Postprocessor
-    return [
-        'bestaudio/best'
-    ]
+def heartbeat(token):
+    """Fortschritt melden - setzt die Stillstandserkennung zurück"""
+    if token:
+        token['heartbeat'] = time.monotonic()
 
-def list_available_formats(url):
-    """List available formats for debugging (zusätzliche Details)"""
+def kill_job_processes(token):
+    """Alle FFmpeg-Prozesse eines Jobs sofort beenden"""
+    with token['lock']:
+        processes = list(token['processes'])
+        workspaces = list(token['workspaces'])
+    for process in processes:
+        try:
+            process.kill()
+        except OSError:
+            pass
+    # FFmpeg-Kinder von yt-dlp (Postprocessor, Ranged-Downloads) über ihr Arbeitsverzeichnis finden
+    kill_workspace_processes(workspaces)
+
+def abort_stage(token, stage, cause):
+    """Hängende Phase beenden; der Job erhält an der nächsten Prüfstelle StageTimeout.
+    Nicht abbrechbare Phasen (siehe ABORTABLE_STAGES) werden nur gemeldet."""
+    abortable = stage in ABORTABLE_STAGES
+    with token['lock']:
+        if token['stage'] != stage:
+            return
+        token['stage'] = None
+        if abortable:
+            token['stage_timeout'] = stage
+            token['timeouts'].append(stage)
+    inc_counter(f'ytac_stage_timeouts_total{{stage="{stage}"}}')
+    if not abortable:
+        print(f"Watchdog: Job {token['id']} - Phase '{stage}' überzogen ({cause}), läuft weiter")
+        return
+    print(f"Watchdog: Job {token['id']} - Phase '{stage}' beendet ({cause})")
+    kill_job_processes(token)
+
+def check_stage_deadline(token, now):
+    """Deadline und Heartbeat der aktuellen Phase prüfen"""
+    stage, started, last_beat = token['stage'], token['stage_started'], token['heartbeat']
+    if not stage or token['event'].is_set():
+        return
+    if now - started > STAGE_DEADLINES[stage]:
+        abort_stage(token, stage, f"Deadline {STAGE_DEADLINES[stage]}s überschritten")
+    elif stage in HEARTBEAT_STAGES and now - last_beat > STAGE_STALL_SECONDS:
+        abort_stage(token, stage, f"kein Fortschritt seit {STAGE_STALL_SECONDS}s")
+
+def cancel_job(token, reason):
+    """Job abbrechen: Flag setzen und laufende FFmpeg-Prozesse sofort beenden"""
+    with token['lock']:
+        if token['event'].is_set():
+            return
+        token['reason'] = reason
+        token['event'].set()
+    print(f"Job {token['id']} abgebrochen: {reason}")
+    inc_counter('ytac_jobs_cancelled_total')
+    kill_job_processes(token)
+
+def is_cancelled(token):
+    return bool(token) and token['event'].is_set()
+
+def raise_if_cancelled(token):
+    """Kooperativer Abbruchpunkt (auch für vom Watchdog beendete Phasen)"""
+    if not token:
+        return
+    if token['event'].is_set():
+        raise DownloadCancelled(f"Abgebrochen: {token['reason']}")
+    stage = take_stage_timeout(token)
+    if stage:
+        raise StageTimeout(f"Watchdog-Timeout in Phase '{stage}'")
+
+def take_stage_timeout(token):
+    """Vom Watchdog beendete Phase einmalig abholen oder None"""
+    if not token:
+        return None
+    with token['lock']:
+        stage, token['stage_timeout'] = token['stage_timeout'], None
+    return stage
+
+def sleep_or_cancel(token, seconds):
+    """Wartezeit, die bei Abbruch sofort endet"""
+    if token:
+        if token['event'].wait(seconds):
+            raise_if_cancelled(token)
+    else:
+        time.sleep(seconds)
+
+def register_workspace(token, path):
+    if token:
+        with token['lock']:
+            token['workspaces'].add(path)
+
+def kill_workspace_processes(workspaces):
+    """FFmpeg-Kindprozesse beenden, deren Kommandozeile ein Arbeitsverzeichnis enthält"""
+    if not workspaces:
+        return
+    for pid in read_child_ffmpeg_cpu_ticks() or {}:
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().decode('utf-8', 'replace')
+            if any(workspace in cmdline for workspace in workspaces):
+                os.kill(pid, 9)
+                print(f"FFmpeg-Prozess {pid} beendet")
+        except OSError:
+            pass  # Prozess bereits beendet
+
+def run_ffmpeg(cmd, cancel_token=None, timeout=FFMPEG_TIMEOUT_SECONDS, input_data=None):
+    """FFmpeg ausführen; bei Abbruch oder Zeitüberschreitung wird der Prozess getötet.
+    
+    Liefert stdout; wirft DownloadCancelled, TimeoutError oder CalledProcessError.
+    """
+    import subprocess
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    if cancel_token:
+        with cancel_token['lock']:
+            cancel_token['processes'].add(process)
+    try:
+        # communicate() in einem Hilfsthread, damit hier regelmäßig geprüft werden kann
+        output = {}
+        reader = threading.Thread(
+            target=lambda: output.update(stdout=process.communicate(input_data)[0]),
+            daemon=True
+        )
+        reader.start()
+        deadline = time.monotonic() + timeout
+        while reader.is_alive():
+            reader.join(CANCEL_POLL_SECONDS)
+            if is_cancelled(cancel_token) or time.monotonic() > deadline:
+                process.kill()
+                reader.join()
+                raise_if_cancelled(cancel_token)
+                raise TimeoutError(f"FFmpeg-Timeout nach {timeout}s")
+        if process.returncode != 0:
+            # Vom Watchdog oder Abbruch getöteter Prozess meldet den eigentlichen Grund
+            raise_if_cancelled(cancel_token)
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+        return output.get('stdout') or b''
+    finally:
+        if cancel_token:
+            with cancel_token['lock']:
+                cancel_token['processes'].discard(process)
+
+def get_streamlit_session_id():
+    """ID der aktuellen Streamlit-Session (nur im Skript-Thread)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+def is_streamlit_session_active(session_id):
+    """Ist der Browser der Session noch verbunden? Im Zweifel ja"""
+    try:
+        from streamlit.runtime import Runtime
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+@st.cache_resource(show_spinner=False)
+def start_job_watchdog():
+    """Hintergrund-Thread: Phasen-Deadlines prüfen und Jobs getrennter Sessions abbrechen"""
+    def watchdog_loop():
+        registry = get_cancel_registry()
+        while True:
+            time.sleep(CANCEL_POLL_SECONDS)
+            with registry['lock']:
+                tokens = list(registry['tokens'].values())
+            now = time.monotonic()
+            # Jobs je Phase als Metrik - hängende Jobs bleiben so sichtbar
+            for stage in STAGE_DEADLINES:
+                set_gauge(f'ytac_jobs_in_stage{{stage="{stage}"}}', sum(1 for token in tokens if token['stage'] == stage))
+            for token in tokens:
+                try:
+                    check_stage_deadline(token, now)
+                    if not token['session_id']:
+                        continue
+                    if is_streamlit_session_active(token['session_id']):
+                        token['disconnected_since'] = None
+                    elif token['disconnected_since'] is None:
+                        token['disconnected_since'] = now
+                    elif now - token['disconnected_since'] >= CANCEL_DISCONNECT_GRACE_SECONDS:
+                        cancel_job(token, "Verbindung zum Browser getrennt")
+                except Exception as e:
+                    print(f"Watchdog-Fehler: {str(e)}")
+    
+    thread = threading.Thread(target=watchdog_loop, name='job-watchdog', daemon=True)
+    thread.start()
+    return thread
+
+def api_reachable_from_browser():
+    """Kann der Browser die API direkt ansprechen? Entweder über API_PUBLIC_URL (Pflicht
+    hinter einem Reverse-Proxy) oder, wenn die API nicht nur auf Loopback lauscht, über
+    protocol//hostname:API_PORT. Bewusst ohne st.context (fehlt in Streamlit 1.36)."""
+    if not API_ENABLED:
+        return False
+    if API_PUBLIC_URL:
+        return True
+    if API_HOST == 'localhost':
+        return False
+    try:
+        return not ipaddress.ip_address(API_HOST).is_loopback
+    except ValueError:
+        return True  # Hostname - erreichbar, sofern er auf die Schnittstelle zeigt
+
+# ===== FAIR-SHARE-SCHEDULER =====
+# Prioritätsklassen (kleiner = wichtiger)
+PRIORITY_INTERACTIVE = 0  # Einzelvideo aus der UI bzw. API
+PRIORITY_SELECTION = 1  # Kleine Auswahl aus einer Playlist
+PRIORITY_PLAYLIST = 2  # Komplette Playlist/Mix oder große Auswahl
+PRIORITY_NAMES = ('interactive', 'selection', 'playlist')
+
+def batch_priority(track_count, full_playlist=False):
+    """Prioritätsklasse eines Batch-Jobs anhand seiner Größe"""
+    if not full_playlist and track_count <= SMALL_SELECTION_MAX_TRACKS:
+        return PRIORITY_SELECTION
+    return PRIORITY_PLAYLIST
+
+@st.cache_resource(show_spinner=False)
+def get_track_scheduler():
+    """Prozessweiter Download-Pool mit Warteschlange je Prioritätsklasse"""
+    return {
+        'lock': threading.Lock(),
+        'capacity': get_setting('DOWNLOAD_POOL_SIZE'),
+        'active': 0,
+        'waiters': [],
+        'last_served': {},
+        'waits': [deque(maxlen=SCHEDULER_WAIT_SAMPLES) for _ in PRIORITY_NAMES],
+        'window': _new_concurrency_window(),
+        'baseline_kbps': None,
+        'last_goodput_kbps': None,
+        'last_action': None
+    }
+
+def _effective_priority(waiter, now):
+    """Klasse eines Wartenden nach Alterung (lange Wartende steigen auf)"""
+    promoted = int((now - waiter['enqueued']) // SCHEDULER_AGING_SECONDS)
+    return max(PRIORITY_INTERACTIVE, waiter['priority'] - promoted)
+
+def _dispatch_track_slots(scheduler):
+    """Freie Plätze vergeben (Lock muss gehalten werden).
+    
+    Zuerst die wichtigste Klasse, darin die Session/IP, die am längsten keinen
+    Platz bekommen hat (Round-Robin), dann FIFO.
+    """
+    now = time.monotonic()
+    while scheduler['active'] < scheduler['capacity'] and scheduler['waiters']:
+        waiter = min(scheduler['waiters'], key=lambda w: (
+            _effective_priority(w, now),
+            scheduler['last_served'].get(w['owner'], 0),
+            w['enqueued']
+        ))
+        scheduler['waiters'].remove(waiter)
+        scheduler['active'] += 1
+        scheduler['last_served'][waiter['owner']] = now
+        scheduler['waits'][waiter['priority']].append(now - waiter['enqueued'])
+        window = scheduler['window']
+        window['max_wait'] = max(window['max_wait'], now - waiter['enqueued'])
+        waiter['granted'] = now
+        waiter['event'].set()
+    _publish_scheduler_metrics(scheduler)
+
+def _publish_scheduler_metrics(scheduler):
+    """Auslastung, Warteschlangen und Wartezeit-p95 je Klasse (Lock muss gehalten werden)"""
+    set_gauge('ytac_scheduler_capacity', scheduler['capacity'])
+    set_gauge('ytac_concurrency_limit', scheduler['capacity'])
+    set_gauge('ytac_scheduler_active', scheduler['active'])
+    for priority, name in enumerate(PRIORITY_NAMES):
+        waiting = sum(1 for w in scheduler['waiters'] if w['priority'] == priority)
+        set_gauge(f'ytac_scheduler_waiting{{class="{name}"}}', waiting)
+        waits = sorted(scheduler['waits'][priority])
+        if waits:
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            set_gauge(f'ytac_scheduler_wait_p95_seconds{{class="{name}"}}', round(p95, 3))
+
+def acquire_track_slot(token):
+    """Platz im Download-Pool für genau einen Track holen (blockiert bis zur Zuteilung).
+    
+    Batches holen sich für jeden Track erneut einen Platz - wartende Einzelvideos
+    kommen so spätestens nach dem laufenden Track an die Reihe. Liefert das
+    Handle für release_track_slot oder None, wenn der Job nicht geplant wird.
+    """
+    if not token or token.get('owner') is None:
+        return None
+    waiter = {
+        'owner': token['owner'],
+        'priority': token['priority'],
+        'enqueued': time.monotonic(),
+        'event': threading.Event()
+    }
+    scheduler = get_track_scheduler()
+    with scheduler['lock']:
+        scheduler['waiters'].append(waiter)
+        _dispatch_track_slots(scheduler)
+    try:
+        while not waiter['event'].wait(CANCEL_POLL_SECONDS):
+            raise_if_cancelled(token)
+    except BaseException:
+        with scheduler['lock']:
+            if waiter in scheduler['waiters']:
+                scheduler['waiters'].remove(waiter)
+                _publish_scheduler_metrics(scheduler)
+            else:
+                # Zuteilung kam gleichzeitig mit dem Abbruch - Platz zurückgeben
+                scheduler['active'] -= 1
+                _dispatch_track_slots(scheduler)
+        raise
+    return waiter
+
+def release_track_slot(grant, output_bytes=0):
+    """Platz zurückgeben und an den nächsten Wartenden vergeben.
+    
+    output_bytes: Größe der fertigen MP3 (0 bei Fehler/Abbruch) - geht als
+    Durchsatz in die adaptive Poolgröße ein.
+    """
+    if grant is None:
+        return
+    scheduler = get_track_scheduler()
+    with scheduler['lock']:
+        scheduler['active'] = max(0, scheduler['active'] - 1)
+        if output_bytes:
+            window = scheduler['window']
+            window['tracks'] += 1
+            window['bytes'] += output_bytes
+            window['busy_seconds'] += time.monotonic() - grant['granted']
+        _adjust_concurrency(scheduler)
+        _dispatch_track_slots(scheduler)
+
+def record_throttle_event():
+    """403/429 von YouTube melden - Signal zum Absenken der Parallelität"""
+    scheduler = get_track_scheduler()
+    with scheduler['lock']:
+        scheduler['window']['throttles'] += 1
+        _adjust_concurrency(scheduler)
+
+def _new_concurrency_window():
+    """Leeres Messfenster für die adaptive Poolgröße"""
+    return {
+        'started': time.monotonic(),
+        'tracks': 0,
+        'bytes': 0,
+        'busy_seconds': 0.0,
+        'throttles': 0,
+        'max_wait': 0.0
+    }
+
+def _adjust_concurrency(scheduler):
+    """Poolgröße nach Ablauf eines Messfensters anpassen (Lock muss gehalten werden).
+    
+    AIMD mit Gradienten-Prüfung:
+    - Drosselung (403/429) über ADAPTIVE_THROTTLE_RATIO oder Governor-Sperre: multiplikativ senken
+    - Durchsatz je Track deutlich unter der Basislinie (Tracks dauern länger): um 1 senken
+    - Letzte Erhöhung brachte keinen Gesamtdurchsatz: um 1 zurück
+    - Pool ausgelastet (Wartezeiten) und Durchsatz nicht gesunken: um 1 erhöhen
+    Laufende Tracks behalten ihren Platz; eine kleinere Grenze wirkt bei der nächsten Vergabe.
+    """
+    window = scheduler['window']
+    now = time.monotonic()
+    elapsed = now - window['started']
+    if elapsed < ADAPTIVE_WINDOW_SECONDS:
+        return
+    if window['tracks'] < ADAPTIVE_MIN_SAMPLES and not window['throttles']:
+        return
+    
+    capacity = scheduler['capacity']
+    throttle_ratio = window['throttles'] / max(1, window['tracks'] + window['throttles'])
+    track_kbps = window['bytes'] * 8 / 1000 / window['busy_seconds'] if window['busy_seconds'] else 0.0
+    goodput_kbps = window['bytes'] * 8 / 1000 / elapsed
+    saturated = window['max_wait'] >= ADAPTIVE_QUEUE_WAIT_SECONDS
+    governor = start_resource_governor()
+    with governor['lock']:
+        admitting, governor_reason = governor['admitting'], governor['reason']
+    
+    target, reason = capacity, None
+    baseline = scheduler['baseline_kbps']
+    if throttle_ratio >= ADAPTIVE_THROTTLE_RATIO:
+        target = min(capacity - 1, int(capacity * ADAPTIVE_BACKOFF_FACTOR))
+        reason = f"Drosselung {throttle_ratio:.0%}"
+    elif not admitting:
+        target = min(capacity - 1, int(capacity * ADAPTIVE_BACKOFF_FACTOR))
+        reason = f"Ressourcen: {governor_reason}"
+    elif baseline and track_kbps and track_kbps < baseline / ADAPTIVE_LATENCY_TOLERANCE:
+        target = capacity - 1
+        reason = f"Track-Durchsatz {track_kbps:.0f} kbit/s (Basis {baseline:.0f})"
+    elif (scheduler['last_action'] == 'increase' and saturated and scheduler['last_goodput_kbps']
+            and goodput_kbps < scheduler['last_goodput_kbps']):
+        target = capacity - 1
+        reason = f"kein Durchsatzgewinn ({goodput_kbps:.0f} < {scheduler['last_goodput_kbps']:.0f} kbit/s)"
+    elif saturated and window['tracks']:
+        target = capacity + 1
+        reason = f"Wartezeit {window['max_wait']:.1f}s, Durchsatz {goodput_kbps:.0f} kbit/s"
+    target = max(get_setting('ADAPTIVE_MIN_CONCURRENCY'), min(get_setting('ADAPTIVE_MAX_CONCURRENCY'), target))
+    
+    # Basislinie nur aus ungestörten Fenstern lernen
+    if track_kbps and throttle_ratio < ADAPTIVE_THROTTLE_RATIO:
+        scheduler['baseline_kbps'] = track_kbps if baseline is None else 0.8 * baseline + 0.2 * track_kbps
+    scheduler['last_goodput_kbps'] = goodput_kbps if window['tracks'] else scheduler['last_goodput_kbps']
+    scheduler['window'] = _new_concurrency_window()
+    set_gauge('ytac_track_throughput_kbps', round(track_kbps, 1))
+    set_gauge('ytac_goodput_kbps', round(goodput_kbps, 1))
+    set_gauge('ytac_throttle_ratio', round(throttle_ratio, 3))
+    
+    if target == capacity:
+        scheduler['last_action'] = None
+        return
+    direction = 'increase' if target > capacity else 'decrease'
+    scheduler['capacity'] = target
+    scheduler['last_action'] = direction
+    set_gauge('ytac_concurrency_limit', target)
+    inc_counter(f'ytac_concurrency_adjustments_total{{direction="{direction}"}}')
+    print(f"Download-Pool: {capacity} -> {target} Plätze ({reason})")
+
+def cleanup_track_scheduler():
+    """Fairness-Historie von Sessions/IPs ohne Aktivität verwerfen"""
+    scheduler = get_track_scheduler()
+    cutoff = time.monotonic() - SCHEDULER_OWNER_TTL_SECONDS
+    with scheduler['lock']:
+        waiting_owners = {w['owner'] for w in scheduler['waiters']}
+        for owner, served in list(scheduler['last_served'].items()):
+            if served < cutoff and owner not in waiting_owners:
+                del scheduler['last_served'][owner]
+
+# ===== PROFILING =====
+PROFILE_MODES = ('cpu', 'sample', 'memory')
+# Profil des Jobs, der im aktuellen Thread läuft (Jobs laufen je in einem eigenen Thread)
+_profile_local = threading.local()
+
+@st.cache_resource(show_spinner=False)
+def get_profile_registry():
+    """Prozessweiter Zähler der Speicherprofile (tracemalloc ist global)"""
+    return {
+        'lock': threading.Lock(),
+        'memory_sessions': 0
+    }
+
+def parse_profile_modes(value):
+    """Profil-Anforderung aus Header/Query: '1' = cpu+memory, sonst Liste wie 'cpu,memory'"""
+    if not value:
+        return ()
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'all'):
+        return ('cpu', 'memory')
+    return tuple(mode for mode in PROFILE_MODES if mode in value.split(','))
+
+def start_job_profile(job_id, requested=None):
+    """Profil für einen Job starten (Gegenstück: finish_job_profile).
+    
+    requested (nur von Admins, siehe ADMIN_TOKEN): cpu = cProfile des Job-Threads,
+    sample = Stichproben der Aufrufstapel, memory = tracemalloc-Snapshots.
+    Ohne Anforderung und mit PROFILE_SLOW_SECONDS läuft ein Stichproben-Profil,
+    das nur bei langsamen Jobs gespeichert wird. Liefert None ohne Profil - auch
+    wenn ein Profiler nicht startet (z. B. ab Python 3.12 bei bereits aktivem
+    Profiler); der Job läuft dann unprofiliert weiter.
+    """
+    modes = parse_profile_modes(requested)
+    reason = 'angefordert'
+    if not modes and get_setting('PROFILE_SLOW_SECONDS'):
+        modes, reason = ('sample',), 'langsam'
+    if not modes or getattr(_profile_local, 'session', None):
+        return None
+    
+    session = {
+        'job_id': job_id,
+        'dir': os.path.join(PROFILE_DIR, job_id),
+        'modes': modes,
+        'reason': reason,
+        'thread_id': threading.get_ident(),
+        'started': time.monotonic(),
+        'started_at': time.time(),
+        'sections': {},
+        'stages': {},
+        'stage_current': None,
+        'profiler': None,
+        'samples': {},
+        'sampler_stop': threading.Event(),
+        'sampler': None,
+        'memory_registered': False,
+        'memory_start': None
+    }
+    try:
+        if 'memory' in modes:
+            registry = get_profile_registry()
+            with registry['lock']:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                if not registry['memory_sessions']:
+                    tracemalloc.reset_peak()
+                registry['memory_sessions'] += 1
+                session['memory_registered'] = True
+            session['memory_start'] = tracemalloc.take_snapshot()
+        if 'sample' in modes:
+            session['sampler'] = threading.Thread(
+                target=_sample_job_stacks, args=(session,), name=f'profile-{job_id[:8]}', daemon=True
+            )
+            session['sampler'].start()
+        if 'cpu' in modes:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            session['profiler'] = profiler
+    except Exception as e:
+        print(f"Profil für Job {job_id} nicht gestartet: {str(e)}")
+        _stop_profile_collectors(session)
+        return None
+    _profile_local.session = session
+    return session
+
+def _stop_profile_collectors(session):
+    """Profiler, Sampler und tracemalloc-Anteil einer Sitzung beenden.
+    Liefert (snapshot, spitze) des Speicherprofils oder (None, None)."""
+    if session['profiler']:
+        session['profiler'].disable()
+    session['sampler_stop'].set()
+    if session['sampler']:
+        session['sampler'].join()
+    
+    memory_end, peak = None, None
+    if not session['memory_registered']:
+        return memory_end, peak
+    registry = get_profile_registry()
+    with registry['lock']:
+        try:
+            if session['memory_start'] is not None:
+                memory_end = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+        except Exception as e:
+            print(f"Speicherprofil für Job {session['job_id']} unvollständig: {str(e)}")
+        registry['memory_sessions'] -= 1
+        if not registry['memory_sessions']:
+            tracemalloc.stop()
+    return memory_end, peak
+
+def _sample_job_stacks(session):
+    """Aufrufstapel des Job-Threads periodisch zählen (Folded-Format für Flamegraphs)"""
+    while not session['sampler_stop'].wait(PROFILE_SAMPLE_INTERVAL_SECONDS):
+        frame = sys._current_frames().get(session['thread_id'])
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            key = ';'.join(reversed(stack))
+            session['samples'][key] = session['samples'].get(key, 0) + 1
+
+def profile_section(name):
+    """Decorator: Laufzeit einer Funktion im Profil des laufenden Jobs erfassen"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = getattr(_profile_local, 'session', None)
+            if not session:
+                return func(*args, **kwargs)
+            started = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                section = session['sections'].setdefault(name, {'calls': 0, 'seconds': 0.0})
+                section['calls'] += 1
+                section['seconds'] += time.monotonic() - started
+        return wrapper
+    return decorator
+
+def record_profile_stage(stage, now):
+    """Phasenwechsel (extract/fetch/transcode/archive) im Profil des laufenden Jobs vermerken"""
+    session = getattr(_profile_local, 'session', None)
+    if not session:
+        return
+    current = session['stage_current']
+    if current:
+        session['stages'][current[0]] = session['stages'].get(current[0], 0.0) + now - current[1]
+    session['stage_current'] = (stage, now) if stage else None
+
+def finish_job_profile(session):
+    """Profil beenden und Artefakte schreiben. Langsam-Profile unter der Schwelle werden verworfen.
+    
+    Dateien: summary.json (Abschnitte, Phasen, Speicher), cpu.prof/cpu.txt (cProfile),
+    stacks.folded (Stichproben), memory.txt (tracemalloc-Differenz). Liefert das Verzeichnis oder None.
+    """
+    if session is None:
+        return None
+    record_profile_stage(None, time.monotonic())
+    _profile_local.session = None
+    memory_end, peak = _stop_profile_collectors(session)
+    
+    elapsed = time.monotonic() - session['started']
+    if session['reason'] == 'langsam' and elapsed < get_setting('PROFILE_SLOW_SECONDS'):
+        return None
+    
+    try:
+        os.makedirs(session['dir'], exist_ok=True)
+        if session['profiler']:
+            session['profiler'].dump_stats(os.path.join(session['dir'], 'cpu.prof'))
+            with open(os.path.join(session['dir'], 'cpu.txt'), 'w', encoding='utf-8') as f:
+                stats = pstats.Stats(session['profiler'], stream=f)
+                stats.sort_stats('cumulative').print_stats(PROFILE_TOP_ENTRIES)
+        if session['samples']:
+            with open(os.path.join(session['dir'], 'stacks.folded'), 'w', encoding='utf-8') as f:
+                for stack, count in sorted(session['samples'].items(), key=lambda item: -item[1]):
+                    f.write(f"{stack} {count}\n")
+        if memory_end is not None:
+            with open(os.path.join(session['dir'], 'memory.txt'), 'w', encoding='utf-8') as f:
+                f.write(f"Spitze seit Profilstart: {peak / (1024 * 1024):.1f} MB\n\n")
+                for stat in memory_end.compare_to(session['memory_start'], 'lineno')[:PROFILE_TOP_ENTRIES]:
+                    f.write(f"{stat}\n")
+        summary = {
+            'job_id': session['job_id'],
+            'reason': session['reason'],
+            'modes': list(session['modes']),
+            'started_at': session['started_at'],
+            'wall_seconds': round(elapsed, 3),
+            'sections': {
+                name: {'calls': section['calls'], 'seconds': round(section['seconds'], 3)}
+                for name, section in session['sections'].items()
+            },
+            'stages': {stage: round(seconds, 3) for stage, seconds in session['stages'].items()},
+            'samples': sum(session['samples'].values()),
+            'memory_peak_mb': round(peak / (1024 * 1024), 1) if peak is not None else None
+        }
+        with open(os.path.join(session['dir'], 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"Profil für Job {session['job_id']} nicht gespeichert: {str(e)}")
+        return None
+    
+    inc_counter('ytac_profiles_written_total')
+    print(f"Profil für Job {session['job_id']} ({elapsed:.1f}s, {session['reason']}): {session['dir']}")
+    return session['dir']
+
+def cleanup_profiles():
+    """Alte Profilverzeichnisse entfernen"""
+    if not os.path.isdir(PROFILE_DIR):
+        return
+    cutoff = time.time() - PROFILE_RETENTION_SECONDS
+    for name in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+# ===== ADAPTIVE PLAYER-CLIENT-REIHENFOLGE =====
+@st.cache_resource(show_spinner=False)
+def get_client_health():
+    """Prozessweite Erfolgs-/Latenzstatistik und Breaker-Zustand pro Player-Client"""
+    return {
+        'lock': threading.Lock(),
+        'clients': {}
+    }
+
+def _client_entry(health, client):
+    """Statistik-Eintrag eines Clients (wird bei Bedarf angelegt, Lock muss gehalten werden)"""
+    entry = health['clients'].get(client)
+    if entry is None:
+        entry = {
+            'events': deque(maxlen=CLIENT_WINDOW_MAX_EVENTS),  # (Zeitpunkt, Erfolg, Latenz)
+            'consecutive_failures': 0,
+            'state': 'closed',  # closed | open | half_open
+            'opened_at': 0,
+            'probe_started': 0
+        }
+        health['clients'][client] = entry
+    return entry
+
+def _client_score(entry, now):
+    """Score aus geglätteter Erfolgsquote im Fenster abzüglich Latenz-Strafe"""
+    cutoff = now - CLIENT_WINDOW_SECONDS
+    while entry['events'] and entry['events'][0][0] < cutoff:
+        entry['events'].popleft()
+    successes = sum(1 for _, ok, _ in entry['events'] if ok)
+    total = len(entry['events'])
+    # Laplace-Glättung: unbekannte Clients starten neutral bei 0.5
+    success_rate = (successes + 1) / (total + 2)
+    latencies = [latency for _, ok, latency in entry['events'] if ok and latency is not None]
+    avg_latency = sum(latencies) / len(latencies) if latencies else 0
+    return success_rate - 0.1 * (avg_latency / CLIENT_LATENCY_PENALTY_SECONDS), success_rate, avg_latency
+
+def order_player_clients(clients, probe=True):
+    """Sortiere Clients nach aktueller Erfolgsquote und Latenz; gesperrte Clients entfallen.
+    
+    Nach Ablauf der Sperrzeit darf ein gesperrter Client genau einen Probe-Versuch
+    (half-open) am Ende der Liste machen. Es bleibt immer mindestens ein Client übrig.
+    probe=False für Aufrufer, die kein Ergebnis per record_client_results melden
+    (flache Extraktion): gesperrte Clients bleiben dann draußen, ohne einen Probe zu verbrauchen.
+    """
+    health = get_client_health()
+    now = time.time()
+    ranked = []
+    probes = []
+    blocked = []
+    with health['lock']:
+        for position, client in enumerate(clients):
+            entry = _client_entry(health, client)
+            score, _, _ = _client_score(entry, now)
+            if not probe and entry['state'] != 'closed':
+                blocked.append((entry['opened_at'], client))
+                continue
+            if entry['state'] == 'open' and now - entry['opened_at'] >= CLIENT_BREAKER_COOLDOWN_SECONDS:
+                entry['state'] = 'half_open'
+                entry['probe_started'] = 0
+            if entry['state'] == 'half_open':
+                # Nur ein Probe gleichzeitig; hängende Probes nach einer Sperrdauer neu erlauben
+                if not entry['probe_started'] or now - entry['probe_started'] >= CLIENT_BREAKER_COOLDOWN_SECONDS:
+                    entry['probe_started'] = now
+                    probes.append(client)
+                else:
+                    blocked.append((entry['opened_at'], client))
+            elif entry['state'] == 'open':
+                blocked.append((entry['opened_at'], client))
+            else:
+                # Gleicher Score: ursprüngliche Reihenfolge beibehalten
+                ranked.append((-score, position, client))
+    
+    ordered = [client for _, _, client in sorted(ranked)] + probes
+    if not ordered and blocked:
+        # Alle gesperrt: den am längsten gesperrten Client trotzdem versuchen
+        ordered = [min(blocked)[1]]
+    return ordered or list(clients)
+
+def record_client_results(clients, success, latency=None, failed_clients=()):
+    """Ergebnis eines Extraktionsversuchs den beteiligten Clients zuordnen.
+    
+    Clients, die yt-dlp namentlich mit PO-Token-/403-Problemen gemeldet hat,
+    zählen immer als Fehlschlag. Bei Erfolg zählen alle übrigen als erfolgreich,
+    bei Misserfolg wird zusätzlich der zuerst versuchte Client belastet; die
+    übrigen bleiben ungewertet (ihr Probe gibt release_client_probes frei). Die
+    Latenz wird nur dem führenden Client zugerechnet.
+    """
+    if not clients:
+        return
+    health = get_client_health()
+    now = time.time()
+    failed = set(failed_clients)
+    if not success:
+        failed.add(clients[0])
+    
+    with health['lock']:
+        for client in clients:
+            ok = client not in failed
+            if ok and not success:
+                continue
+            entry = _client_entry(health, client)
+            entry['events'].append((now, ok, latency if client == clients[0] else None))
+            if ok:
+                if entry['state'] != 'closed':
+                    print(f"Player-Client '{client}' wieder verfügbar (Probe erfolgreich)")
+                entry['consecutive_failures'] = 0
+                entry['state'] = 'closed'
+            else:
+                entry['consecutive_failures'] += 1
+                if entry['state'] == 'half_open' or entry['consecutive_failures'] >= CLIENT_BREAKER_FAILURES:
+                    if entry['state'] != 'open':
+                        print(f"Player-Client '{client}' gesperrt für {CLIENT_BREAKER_COOLDOWN_SECONDS}s "
+                              f"({entry['consecutive_failures']} Fehler in Folge)")
+                        inc_counter(f'ytac_player_client_breaker_trips_total{{client="{client}"}}')
+                    entry['state'] = 'open'
+                    entry['opened_at'] = now
+            inc_counter(f'ytac_player_client_requests_total{{client="{client}",result="{"ok" if ok else "error"}"}}')
+    publish_client_metrics()
+
+def record_client_failure(clients, message, failed_clients=()):
+    """Fehlgeschlagenen Versuch werten: PO-Token/403 belastet den führenden Client,
+    andere Fehler nur die von yt-dlp namentlich gemeldeten Clients"""
+    if is_client_failure_message(message):
+        record_client_results(clients, False, None, failed_clients)
+    elif failed_clients:
+        record_client_results([client for client in clients if client in failed_clients], False)
+
+def release_client_probes(clients):
+    """Probe-Versuche ohne Ergebnis freigeben (Fehler, die nichts über den Client aussagen).
+    
+    Gesperrte Clients bleiben half-open, der nächste Aufruf darf sofort erneut proben
+    statt eine ganze Sperrdauer zu warten.
+    """
+    health = get_client_health()
+    with health['lock']:
+        for client in clients:
+            entry = health['clients'].get(client)
+            if entry and entry['state'] == 'half_open':
+                entry['probe_started'] = 0
+
+def publish_client_metrics():
+    """Erfolgsquote, Latenz und Breaker-Zustand pro Client als Gauges veröffentlichen"""
+    health = get_client_health()
+    now = time.time()
+    with health['lock']:
+        for client, entry in health['clients'].items():
+            _, success_rate, avg_latency = _client_score(entry, now)
+            set_gauge(f'ytac_player_client_success_rate{{client="{client}"}}', round(success_rate, 3))
+            set_gauge(f'ytac_player_client_latency_seconds{{client="{client}"}}', round(avg_latency, 2))
+            set_gauge(f'ytac_player_client_open{{client="{client}"}}', 0 if entry['state'] == 'closed' else 1)
+
+def is_client_failure_message(message):
+    """Deutet eine yt-dlp-Meldung auf einen blockierten Client hin (PO-Token, 403, Bot-Check)?"""
+    lower = message.lower()
+    return 'po token' in lower or '403' in lower or 'not a bot' in lower
+
+def make_client_logger(failed_clients, quiet=False):
+    """yt-dlp-Logger, der Warnungen mit Client-Namen (z.B. 'ios client ... PO Token') mitschreibt"""
+    def debug(message):
+        # Fortschrittszeilen nicht zeilenweise ausgeben
+        if not quiet and not message.startswith('[download]'):
+            print(message)
+    
+    def warning(message):
+        if is_client_failure_message(message):
+            for client in re.findall(r'\b([a-z_]+) client\b', message.lower()):
+                failed_clients.add(client)
+        if not quiet:
+            print(f"WARNING: {message}")
+    
+    def error(message):
+        print(message)
+    
+    return SimpleNamespace(debug=debug, info=debug, warning=warning, error=error)
+
+# ===== FEHLERKLASSIFIKATION & RETRY-BUDGET =====
+# Reihenfolge der Prüfung: permanent vor Format vor vorübergehend
+PERMANENT_ERROR_PATTERNS = [
+    'private video', 'video unavailable', 'has been removed', 'no longer available',
+    'account associated with this video has been terminated', 'copyright', 'members-only',
+    'join this channel', 'confirm your age', 'not available in your country',
+    'premieres in', 'this live event will begin', 'video zu lang', 'datei zu groß',
+    'unsupported url', 'is not a valid url'
+]
+FORMAT_ERROR_PATTERNS = [
+    'requested format is not available', 'only images are available', 'no video formats found',
+    'keine mp3-datei', 'keine passenden formate', 'quellformat zu groß'
+]
+TRANSIENT_ERROR_PATTERNS = [
+    'http error 429', 'too many requests', 'timed out', 'timeout', 'connection reset',
+    'connection aborted', 'temporary failure', 'remote end closed', 'incompleteread',
+    'unable to download api page', 'po token', '403', 'sign in to confirm you'
+]
+# Teilmenge der vorübergehenden Fehler, die auf Drosselung durch YouTube hindeuten
+THROTTLE_ERROR_PATTERNS = ['http error 429', 'too many requests', '403', 'sign in to confirm you']
+
+def classify_download_error(error):
+    """Ordne einen Fehler (Exception oder Meldung) einer Klasse zu.
+    
+    'permanent': Video privat, entfernt, zu lang usw. - Wiederholen ist zwecklos
+    'format': gewähltes Format nicht verfügbar - nächstes Fallback-Format
+    'transient': Drosselung, Timeout, 5xx, PO-Token/403 - Wiederholen mit Backoff
+    'unknown': nicht erkannt - nächstes Format ohne Wartezeit
+    """
+    lower = str(error).lower()
+    if any(pattern in lower for pattern in PERMANENT_ERROR_PATTERNS):
+        return 'permanent'
+    if any(pattern in lower for pattern in FORMAT_ERROR_PATTERNS):
+        return 'format'
+    if any(pattern in lower for pattern in TRANSIENT_ERROR_PATTERNS) or re.search(r'http error 5\d\d', lower):
+        return 'transient'
+    return 'unknown'
+
+@st.cache_resource(show_spinner=False)
+def get_retry_budget():
+    """Prozessweites Budget für Wiederholungen (Zeitpunkte im gleitenden Fenster)"""
+    return {
+        'lock': threading.Lock(),
+        'retries': deque()
+    }
+
+def acquire_global_retry():
+    """Eine Wiederholung aus dem globalen Budget entnehmen; False wenn erschöpft"""
+    budget = get_retry_budget()
+    now = time.time()
+    with budget['lock']:
+        while budget['retries'] and budget['retries'][0] < now - RETRY_GLOBAL_WINDOW_SECONDS:
+            budget['retries'].popleft()
+        set_gauge('ytac_retry_budget_used', len(budget['retries']))
+        if len(budget['retries']) >= RETRY_GLOBAL_BUDGET:
+            return False
+        budget['retries'].append(now)
+        return True
+
+def compute_backoff_delay(retry_number):
+    """Exponentieller Backoff mit Full Jitter (0 bis base * 2^n, gedeckelt)"""
+    ceiling = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** retry_number))
+    return random.uniform(0, ceiling)
+
+def new_retry_state():
+    """Retry-Zähler für einen einzelnen Download"""
+    return {'attempts': 0, 'transient': 0}
+
+def plan_retry(error, retry_state):
+    """Entscheide nach einem Fehlschlag über den nächsten Schritt.
+    
+    Rückgabe: {'action': 'stop' | 'retry' | 'next_format', 'delay': Sekunden,
+    'error_class': Klasse, 'reason': Text}. 'retry' wiederholt dasselbe Format.
+    """
+    error_class = classify_download_error(error)
+    retry_state['attempts'] += 1
+    inc_counter(f'ytac_download_errors_total{{class="{error_class}"}}')
+    if error_class == 'transient' and any(pattern in str(error).lower() for pattern in THROTTLE_ERROR_PATTERNS):
+        record_throttle_event()
+    
+    if error_class == 'permanent':
+        return {'action': 'stop', 'delay': 0, 'error_class': error_class, 'reason': 'permanenter Fehler'}
+    if retry_state['attempts'] >= RETRY_MAX_ATTEMPTS_PER_JOB:
+        return {'action': 'stop', 'delay': 0, 'error_class': error_class, 'reason': 'Versuchslimit pro Video erreicht'}
+    if not acquire_global_retry():
+        inc_counter('ytac_retry_budget_exhausted_total')
+        return {'action': 'stop', 'delay': 0, 'error_class': error_class, 'reason': 'globales Retry-Budget erschöpft'}
+    
+    if error_class == 'transient' and retry_state['transient'] < RETRY_MAX_TRANSIENT_PER_JOB:
+        delay = compute_backoff_delay(retry_state['transient'])
+        retry_state['transient'] += 1
+        return {'action': 'retry', 'delay': delay, 'error_class': error_class, 'reason': 'vorübergehender Fehler'}
+    return {'action': 'next_format', 'delay': 0, 'error_class': error_class, 'reason': 'nächstes Fallback-Format'}
+
+# ===== NEGATIV-CACHE =====
+NEGATIVE_CACHE_TTLS = {
+    'private': NEGATIVE_CACHE_TTL_PRIVATE,
+    'unavailable': NEGATIVE_CACHE_TTL_UNAVAILABLE,
+    'restricted': NEGATIVE_CACHE_TTL_RESTRICTED,
+    'too_long': NEGATIVE_CACHE_TTL_TOO_LONG
+}
+NEGATIVE_REASON_LABELS = {
+    'private': 'privat',
+    'unavailable': 'nicht verfügbar',
+    'restricted': 'eingeschränkt',
+    'too_long': 'zu lang'
+}
+# Eingesparte yt-dlp-Extraktionen pro Treffer (Download: Formate-Listing + Extraktion)
+NEGATIVE_CACHE_SAVED_EXTRACTIONS = {'video_info': 1, 'download': 2, 'batch': 2}
+
+@st.cache_resource(show_spinner=False)
+def get_negative_cache():
+    """Prozessweiter Cache: Video-ID -> Grund, Meldung, Ablaufzeit"""
+    return {
+        'lock': threading.Lock(),
+        'entries': {}
+    }
+
+def negative_reason_for_error(error):
+    """Grund für den Negativ-Cache aus einer Fehlermeldung; None wenn nicht cachebar"""
+    lower = str(error).lower()
+    if classify_download_error(lower) != 'permanent':
+        return None
+    if 'private video' in lower:
+        return 'private'
+    if 'video zu lang' in lower:
+        return 'too_long'
+    if any(p in lower for p in ('confirm your age', 'members-only', 'join this channel', 'not available in your country')):
+        return 'restricted'
+    if any(p in lower for p in ('video unavailable', 'has been removed', 'no longer available', 'terminated', 'copyright')):
+        return 'unavailable'
+    # Übrige permanente Fehler (z.B. Dateigröße, Premiere) hängen von Konfiguration oder Zeitpunkt ab
+    return None
+
+def remember_negative(url, reason, message):
+    """Video für die Dauer der grundspezifischen TTL als nicht ladbar merken"""
+    cache = get_negative_cache()
+    video_id = extract_video_id(url)
+    with cache['lock']:
+        if video_id not in cache['entries'] and len(cache['entries']) >= NEGATIVE_CACHE_MAX_ENTRIES:
+            # Voll: den am frühesten ablaufenden Eintrag verdrängen
+            oldest = min(cache['entries'], key=lambda key: cache['entries'][key]['expires'])
+            del cache['entries'][oldest]
+        cache['entries'][video_id] = {
+            'reason': reason,
+            'message': message,
+            'expires': time.time() + NEGATIVE_CACHE_TTLS[reason]
+        }
+        set_gauge('ytac_negative_cache_entries', len(cache['entries']))
+    print(f"Negativ-Cache: {video_id} als '{NEGATIVE_REASON_LABELS[reason]}' gemerkt")
+
+def remember_negative_error(url, error):
+    """Fehler in den Negativ-Cache übernehmen, falls er einen cachebaren Grund hat"""
+    reason = negative_reason_for_error(error)
+    if reason:
+        remember_negative(url, reason, str(error))
+    return reason
+
+def lookup_negative(url, where=None):
+    """Eintrag für ein bekannt nicht ladbares Video oder None.
+    
+    Mit `where` ('video_info', 'download', 'batch') wird der Treffer samt
+    eingesparter Extraktionen gezählt; reine Anzeige-Abfragen lassen es weg.
+    """
+    cache = get_negative_cache()
+    video_id = extract_video_id(url)
+    with cache['lock']:
+        entry = cache['entries'].get(video_id)
+        if entry and entry['expires'] <= time.time():
+            del cache['entries'][video_id]
+            entry = None
+    if entry and where:
+        inc_counter(f'ytac_negative_cache_hits_total{{reason="{entry["reason"]}",where="{where}"}}')
+        inc_counter('ytac_negative_cache_saved_extractions_total', NEGATIVE_CACHE_SAVED_EXTRACTIONS.get(where, 1))
+    return entry
+
+def partition_negative_cached(video_urls):
+    """Teile (url, titel)-Paare in ladbare Paare und Fehlermeldungen bekannter Ausfälle"""
+    remaining = []
+    skipped = []
+    for url, title in video_urls:
+        entry = lookup_negative(url, where='batch')
+        if entry:
+            skipped.append(f"Übersprungen ({NEGATIVE_REASON_LABELS[entry['reason']]}): {title}")
+        else:
+            remaining.append((url, title))
+    return remaining, skipped
+
+def cleanup_negative_cache():
+    """Abgelaufene Einträge entfernen"""
+    cache = get_negative_cache()
+    now = time.time()
+    with cache['lock']:
+        for video_id in [key for key, entry in cache['entries'].items() if entry['expires'] <= now]:
+            del cache['entries'][video_id]
+        set_gauge('ytac_negative_cache_entries', len(cache['entries']))
+
+def test_yt_dlp_installation():
+    """Teste ob yt-dlp korrekt installiert ist"""
+    try:
+        import yt_dlp
+        print(f"yt-dlp Version: {yt_dlp.version.__version__}")
+        
+        # Teste mit einer einfachen URL
+        test_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"  # Rick Roll als Test
+        
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+            'socket_timeout': 15,
+        }
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(test_url, download=False)
+            if info:
+                print("yt-dlp Installation erfolgreich getestet")
+                return True, "OK"
+            else:
+                return False, "Keine Info erhalten"
+                
+    except ImportError:
+        return False, "yt-dlp nicht installiert"
+    except Exception as e:
+        return False, f"yt-dlp Test fehlgeschlagen: {str(e)}"
+
+def check_ffmpeg_installation():
+    """Prüfe ob FFmpeg verfügbar ist"""
+    try:
+        import subprocess
+        result = subprocess.run(['ffmpeg', '-version'], 
+                              capture_output=True, text=True, timeout=10)
+        if result.returncode == 0:
+            print("FFmpeg ist verfügbar")
+            return True, "OK"
+        else:
+            return False, "FFmpeg nicht gefunden"
+    except FileNotFoundError:
+        return False, "FFmpeg nicht installiert"
+    except Exception as e:
+        return False, f"FFmpeg Test fehlgeschlagen: {str(e)}"
+
+def diagnose_download_issues():
+    """Diagnose möglicher Download-Probleme"""
+    issues = []
+    
+    # Teste yt-dlp
+    yt_dlp_ok, yt_dlp_msg = test_yt_dlp_installation()
+    if not yt_dlp_ok:
+        issues.append(f"yt-dlp Problem: {yt_dlp_msg}")
+    
+    # Teste FFmpeg
+    ffmpeg_ok, ffmpeg_msg = check_ffmpeg_installation()
+    if not ffmpeg_ok:
+        issues.append(f"FFmpeg Problem: {ffmpeg_msg}")
+    
+    # Teste Temp-Verzeichnis
+    try:
+        temp_dir = tempfile.mkdtemp()
+        test_file = os.path.join(temp_dir, "test.txt")
+        with open(test_file, 'w') as f:
+            f.write("test")
+        os.remove(test_file)
+        os.rmdir(temp_dir)
+    except Exception as e:
+        issues.append(f"Temp-Verzeichnis Problem: {str(e)}")
+    
+    return issues
+
+def get_best_format_options():
+    """Get list of audio-first format options to try (MP3-Ausgabe)"""
+    # Wir wählen bestaudio (quelle egal), konvertieren aber stets zu MP3 via Postprocessor
+    return [
+        'bestaudio/best'
+    ]
+
+def list_available_formats(url):
+    """List available formats for debugging (zusätzliche Details)"""
     try:
         ydl_opts = {
             'quiet': True,
@@ -332,11 +2257,35 @@ def list_available_formats(url):
         print(f"Fehler beim Auflisten der Formate: {str(e)}")
         return []
 
-def download_audio_with_progress(url, progress_callback=None):
-    """Download nur-Audio als MP3 mit robustem Fallback und klarer Formatwahl"""
+@profile_section('download_audio_with_progress')
+def download_audio_with_progress(url, progress_callback=None, clip=None, cancel_token=None):
+    """Download nur-Audio als MP3 mit robustem Fallback und klarer Formatwahl.
+    
+    clip=(start, ende) in Sekunden lädt und konvertiert nur diesen Ausschnitt
+    (ende=None bedeutet bis zum Videoende). Mit cancel_token (siehe new_cancel_token)
+    bricht der Download an der nächsten Prüfstelle ab, FFmpeg wird sofort beendet.
+    """
+    temp_dir = None
+    succeeded = False
+    slot = None
+    # Limit einmal je Download lesen - eine Änderung zur Laufzeit gilt ab dem nächsten Download
+    max_file_size_mb = get_setting('MAX_FILE_SIZE_MB')
+    # Ohne Token des Aufrufers eigenes anlegen - der Watchdog überwacht jeden Download
+    own_token = cancel_token is None
+    if own_token:
+        cancel_token = new_cancel_token()
     try:
+        # Bekannt nicht ladbare Videos ohne Upstream-Anfrage ablehnen
+        negative = lookup_negative(url, where='download')
+        if negative:
+            print(f"Negativ-Cache-Treffer für {url}: {negative['message']}")
+            return None, negative['message']
+        
+        # Platz im serverweiten Pool erst direkt vor der Arbeit holen (je Track)
+        slot = acquire_track_slot(cancel_token)
+        raise_if_cancelled(cancel_token)
         temp_dir = tempfile.mkdtemp()
-        download_start_time = time.time()
+        register_workspace(cancel_token, temp_dir)
         print(f"Starte Download für: {url}")
         print(f"Temp-Verzeichnis: {temp_dir}")
         # Zusätzliche Debug-Ausgabe: verfügbare Formate listen (hilft bei "Requested format is not available")
@@ -347,17 +2296,18 @@ def download_audio_with_progress(url, progress_callback=None):
             print(f"Formate-Listing übersprungen: {_e}")
 
         def progress_hook(d):
+            # Wirft yt-dlp aus dem laufenden Download, sobald abgebrochen wurde;
+            # Zeitlimits der Übertragung überwacht der Watchdog (Phase 'fetch')
+            raise_if_cancelled(cancel_token)
+            heartbeat(cancel_token)
             if progress_callback and d.get('status') == 'downloading':
-                # Timeout-Check (max 5 Minuten)
-                if time.time() - download_start_time > 300:
-                    raise Exception("Download-Timeout (5 Minuten)")
-
                 # Dateigröße-Check
                 total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
                 if total_bytes:
                     size_mb = total_bytes / (1024 * 1024)
-                    if size_mb > MAX_FILE_SIZE_MB:
-                        raise Exception(f"Datei zu groß ({size_mb:.1f}MB). Maximum: {MAX_FILE_SIZE_MB}MB")
+                    if size_mb > max_file_size_mb:
+                        # Größe der Quelle hängt vom Format ab - kleinere Formate der Leiter noch versuchen
+                        raise Exception(f"Quellformat zu groß ({size_mb:.1f}MB). Maximum: {max_file_size_mb}MB")
                     downloaded = d.get('downloaded_bytes', 0)
                     if total_bytes > 0:
                         percent = (downloaded / total_bytes) * 100
@@ -374,6 +2324,11 @@ def download_audio_with_progress(url, progress_callback=None):
             elif d.get('status') == 'finished':
                 print(f"Download abgeschlossen: {d.get('filename', 'Unknown')}")
 
+        def postprocessor_hook(d):
+            raise_if_cancelled(cancel_token)
+            if d.get('status') == 'started':
+                enter_stage(cancel_token, 'transcode')
+
         # Ziel: MP3. Quelle: bestaudio (egal, m4a/webm/etc.), danach zu MP3 extrahieren.
         # Formatauswahl: zuerst Audio-only, dann HLS-/HTTPS-, dann generische Fallbacks
         preferred_formats = [
@@ -393,9 +2348,17 @@ def download_audio_with_progress(url, progress_callback=None):
 
         last_error = None
         info = None
+        retry_state = new_retry_state()
+        fmt_index = 0
 
-        for idx, fmt in enumerate(preferred_formats, start=1):
-            print(f"Versuche Audio-Format ({idx}/{len(preferred_formats)}): {fmt}")
+        while fmt_index < len(preferred_formats):
+            raise_if_cancelled(cancel_token)
+            fmt = preferred_formats[fmt_index]
+            print(f"Versuche Audio-Format ({fmt_index + 1}/{len(preferred_formats)}): {fmt}")
+            # Reihenfolge pro Versuch neu bestimmen - gesperrte Clients werden übersprungen
+            player_clients = order_player_clients(DEFAULT_PLAYER_CLIENTS)
+            failed_clients = set()
+            print(f"Player-Clients: {', '.join(player_clients)}")
 
             ydl_opts = {
                 'format': fmt,
@@ -407,16 +2370,18 @@ def download_audio_with_progress(url, progress_callback=None):
                     }
                 ],
                 'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-                'progress_hooks': [progress_hook] if progress_callback else [],
+                'progress_hooks': [progress_hook],
+                'postprocessor_hooks': [postprocessor_hook],
                 'quiet': False,
                 'no_warnings': False,
                 'ignoreerrors': False,
                 'extract_flat': False,
+                'logger': make_client_logger(failed_clients),
                 # Keine Formate vorab ausschließen; mehrere Clients erlauben; fehlende_pot tolerieren
                 'extractor_args': {
                     'youtube': {
-                        # Probiere mehrere Clients; Reihenfolge von stabil zu "breiter"
-                        'player_client': ['web', 'web_embedded', 'ios', 'tv', 'web_creator', 'android'],
+                        # Mehrere Clients; Reihenfolge nach aktueller Erfolgsquote (siehe order_player_clients)
+                        'player_client': player_clients,
                         'formats': ['missing_pot'],
                         # Weniger strenge Skips; erlaube dash/hls, da oft nur so Audio verfügbar ist
                         'skip': [],
@@ -428,9 +2393,9 @@ def download_audio_with_progress(url, progress_callback=None):
                 'format_sort': [
                     'hasaud', 'vcodec:None'
                 ],
-                'socket_timeout': 45,
-                'retries': 5,
-                'fragment_retries': 5,
+                'socket_timeout': get_setting('YTDLP_SOCKET_TIMEOUT_SECONDS'),
+                'retries': get_setting('YTDLP_RETRIES'),
+                'fragment_retries': get_setting('YTDLP_RETRIES'),
                 'http_chunk_size': 10485760,
                 'no_check_certificate': False,
             }
@@ -438,7 +2403,11 @@ def download_audio_with_progress(url, progress_callback=None):
             try:
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     print("Teste URL-Verfügbarkeit...")
+                    enter_stage(cancel_token, 'extract')
+                    extract_start = time.time()
                     info = ydl.extract_info(url, download=False)
+                    extract_latency = time.time() - extract_start
+                    raise_if_cancelled(cancel_token)
                     if not info:
                         raise Exception("Konnte Video-Info nicht extrahieren")
 
@@ -447,8 +2416,30 @@ def download_audio_with_progress(url, progress_callback=None):
                     if duration and duration > MAX_VIDEO_DURATION:
                         raise Exception("Video zu lang (max. 1 Stunde)")
 
+                    # Ausschnitt: yt-dlp überträgt nur diesen Bereich (HTTP-Range bzw. betroffene
+                    # DASH/HLS-Fragmente), FFmpeg kodiert nur dieses Fenster
+                    fetch_seconds = duration
+                    if clip:
+                        clip = resolve_clip_range(clip, duration)
+                        fetch_seconds = clip[1] - clip[0]
+                        ydl.params['download_ranges'] = yt_dlp.utils.download_range_func(None, [clip])
+                        print(f"Ausschnitt: {format_duration(clip[0])} - {format_duration(clip[1])} ({fetch_seconds:.0f}s)")
+
+                    # Größen-Check vor der Übertragung: Quellformat und erwartetes MP3
+                    source_mb = predict_source_size_mb(info) or 0
+                    if clip and duration:
+                        source_mb *= fetch_seconds / duration
+                    mp3_mb = predict_mp3_size_mb(fetch_seconds)
+                    print(f"Größenschätzung: Quelle {source_mb:.1f}MB, MP3 {mp3_mb:.1f}MB")
+                    # Zu großes MP3 ist permanent, eine zu große Quelle nur ein Formatfehler
+                    if exceeds_mp3_size_limit(fetch_seconds, max_file_size_mb):
+                        raise Exception(f"Datei zu groß (voraussichtlich {mp3_mb:.1f}MB). Maximum: {max_file_size_mb}MB")
+                    if source_mb > max_file_size_mb * SIZE_REJECT_TOLERANCE:
+                        raise Exception(f"Quellformat zu groß (voraussichtlich {source_mb:.1f}MB). Maximum: {max_file_size_mb}MB")
+
                     # Versuch 1: Download mit gewähltem Format
                     print(f"Starte Download mit Format: {fmt}")
+                    enter_stage(cancel_token, 'fetch')
                     try:
                         ydl.download([url])
                     except yt_dlp.utils.DownloadError as de1:
@@ -465,37 +2456,56 @@ def download_audio_with_progress(url, progress_callback=None):
                         else:
                             raise
                     # Erfolgreich heruntergeladen, breche Format-Schleife ab
+                    record_client_results(player_clients, True, extract_latency, failed_clients)
+                    enter_stage(cancel_token, None)
                     break
 
-            except yt_dlp.utils.DownloadError as e:
+            except Exception as e:
                 msg = str(e)
-                print(f"DownloadError bei Format '{fmt}': {msg}")
+                if isinstance(e, yt_dlp.utils.DownloadError):
+                    print(f"DownloadError bei Format '{fmt}': {msg}")
+                else:
+                    print(f"Unerwarteter Fehler bei Format '{fmt}': {msg}")
                 last_error = e
-                lower = msg.lower()
-                # Diagnose-Listing und progressive Fallback-Strategie
-                try:
-                    print("Debug: Liste verfügbare Formate nach Fehler...")
-                    list_available_formats(url)
-                except Exception as _e:
-                    print(f"Formate-Listing fehlgeschlagen: {_e}")
-
-                # Bei "only images" oder "requested format" sofort nächstes Format versuchen
-                if 'only images are available' in lower or 'requested format is not available' in lower:
-                    print("Wechsle zum nächsten Fallback-Format...")
-                    continue
+                # Abbruch ist kein Formatfehler - keine weiteren Versuche (und keine Client-Wertung)
+                if is_cancelled(cancel_token):
+                    raise_if_cancelled(cancel_token)
+                # Vom Watchdog beendete Phase wie einen vorübergehenden Fehler wiederholen
+                timed_out_stage = take_stage_timeout(cancel_token)
+                if timed_out_stage:
+                    e = last_error = StageTimeout(f"Watchdog-Timeout in Phase '{timed_out_stage}'")
+                enter_stage(cancel_token, None)
+
+                # PO-Token/403: führenden Client belasten, nächster Versuch nutzt neu sortierte Clients
+                record_client_failure(player_clients, msg, failed_clients)
+
+                decision = plan_retry(e, retry_state)
+                print(f"Fehlerklasse: {decision['error_class']} – {decision['reason']}")
+                if decision['action'] == 'stop':
+                    if decision['error_class'] == 'permanent':
+                        remember_negative_error(url, e)
+                    raise
+
+                if decision['error_class'] == 'format':
+                    # Diagnose-Listing nur bei Formatproblemen (kostet eine weitere Extraktion)
+                    try:
+                        print("Debug: Liste verfügbare Formate nach Fehler...")
+                        list_available_formats(url)
+                    except Exception as _e:
+                        print(f"Formate-Listing fehlgeschlagen: {_e}")
 
-                # PO-Token/403: Clients werden bereits ohne android priorisiert – nächstes Format versuchen
-                if 'po token' in lower or '403' in lower:
-                    print("PO-Token/403-Hinweis – nächstes Fallback-Format...")
+                if decision['action'] == 'retry':
+                    # Gleiches Format nach Backoff erneut versuchen
+                    print(f"Warte {decision['delay']:.1f}s vor erneutem Versuch...")
+                    sleep_or_cancel(cancel_token, decision['delay'])
                     continue
 
-                # Sonstige Fehler: ebenfalls weiter
-                print("Nicht-Format-Fehler – nächstes Fallback-Format...")
-                continue
-            except Exception as e:
-                print(f"Unerwarteter Fehler bei Format '{fmt}': {e}")
-                last_error = e
+                print("Wechsle zum nächsten Fallback-Format...")
+                fmt_index += 1
                 continue
+            finally:
+                # Ungewerteter Probe dieses Versuchs (Abbruch, Größenlimit, ...) wird wieder frei
+                release_client_probes(player_clients)
         else:
             # Schleife ohne Break beendet -> kein Erfolg
             if last_error:
@@ -511,7 +2521,7 @@ def download_audio_with_progress(url, progress_callback=None):
             print(f"Gefundene Datei: {file} (Größe: {os.path.getsize(file_path)} bytes)")
             if file.endswith('.mp3'):
                 file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                if file_size_mb > MAX_FILE_SIZE_MB:
+                if file_size_mb > max_file_size_mb:
                     os.remove(file_path)
                     raise Exception(f"Datei zu groß ({file_size_mb:.1f}MB)")
                 mp3_files.append((file_path, file))
@@ -523,11 +2533,11 @@ def download_audio_with_progress(url, progress_callback=None):
             try:
                 src_path, src_name = other_audio[0]
                 mp3_out = os.path.join(os.path.dirname(src_path), os.path.splitext(src_name)[0] + ".mp3")
-                import subprocess
                 # Konvertiere sicher zu MP3 (320k CBR) via ffmpeg
                 cmd = ["ffmpeg", "-y", "-i", src_path, "-vn", "-codec:a", "libmp3lame", "-b:a", "320k", mp3_out]
                 print(f"FFmpeg Fallback-Konvertierung: {' '.join(cmd)}")
-                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                enter_stage(cancel_token, 'transcode')
+                run_ffmpeg(cmd, cancel_token)
                 if os.path.exists(mp3_out):
                     mp3_files.append((mp3_out, os.path.basename(mp3_out)))
                     # Quelle ggf. entfernen, um Platz zu sparen
@@ -535,6 +2545,8 @@ def download_audio_with_progress(url, progress_callback=None):
                         os.remove(src_path)
                     except:
                         pass
+            except DownloadCancelled:
+                raise
             except Exception as conv_err:
                 print(f"FFmpeg Fallback-Konvertierung fehlgeschlagen: {conv_err}")
 
@@ -551,16 +2563,18 @@ def download_audio_with_progress(url, progress_callback=None):
                     candidates.sort(reverse=True)
                     _, src_path, src_name = candidates[0]
                     mp3_out = os.path.join(os.path.dirname(src_path), os.path.splitext(src_name)[0] + ".mp3")
-                    import subprocess
                     cmd = ["ffmpeg", "-y", "-i", src_path, "-vn", "-codec:a", "libmp3lame", "-b:a", "320k", mp3_out]
                     print(f"FFmpeg Rettungs-Konvertierung: {' '.join(cmd)}")
-                    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    enter_stage(cancel_token, 'transcode')
+                    run_ffmpeg(cmd, cancel_token)
                     if os.path.exists(mp3_out):
                         mp3_files.append((mp3_out, os.path.basename(mp3_out)))
                         try:
                             os.remove(src_path)
                         except:
                             pass
+            except DownloadCancelled:
+                raise
             except Exception as e_conv:
                 print(f"Rettungs-Konvertierung fehlgeschlagen: {e_conv}")
 
@@ -576,80 +2590,165 @@ def download_audio_with_progress(url, progress_callback=None):
             title = info.get('title')
         if not title:
             title = os.path.splitext(filename)[0]
+        elif clip:
+            title = f"{title} {format_clip_label(clip)}"
 
         if progress_callback:
             progress_callback(100)
 
         print(f"Download erfolgreich: {file_path}")
+        succeeded = True
         return file_path, title
 
     except Exception as e:
         print(f"Download-Funktion Fehler: {str(e)}")
         return None, str(e)
     finally:
-        if st.session_state.active_downloads > 0:
-            st.session_state.active_downloads -= 1
+        # Arbeitsverzeichnis bei Fehler/Abbruch sofort räumen (auch bei Streamlit-Stop)
+        if temp_dir and not succeeded:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        release_track_slot(slot, os.path.getsize(file_path) if succeeded and os.path.exists(file_path) else 0)
+        if own_token:
+            release_cancel_token(cancel_token)
+        else:
+            enter_stage(cancel_token, None)
+        release_download_slot()
         gc.collect()
 
+def run_hedged(attempts, is_valid=lambda result: result is not None, delay=HEDGE_DELAY_SECONDS, discard=None):
+    """Starte Varianten gestaffelt parallel und liefere das erste gültige Ergebnis.
+    
+    attempts: Liste von (label, callable). Die nächste Variante startet nach
+    `delay` Sekunden oder sofort, wenn eine laufende fehlschlägt. Noch nicht
+    gestartete Varianten werden verworfen; gültige Ergebnisse, die zu spät
+    eintreffen, werden an `discard` übergeben (z.B. zum Aufräumen).
+    Liefert keine Variante ein gültiges Ergebnis, wird der letzte Fehler
+    erneut ausgelöst bzw. None zurückgegeben.
+    """
+    if not attempts:
+        return None
+    
+    executor = ThreadPoolExecutor(max_workers=len(attempts), thread_name_prefix='hedge')
+    pending = {}
+    next_index = 0
+    last_error = None
+    
+    def launch_next():
+        nonlocal next_index
+        label, func = attempts[next_index]
+        next_index += 1
+        print(f"Hedge: starte Variante {next_index}/{len(attempts)}: {label}")
+        pending[executor.submit(func)] = label
+    
+    def discard_late_result(future):
+        try:
+            result = future.result()
+            if discard and is_valid(result):
+                discard(result)
+        except Exception:
+            pass
+    
+    try:
+        launch_next()
+        while pending:
+            timeout = delay if next_index < len(attempts) else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                # Laufende Variante ist langsam - nächste zusätzlich starten
+                launch_next()
+                continue
+            
+            for future in done:
+                label = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Hedge: Variante fehlgeschlagen ({label}): {str(e)}")
+                    last_error = e
+                    continue
+                
+                if is_valid(result):
+                    print(f"Hedge: Variante erfolgreich: {label}")
+                    for loser in pending:
+                        loser.add_done_callback(discard_late_result)
+                    return result
+            
+            # Fehlschlag - nächste Variante ohne Wartezeit nachziehen
+            if not pending and next_index < len(attempts):
+                launch_next()
+        
+        if last_error:
+            raise last_error
+        return None
+    
+    finally:
+        # Nicht blockieren: Verlierer laufen bis zu ihrem Socket-Timeout aus
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def extract_mix_playlist_info(url):
     """Extrahiere Videos aus YouTube Mix/Radio Playlists"""
     try:
         print(f"Versuche Mix-Extraktion für: {url}")
         
-        # Verschiedene Mix-URL-Formate versuchen
-        mix_urls = [
+        # Verschiedene Mix-URL-Formate versuchen (Duplikate entfernen)
+        mix_urls = list(dict.fromkeys([
             url,  # Original URL
             url.replace('&start_radio=1', ''),  # Ohne start_radio Parameter
-        ]
+        ]))
         
-        for attempt, test_url in enumerate(mix_urls):
-            print(f"Mix-URL Versuch {attempt + 1}: {test_url}")
-            
-            try:
-                ydl_opts = {
-                    'quiet': False,  # Mehr Ausgabe für Debug
-                    'no_warnings': False,
-                    'extract_flat': True,
-                    'socket_timeout': 45,
-                    'ignoreerrors': True,
-                    'playlistend': MAX_MIX_SIZE,  # Limitiere auf 15 Songs für Mix
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['web', 'android'],
-                            'skip': ['dash', 'hls']
-                        }
+        def extract_variant(test_url):
+            ydl_opts = {
+                'quiet': False,  # Mehr Ausgabe für Debug
+                'no_warnings': False,
+                'extract_flat': True,
+                'socket_timeout': get_setting('YTDLP_SOCKET_TIMEOUT_SECONDS'),
+                'ignoreerrors': True,
+                'playlistend': get_setting('MAX_MIX_SIZE'),  # Limitiere auf 15 Songs für Mix
+                'extractor_args': {
+                    'youtube': {
+                        # Kein record_client_results für flache Extraktion - also keinen Probe belegen
+                        'player_client': order_player_clients(FLAT_PLAYER_CLIENTS, probe=False),
+                        'skip': ['dash', 'hls']
                     }
                 }
+            }
+            
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(test_url, download=False)
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(test_url, download=False)
-                    
-                    print(f"Mix-Info extrahiert, Typ: {info.get('_type', 'unknown')}")
-                    
-                    # Prüfe verschiedene Strukturen
-                    if info and info.get('_type') == 'playlist' and 'entries' in info:
-                        entries = info['entries']
-                        print(f"Mix-Playlist gefunden mit {len(entries)} Einträgen")
-                        
-                        # Filtere gültige Einträge
-                        valid_entries = []
-                        for entry in entries:
-                            if entry and entry.get('id') and entry.get('title'):
-                                valid_entries.append(entry)
-                        
-                        if valid_entries:
-                            return process_mix_entries(info, valid_entries)
+                print(f"Mix-Info extrahiert, Typ: {info.get('_type', 'unknown')}")
+                
+                # Prüfe verschiedene Strukturen
+                if info and info.get('_type') == 'playlist' and 'entries' in info:
+                    entries = info['entries']
+                    print(f"Mix-Playlist gefunden mit {len(entries)} Einträgen")
                     
-                    # Fallback: Versuche als einzelnes Video mit Vorschlägen
-                    elif info and info.get('_type') in ['video', 'url_transparent']:
-                        print("Mix als Video erkannt, versuche Vorschläge zu extrahieren")
-                        return extract_mix_from_video_page(test_url, info)
+                    # Filtere gültige Einträge
+                    valid_entries = []
+                    for entry in entries:
+                        if entry and entry.get('id') and entry.get('title'):
+                            valid_entries.append(entry)
                     
-            except Exception as e:
-                print(f"Mix-Extraktion Versuch {attempt + 1} fehlgeschlagen: {str(e)}")
-                continue
+                    if valid_entries:
+                        return process_mix_entries(info, valid_entries)
+                
+                # Fallback: Versuche als einzelnes Video mit Vorschlägen
+                elif info and info.get('_type') in ['video', 'url_transparent']:
+                    print("Mix als Video erkannt, versuche Vorschläge zu extrahieren")
+                    return extract_mix_from_video_page(test_url, info)
+            
+            return None
         
-        return None
+        attempts = [
+            (test_url, lambda test_url=test_url: extract_variant(test_url))
+            for test_url in mix_urls
+        ]
+        try:
+            return run_hedged(attempts, is_valid=lambda result: bool(result and result.get('videos')))
+        except Exception as e:
+            print(f"Alle Mix-URL Varianten fehlgeschlagen: {str(e)}")
+            return None
         
     except Exception as e:
         print(f"Kritischer Fehler bei Mix-Extraktion: {str(e)}")
@@ -670,20 +2769,10 @@ def process_mix_entries(info, entries):
             mix_type = 'Automatische Playlist'
         
         videos = []
-        for i, entry in enumerate(entries[:MAX_MIX_SIZE]):  # Limitiere auf 15 Songs
-            if entry and entry.get('id'):
-                # Sichere Dauer-Behandlung
-                duration = entry.get('duration', 0)
-                if duration is None:
-                    duration = 0
-                
-                video_info = {
-                    'id': entry['id'],
-                    'title': entry.get('title', f'Song {i+1}'),
-                    'duration': duration,
-                    'uploader': entry.get('uploader', entry.get('channel', 'Unbekannt')),
-                    'url': f"https://www.youtube.com/watch?v={entry['id']}"
-                }
+        dropped = []
+        for i, entry in enumerate(entries[:get_setting('MAX_MIX_SIZE')]):  # Limitiere auf 15 Songs
+            video_info = playlist_entry_to_video(entry, i, default_prefix='Song', dropped=dropped)
+            if video_info:
                 videos.append(video_info)
         
         if videos:
@@ -692,6 +2781,7 @@ def process_mix_entries(info, entries):
                 'uploader': mix_uploader,
                 'video_count': len(videos),
                 'videos': videos,
+                'dropped': dropped,
                 'is_mix': True,
                 'mix_type': mix_type
             }
@@ -713,39 +2803,45 @@ def extract_mix_from_video_page(url, video_info):
             return None
         
         # Verschiedene Mix-URL-Varianten erstellen
-        mix_url_variants = [
+        mix_url_variants = list(dict.fromkeys([
             f"https://www.youtube.com/watch?v={video_id}&list=RD{video_id}",
             f"https://www.youtube.com/playlist?list=RD{video_id}",
             url  # Original URL
-        ]
+        ]))
         
-        for variant_url in mix_url_variants:
-            try:
-                print(f"Teste Mix-Variante: {variant_url}")
-                
-                ydl_opts = {
-                    'quiet': True,
-                    'extract_flat': True,
-                    'playlistend': MAX_MIX_SIZE,
-                    'socket_timeout': 30,
-                    'ignoreerrors': True,
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['web'],
-                        }
+        def extract_variant(variant_url):
+            ydl_opts = {
+                'quiet': True,
+                'extract_flat': True,
+                'playlistend': get_setting('MAX_MIX_SIZE'),
+                'socket_timeout': get_setting('YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS'),
+                'ignoreerrors': True,
+                'extractor_args': {
+                    'youtube': {
+                        'player_client': ['web'],
                     }
                 }
+            }
+            
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                mix_info = ydl.extract_info(variant_url, download=False)
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    mix_info = ydl.extract_info(variant_url, download=False)
-                    
-                    if mix_info and mix_info.get('_type') == 'playlist' and mix_info.get('entries'):
-                        print(f"Mix-Variante erfolgreich: {len(mix_info['entries'])} Einträge")
-                        return process_mix_entries(mix_info, mix_info['entries'])
+                if mix_info and mix_info.get('_type') == 'playlist' and mix_info.get('entries'):
+                    print(f"Mix-Variante erfolgreich: {len(mix_info['entries'])} Einträge")
+                    return process_mix_entries(mix_info, mix_info['entries'])
             
-            except Exception as e:
-                print(f"Mix-Variante fehlgeschlagen: {str(e)}")
-                continue
+            return None
+        
+        attempts = [
+            (variant_url, lambda variant_url=variant_url: extract_variant(variant_url))
+            for variant_url in mix_url_variants
+        ]
+        try:
+            mix_result = run_hedged(attempts, is_valid=lambda result: bool(result and result.get('videos')))
+            if mix_result:
+                return mix_result
+        except Exception as e:
+            print(f"Mix-Varianten fehlgeschlagen: {str(e)}")
         
         # Fallback: Erstelle minimalen Mix mit dem ursprünglichen Video
         return create_single_video_mix(video_info)
@@ -982,8 +3078,12 @@ def is_playlist_url(url):
     
     return True
 
-def extract_playlist_info(url):
-    """Extrahiere Playlist-Informationen mit erweiterter Fehlerbehandlung"""
+def extract_playlist_info(url, streaming=False):
+    """Extrahiere Playlist-Informationen mit erweiterter Fehlerbehandlung
+    
+    Mit streaming=True kehrt die Funktion nach der ersten Seite zurück; der
+    Rest wird im Hintergrund in result['videos'] nachgeladen (siehe 'stream').
+    """
     try:
         # Playlist-ID extrahieren
         playlist_id_match = re.search(r'[?&]list=([a-zA-Z0-9_-]+)', url)
@@ -1033,57 +3133,58 @@ def extract_playlist_info(url):
             f"https://youtube.com/playlist?list={playlist_id}",
         ]
         
-        for attempt, test_url in enumerate(playlist_urls):
-            print(f"Versuche URL {attempt + 1}: {test_url}")
-            
-            try:
-                ydl_opts = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'extract_flat': True,
-                    'socket_timeout': 30,
-                    'ignoreerrors': False,
-                    'playlistend': MAX_PLAYLIST_SIZE,
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['web', 'android'],
-                            'skip': ['dash', 'hls']
-                        }
-                    }
-                }
+        def discard_stream(stream):
+            stream['cancelled'] = True
+        
+        attempts = [
+            (test_url, lambda test_url=test_url: start_playlist_stream(test_url))
+            for test_url in playlist_urls
+        ]
+        
+        # Hostnamen-Varianten gestaffelt parallel; der erste gültige Stream gewinnt
+        try:
+            stream = run_hedged(attempts, discard=discard_stream)
+            if stream:
+                if not streaming:
+                    # Nicht-interaktive Aufrufer brauchen die komplette Liste
+                    stream['thread'].join()
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(test_url, download=False)
-                    
-                    if info and info.get('_type') == 'playlist' and 'entries' in info:
-                        print(f"✅ Playlist gefunden mit {len(info['entries'])} Einträgen")
-                        return process_playlist_entries(info)
-                    
-            except yt_dlp.utils.DownloadError as e:
-                error_msg = str(e).lower()
-                print(f"yt-dlp Fehler: {error_msg}")
+                print(f"✅ Playlist gefunden, {len(stream['videos'])} Einträge bisher geladen")
+                if not stream['videos'] and stream['done']:
+                    return None
                 
-                if 'does not exist' in error_msg or 'not found' in error_msg:
-                    return {
-                        'error': 'playlist_not_found',
-                        'message': 'Playlist existiert nicht oder ist nicht öffentlich zugänglich',
-                        'playlist_id': playlist_id,
-                        'detailed_error': str(e)
-                    }
-                elif 'private' in error_msg or 'unavailable' in error_msg:
-                    return {
-                        'error': 'playlist_private',
-                        'message': 'Playlist ist privat oder nicht verfügbar',
-                        'playlist_id': playlist_id,
-                        'detailed_error': str(e)
-                    }
-                else:
-                    # Unbekannter Fehler - versuche nächste URL
-                    continue
-                    
-            except Exception as e:
-                print(f"Unerwarteter Fehler: {str(e)}")
-                continue
+                result = {
+                    'title': stream['title'],
+                    'uploader': stream['uploader'],
+                    'video_count': len(stream['videos']),
+                    'videos': stream['videos'],
+                    'dropped': stream['dropped']
+                }
+                if streaming:
+                    result['stream'] = stream
+                return result
+                
+        except yt_dlp.utils.DownloadError as e:
+            error_msg = str(e).lower()
+            print(f"yt-dlp Fehler: {error_msg}")
+            
+            if 'does not exist' in error_msg or 'not found' in error_msg:
+                return {
+                    'error': 'playlist_not_found',
+                    'message': 'Playlist existiert nicht oder ist nicht öffentlich zugänglich',
+                    'playlist_id': playlist_id,
+                    'detailed_error': str(e)
+                }
+            elif 'private' in error_msg or 'unavailable' in error_msg:
+                return {
+                    'error': 'playlist_private',
+                    'message': 'Playlist ist privat oder nicht verfügbar',
+                    'playlist_id': playlist_id,
+                    'detailed_error': str(e)
+                }
+            
+        except Exception as e:
+            print(f"Unerwarteter Fehler: {str(e)}")
         
         # Wenn alle Versuche fehlschlagen
         return {
@@ -1099,6 +3200,256 @@ def extract_playlist_info(url):
             'message': f'Kritischer Fehler: {str(e)}'
         }
 
+# ===== VORAB-PRÜFUNG FLACHER PLAYLIST-EINTRÄGE =====
+UNAVAILABLE_ENTRY_TITLES = {
+    '[private video]': 'private',
+    '[deleted video]': 'unavailable',
+    '[unavailable video]': 'unavailable'
+}
+PREFLIGHT_REASON_LABELS = dict(NEGATIVE_REASON_LABELS, live='Live/Premiere', too_large='zu groß')
+
+def classify_flat_entry(entry):
+    """Grund, warum ein flacher Eintrag nicht ladbar ist, oder None.
+    
+    Nutzt nur die Metadaten der flachen Extraktion (keine weitere Anfrage):
+    Platzhaltertitel, availability, live_status, Dauer und den Negativ-Cache.
+    """
+    title = (entry.get('title') or '').strip().lower()
+    if title in UNAVAILABLE_ENTRY_TITLES:
+        return UNAVAILABLE_ENTRY_TITLES[title]
+    
+    availability = entry.get('availability')
+    if availability == 'private':
+        return 'private'
+    if availability in ('premium_only', 'subscriber_only', 'needs_auth'):
+        return 'restricted'
+    
+    if entry.get('live_status') in ('is_live', 'is_upcoming'):
+        return 'live'
+    
+    duration = entry.get('duration') or 0
+    if duration > MAX_VIDEO_DURATION:
+        return 'too_long'
+    if exceeds_mp3_size_limit(duration):
+        return 'too_large'
+    
+    negative = lookup_negative(entry['id'])
+    if negative:
+        return negative['reason']
+    return None
+
+def predict_mp3_size_mb(duration):
+    """Voraussichtliche MP3-Größe bei der Zielbitrate (unabhängig vom Quellformat)"""
+    return (duration or 0) * ESTIMATED_MP3_KBPS * 1000 / 8 / (1024 * 1024)
+
+def exceeds_mp3_size_limit(duration, max_file_size_mb=None):
+    """Wäre das MP3 voraussichtlich größer als MAX_FILE_SIZE_MB (mit Toleranz)?
+    
+    Mit den Defaults greift vorher MAX_VIDEO_DURATION (1 h ergibt ca. 105 MB),
+    die Prüfung wird erst wirksam, wenn MAX_FILE_SIZE_MB zur Laufzeit sinkt.
+    """
+    max_file_size_mb = max_file_size_mb or get_setting('MAX_FILE_SIZE_MB')
+    return predict_mp3_size_mb(duration) > max_file_size_mb * SIZE_REJECT_TOLERANCE
+
+def predict_source_size_mb(info):
+    """Voraussichtliche Übertragungsgröße der gewählten Formate in MB oder None.
+    
+    Nutzt filesize bzw. filesize_approx, sonst Bitrate (abr/tbr) × Dauer.
+    """
+    duration = info.get('duration') or 0
+    total_bytes = 0
+    for fmt in info.get('requested_formats') or [info]:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size:
+            bitrate = fmt.get('abr') or fmt.get('tbr')
+            if not bitrate or not duration:
+                return None
+            size = bitrate * 1000 / 8 * duration
+        total_bytes += size
+    return total_bytes / (1024 * 1024)
+
+def estimate_batch(videos):
+    """Gesamtdauer und geschätzte MP3-/ZIP-Größe einer Titelliste"""
+    total_duration = sum(video['duration'] or 0 for video in videos)
+    unknown_duration = sum(1 for video in videos if not video['duration'])
+    return {
+        'count': len(videos),
+        'total_duration': total_duration,
+        'unknown_duration': unknown_duration,
+        # MP3 lässt sich kaum komprimieren - ZIP-Größe entspricht praktisch der Summe
+        'estimated_size_mb': round(predict_mp3_size_mb(total_duration), 1)
+    }
+
+def split_batch_by_size(videos, max_mb=None):
+    """Teile eine Titelliste in Reihenfolge in Teile mit geschätzt höchstens max_mb"""
+    max_mb = max_mb or get_setting('MAX_ZIP_SIZE_MB')
+    parts = [[]]
+    part_mb = 0
+    for video in videos:
+        size_mb = predict_mp3_size_mb(video['duration'])
+        if parts[-1] and part_mb + size_mb > max_mb:
+            parts.append([])
+            part_mb = 0
+        parts[-1].append(video)
+        part_mb += size_mb
+    return parts
+
+def format_preflight_summary(videos, dropped):
+    """Einzeilige Zusammenfassung der Vorab-Prüfung für UI, CLI und API"""
+    estimate = estimate_batch(videos)
+    hours, rest = divmod(int(estimate['total_duration']), 3600)
+    summary = (f"{estimate['count']} Titel, Gesamtdauer {hours}:{rest // 60:02d}:{rest % 60:02d}, "
+               f"ca. {estimate['estimated_size_mb']:.0f} MB MP3")
+    if estimate['unknown_duration']:
+        summary += f" ({estimate['unknown_duration']} ohne Dauerangabe)"
+    if dropped:
+        reasons = {}
+        for item in dropped:
+            label = PREFLIGHT_REASON_LABELS[item['reason']]
+            reasons[label] = reasons.get(label, 0) + 1
+        summary += f"; {len(dropped)} ausgelassen (" + ", ".join(f"{label}: {count}" for label, count in reasons.items()) + ")"
+    return summary
+
+def playlist_entry_to_video(entry, index, default_prefix='Video', dropped=None):
+    """Wandle einen flachen yt-dlp Eintrag in unser Video-Format um.
+    
+    Nicht ladbare Einträge (siehe classify_flat_entry) ergeben None und werden,
+    falls `dropped` übergeben wird, dort mit Grund vermerkt.
+    """
+    if not entry or not entry.get('id'):
+        return None
+    
+    reason = classify_flat_entry(entry)
+    if reason:
+        url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if reason in NEGATIVE_CACHE_TTLS and not lookup_negative(url):
+            remember_negative(url, reason, f"Vorab-Prüfung: {PREFLIGHT_REASON_LABELS[reason]}")
+        if dropped is not None:
+            dropped.append({'title': entry.get('title') or f'{default_prefix} {index+1}', 'reason': reason, 'url': url})
+        return None
+    
+    # Sichere Dauer-Behandlung
+    duration = entry.get('duration', 0)
+    if duration is None:
+        duration = 0
+    
+    return {
+        'id': entry['id'],
+        'title': entry.get('title') or f'{default_prefix} {index+1}',
+        'duration': duration,
+        'uploader': entry.get('uploader', entry.get('channel', 'Unbekannt')),
+        'url': f"https://www.youtube.com/watch?v={entry['id']}"
+    }
+
+def iter_playlist_pages(playlist_url, max_entries=None, page_size=PLAYLIST_PAGE_SIZE):
+    """Liefere Playlist-Einträge seitenweise über yt-dlps Lazy-Playlist-Modus.
+    
+    Generator über (playlist_meta, videos_page). Weitere Seiten werden erst von
+    YouTube geholt, wenn der Aufrufer weiter iteriert.
+    """
+    max_entries = max_entries or get_setting('MAX_PLAYLIST_SIZE')
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True,
+        'lazy_playlist': True,
+        'socket_timeout': get_setting('YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS'),
+        'ignoreerrors': False,
+        'playlistend': max_entries,
+        'extractor_args': {
+            'youtube': {
+                'player_client': order_player_clients(FLAT_PLAYER_CLIENTS, probe=False),
+                'skip': ['dash', 'hls']
+            }
+        }
+    }
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # process=False: Einträge bleiben ein Generator und werden nicht vorab aufgelöst
+        info = ydl.extract_info(playlist_url, download=False, process=False)
+        if info and info.get('_type') in ('url', 'url_transparent') and info.get('url'):
+            info = ydl.extract_info(info['url'], download=False, process=False)
+        
+        if not info or info.get('_type') != 'playlist':
+            return
+        
+        playlist_count = info.get('playlist_count')
+        meta = {
+            'title': info.get('title', info.get('playlist_title', 'Unbekannte Playlist')),
+            'uploader': info.get('uploader', info.get('channel', info.get('uploader_id', 'Unbekannt'))),
+            'expected_count': min(playlist_count, max_entries) if playlist_count else max_entries,
+            'dropped': []  # Wächst beim Iterieren mit (Vorab-Prüfung)
+        }
+        
+        page = []
+        yielded = False
+        for i, entry in enumerate(itertools.islice(info.get('entries') or [], max_entries)):
+            video = playlist_entry_to_video(entry, i, dropped=meta['dropped'])
+            if video:
+                page.append(video)
+            if len(page) >= page_size:
+                yield meta, page
+                yielded = True
+                page = []
+        
+        if page or not yielded:
+            yield meta, page
+
+def start_playlist_stream(playlist_url):
+    """Lade die erste Playlist-Seite sofort, den Rest in einem Hintergrund-Thread.
+    
+    Der Thread schreibt ausschließlich in das zurückgegebene Dict (kein
+    st.session_state), daher ist er ohne Streamlit-Kontext lauffähig.
+    """
+    pages = iter_playlist_pages(playlist_url)
+    first = next(pages, None)
+    if first is None:
+        return None
+    
+    meta, first_page = first
+    stream = {
+        'title': meta['title'],
+        'uploader': meta['uploader'],
+        'expected_count': meta['expected_count'],
+        'videos': list(first_page),
+        'dropped': meta['dropped'],
+        'done': False,
+        'cancelled': False,
+        'error': None,
+        'rendered_count': 0
+    }
+    
+    def fill_remaining_pages():
+        try:
+            for _, page in pages:
+                if stream['cancelled']:
+                    break
+                stream['videos'].extend(page)
+        except Exception as e:
+            print(f"Fehler beim Nachladen der Playlist: {str(e)}")
+            stream['error'] = str(e)
+        finally:
+            pages.close()
+            stream['done'] = True
+    
+    thread = threading.Thread(target=fill_remaining_pages, daemon=True)
+    stream['thread'] = thread
+    thread.start()
+    return stream
+
+def wait_for_playlist_stream():
+    """Warte, bis die laufende Playlist vollständig geladen ist"""
+    stream = st.session_state.get('playlist_stream')
+    if stream and not stream['done']:
+        stream['thread'].join()
+
+def cancel_playlist_stream():
+    """Stoppe das Nachladen einer nicht mehr angezeigten Playlist"""
+    stream = st.session_state.get('playlist_stream')
+    if stream:
+        stream['cancelled'] = True
+    st.session_state.playlist_stream = None
+
 def process_playlist_entries(info):
     """Verarbeite Playlist-Einträge zu unserem Format"""
     try:
@@ -1107,23 +3458,13 @@ def process_playlist_entries(info):
         playlist_uploader = info.get('uploader', info.get('channel', info.get('uploader_id', 'Unbekannt')))
         
         videos = []
+        dropped = []
         for i, entry in enumerate(entries):
-            if i >= MAX_PLAYLIST_SIZE:
+            if i >= get_setting('MAX_PLAYLIST_SIZE'):
                 break
             
-            if entry and entry.get('id'):
-                # Sichere Dauer-Behandlung
-                duration = entry.get('duration', 0)
-                if duration is None:
-                    duration = 0
-                    
-                video_info = {
-                    'id': entry['id'],
-                    'title': entry.get('title', f'Video {i+1}'),
-                    'duration': duration,
-                    'uploader': entry.get('uploader', entry.get('channel', 'Unbekannt')),
-                    'url': f"https://www.youtube.com/watch?v={entry['id']}"
-                }
+            video_info = playlist_entry_to_video(entry, i, dropped=dropped)
+            if video_info:
                 videos.append(video_info)
         
         if videos:
@@ -1131,7 +3472,8 @@ def process_playlist_entries(info):
                 'title': playlist_title,
                 'uploader': playlist_uploader,
                 'video_count': len(videos),
-                'videos': videos
+                'videos': videos,
+                'dropped': dropped
             }
         
         return None
@@ -1145,6 +3487,8 @@ def handle_playlist_url(cleaned_url):
     
     # Playlist-Info laden
     if not st.session_state.playlist_videos or st.session_state.get('last_playlist_url') != cleaned_url:
+        # Ein evtl. noch laufendes Nachladen der vorherigen Playlist abbrechen
+        cancel_playlist_stream()
         
         # Debug-Informationen
         playlist_id_match = re.search(r'[?&]list=([a-zA-Z0-9_-]+)', cleaned_url)
@@ -1160,7 +3504,7 @@ def handle_playlist_url(cleaned_url):
             st.code(f"ID-Länge: {len(playlist_id)}")
             st.code(f"Playlist-Typ: {playlist_type}")
             if is_mix:
-                st.code(f"Mix-Limit: {MAX_MIX_SIZE} Songs")
+                st.code(f"Mix-Limit: {get_setting('MAX_MIX_SIZE')} Songs")
         
         # Fortschrittsanzeige
         progress_bar = st.progress(0)
@@ -1180,8 +3524,10 @@ def handle_playlist_url(cleaned_url):
                 
                 if playlist_info and playlist_info.get('videos'):
                     st.session_state.playlist_videos = playlist_info['videos']
+                    st.session_state.playlist_dropped = playlist_info.get('dropped', [])
+                    st.session_state.playlist_title = playlist_info['title']
                     st.session_state.last_playlist_url = cleaned_url
-                    st.session_state.selected_videos = []
+                    st.session_state.selected_videos = set()
                     
                     progress_bar.progress(100)
                     status_text.text("✅ Mix erfolgreich geladen!")
@@ -1237,32 +3583,36 @@ def handle_playlist_url(cleaned_url):
                     return False
             
             else:
-                # Normale Playlist-Behandlung
-                status_text.text("🔍 Prüfe Playlist-Verfügbarkeit...")
-                progress_bar.progress(25)
+                # Normale Playlist-Behandlung: erste Seite sofort, Rest im Hintergrund
+                status_text.text("📡 Lade erste Playlist-Einträge...")
                 
-                status_text.text("📡 Lade Playlist-Daten...")
-                progress_bar.progress(50)
-                
-                playlist_info = extract_playlist_info(cleaned_url)
-                progress_bar.progress(100)
+                playlist_info = extract_playlist_info(cleaned_url, streaming=True)
                 
                 # Erfolgreiche Extraktion
                 if playlist_info and playlist_info.get('videos') and not playlist_info.get('error'):
+                    stream = playlist_info.get('stream')
+                    # Gleiche Listen-Instanz wie im Stream - wächst beim Nachladen mit
                     st.session_state.playlist_videos = playlist_info['videos']
+                    st.session_state.playlist_dropped = playlist_info.get('dropped', [])
+                    st.session_state.playlist_stream = stream
+                    st.session_state.playlist_title = playlist_info['title']
                     st.session_state.last_playlist_url = cleaned_url
-                    st.session_state.selected_videos = []
+                    st.session_state.selected_videos = set()
                     
+                    loaded = len(playlist_info['videos'])
+                    expected = stream['expected_count'] if stream else loaded
+                    progress_bar.progress(min(loaded / max(expected, 1), 1.0))
                     status_text.text("✅ Playlist erfolgreich geladen!")
                     
                     st.success(f"✅ Playlist geladen: **{playlist_info['title']}**")
-                    st.info(f"📺 Kanal: {playlist_info['uploader']} | 🎵 Videos: {playlist_info['video_count']}")
+                    st.info(f"📺 Kanal: {playlist_info['uploader']} | 🎵 Videos: {loaded if stream and stream['done'] else f'{loaded}+'}")
                     
                     # Aufräumen
                     time.sleep(1)
                     progress_bar.empty()
                     status_text.empty()
                     
+                    render_playlist_stream_status()
                     return True
                 
                 # Spezifische Fehlerbehandlung (bestehender Code)
@@ -1350,8 +3700,142 @@ def handle_playlist_url(cleaned_url):
             
             return False
     
+    render_playlist_stream_status()
     return True
 
+def render_preflight_report(videos):
+    """Zeige Schätzung (Dauer, Größe) der zu ladenden Titel und ausgelassene Einträge"""
+    dropped = st.session_state.get('playlist_dropped', [])
+    if not videos and not dropped:
+        return
+    
+    summary = format_preflight_summary(videos, dropped)
+    volume_count = len(split_batch_by_size(videos))
+    if volume_count > 1:
+        summary += f" - wird in ca. {volume_count} ZIP-Dateien zu je max. {get_setting('MAX_ZIP_SIZE_MB')} MB geliefert"
+    st.info(f"🧮 Vorab-Prüfung: {summary}")
+    if dropped:
+        with st.expander(f"⛔ {len(dropped)} nicht ladbare Einträge ausgelassen"):
+            for item in dropped:
+                st.write(f"• {item['title']} ({PREFLIGHT_REASON_LABELS[item['reason']]})")
+
+def render_playlist_stream_status():
+    """Zeige Nachlade-Status einer gestreamten Playlist"""
+    stream = st.session_state.get('playlist_stream')
+    if not stream:
+        return
+    
+    if stream['done']:
+        if stream.get('error'):
+            st.warning(f"⚠️ Playlist nur teilweise geladen ({len(stream['videos'])} Einträge): {stream['error']}")
+        return
+    
+    # Stand merken, den der aktuelle Lauf anzeigt
+    stream['rendered_count'] = len(stream['videos'])
+    _poll_playlist_stream()
+
+@st.experimental_fragment(run_every=1)
+def _poll_playlist_stream():
+    """Pollt das Nachladen und stößt einen App-Rerun an, sobald neue Seiten da sind"""
+    stream = st.session_state.get('playlist_stream')
+    if not stream:
+        return
+    
+    loaded = len(stream['videos'])
+    if stream['done'] or loaded - stream['rendered_count'] >= PLAYLIST_PAGE_SIZE:
+        st.rerun()
+    
+    st.progress(min(loaded / max(stream['expected_count'], 1), 1.0))
+    st.caption(f"⏳ {loaded} von bis zu {stream['expected_count']} Einträgen geladen - weitere werden im Hintergrund nachgeladen...")
+
+def render_selection_table(videos, is_mix):
+    """Titelauswahl als eine Tabelle mit Filter, Seiten und Sammelaktionen.
+    
+    Die Auswahl liegt als Set von Indizes in st.session_state.selected_videos,
+    gerendert wird pro Lauf nur die aktuelle Seite.
+    """
+    selected = st.session_state.selected_videos
+    content_type = "Songs" if is_mix else "Videos"
+    
+    col_filter, col_page = st.columns([3, 1])
+    with col_filter:
+        query = st.text_input("🔎 Filter (Titel oder Kanal):", key="selection_filter").strip().lower()
+    
+    if query:
+        matches = [
+            i for i, video in enumerate(videos)
+            if query in video['title'].lower() or query in str(video['uploader']).lower()
+        ]
+    else:
+        matches = list(range(len(videos)))
+    
+    # Bekannt nicht ladbare Titel markieren und von Sammelaktionen ausnehmen
+    known_bad = {}
+    for i in matches:
+        entry = lookup_negative(videos[i]['url'])
+        if entry:
+            known_bad[i] = NEGATIVE_REASON_LABELS[entry['reason']]
+    
+    page_count = max(1, -(-len(matches) // SELECTION_PAGE_SIZE))
+    with col_page:
+        page = st.number_input("Seite", min_value=1, max_value=page_count, value=1, step=1, key=f"selection_page_{query}")
+    
+    col_select1, col_select2, col_select3 = st.columns([1, 1, 2])
+    with col_select1:
+        label = "✅ Treffer auswählen" if query else "✅ Alle auswählen"
+        if st.button(label, use_container_width=True, key="pick_all"):
+            selected.update(i for i in matches if i not in known_bad)
+    
+    with col_select2:
+        label = "❌ Treffer abwählen" if query else "❌ Alle abwählen"
+        if st.button(label, use_container_width=True, key="pick_none"):
+            selected.difference_update(matches)
+    
+    page_indices = matches[(page - 1) * SELECTION_PAGE_SIZE:page * SELECTION_PAGE_SIZE]
+    rows = [
+        {
+            'Auswahl': i in selected,
+            'Nr': i + 1,
+            'Titel': videos[i]['title'],
+            'Dauer': format_duration(videos[i]['duration']),
+            'Kanal': videos[i]['uploader'],
+            'Status': f"⛔ {known_bad[i]}" if i in known_bad else ""
+        }
+        for i in page_indices
+    ]
+    
+    if rows:
+        edited_rows = st.data_editor(
+            rows,
+            key=f"selection_table_{page}_{query}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=['Nr', 'Titel', 'Dauer', 'Kanal', 'Status'],
+            column_config={
+                'Auswahl': st.column_config.CheckboxColumn("✓", width="small"),
+                'Nr': st.column_config.NumberColumn("Track" if is_mix else "Nr", width="small")
+            }
+        )
+        
+        # Änderungen der Seite in das Auswahl-Set übernehmen
+        for row in edited_rows:
+            if row['Auswahl']:
+                selected.add(row['Nr'] - 1)
+            else:
+                selected.discard(row['Nr'] - 1)
+        
+        render_preview_player(videos, page_indices, f"{page}_{query}")
+    else:
+        st.info("Keine Titel passen zum Filter.")
+    
+    with col_select3:
+        if selected:
+            st.write(f"🎵 {len(selected)} {content_type} ausgewählt")
+        if query:
+            st.caption(f"{len(matches)} von {len(videos)} {content_type} passen zum Filter")
+        if known_bad:
+            st.caption(f"⛔ {len(known_bad)} {content_type} bekannt nicht verfügbar (werden beim Download übersprungen)")
+
 def suggest_alternative_playlists():
     """Erweiterte Vorschläge für funktionierende Playlists"""
     st.info("**Testen Sie mit diesen funktionierenden Beispiel-Playlists:**")
@@ -1401,10 +3885,63 @@ def suggest_alternative_playlists():
     st.write("• Mix-Playlists funktionieren jetzt auch (bis zu 15 Songs)")
     st.write("• Manche sehr große Playlists (>1000 Videos) werden möglicherweise nicht vollständig geladen")
 
-def download_multiple_videos(video_urls, progress_callback=None, status_callback=None):
-    """Download mehrere Videos mit verbessertem Status-Feedback"""
+@profile_section('download_multiple_videos')
+def download_multiple_videos(video_urls, progress_callback=None, status_callback=None, file_callback=None, checkpoint=None, cancel_token=None):
+    """Download mehrere Videos mit verbessertem Status-Feedback.
+    
+    file_callback(file_path, title, index) erhält jeden Track, sobald er fertig ist.
+    Mit checkpoint (siehe open_batch_checkpoint) werden fertige Tracks im Journal
+    vermerkt und bereits fertige aus einem früheren Lauf ohne Download übernommen;
+    endgültig gescheiterte Tracks merkt sich der Checkpoint für batch_checkpoint_settled.
+    Bei Abbruch über cancel_token wird DownloadCancelled geworfen.
+    """
+    # Bekannt nicht ladbare Einträge gar nicht erst einplanen
+    all_urls = video_urls
+    video_urls, skipped_downloads = partition_negative_cached(video_urls)
+    if skipped_downloads and status_callback:
+        status_callback(f"{len(skipped_downloads)} bekannt nicht verfügbare Titel übersprungen")
+    if checkpoint:
+        remaining = {url for url, _ in video_urls}
+        for url, _ in all_urls:
+            if url not in remaining:
+                mark_batch_checkpoint_permanent(checkpoint, url)
+    
     downloaded_files = []
-    failed_downloads = []
+    pending = []
+    
+    def on_finished(file_path, title, index):
+        if checkpoint:
+            file_path = record_batch_checkpoint(checkpoint, video_urls[index][0], file_path, title, index)
+        downloaded_files.append((index, (file_path, title)))
+        if file_callback:
+            file_callback(file_path, title, index)
+    
+    def on_failed(url, error):
+        if checkpoint and classify_download_error(error) == 'permanent':
+            mark_batch_checkpoint_permanent(checkpoint, url)
+    
+    # Fertige Tracks eines abgebrochenen Laufs direkt übernehmen
+    for i, video_data in enumerate(video_urls):
+        restored = lookup_batch_checkpoint(checkpoint, video_data[0]) if checkpoint else None
+        if restored:
+            downloaded_files.append((i, restored))
+            if file_callback:
+                file_callback(restored[0], restored[1], i)
+        else:
+            pending.append((i, video_data))
+    if len(pending) < len(video_urls) and status_callback:
+        status_callback(f"♻️ {len(video_urls) - len(pending)} fertige Titel aus dem letzten Lauf übernommen")
+    
+    if DISTRIBUTED_MODE:
+        _, failed_downloads = download_multiple_videos_distributed(
+            [video_data for _, video_data in pending], progress_callback, status_callback,
+            lambda file_path, title, j: on_finished(file_path, title, pending[j][0]), cancel_token,
+            failure_callback=lambda j, error: on_failed(pending[j][1][0], error)
+        )
+        downloaded_files.sort(key=lambda item: item[0])
+        return [item for _, item in downloaded_files], skipped_downloads + failed_downloads
+    
+    failed_downloads = list(skipped_downloads)
     
     def download_single_video(video_data):
         url, title = video_data
@@ -1412,26 +3949,32 @@ def download_multiple_videos(video_urls, progress_callback=None, status_callback
             if status_callback:
                 status_callback(f"Lade: {title[:50]}...")
             
-            file_path, actual_title = download_audio_with_progress(url)
+            file_path, actual_title = download_audio_with_progress(url, cancel_token=cancel_token)
             if file_path:
                 return file_path, actual_title or title
             else:
+                on_failed(url, actual_title)
                 return None, f"Download fehlgeschlagen: {title}"
+        except DownloadCancelled:
+            raise
         except Exception as e:
+            on_failed(url, e)
             return None, f"Fehler bei {title}: {str(e)}"
     
     total_videos = len(video_urls)
-    completed = 0
+    completed = total_videos - len(pending)
     
     # Sequenzieller Download um Server nicht zu überlasten
-    for i, video_data in enumerate(video_urls):
+    for i, video_data in pending:
+        raise_if_cancelled(cancel_token)
         try:
             if status_callback:
                 status_callback(f"Video {i+1}/{total_videos}: {video_data[1][:40]}...")
             
             result = download_single_video(video_data)
+            raise_if_cancelled(cancel_token)
             if result[0]:  # Erfolgreicher Download
-                downloaded_files.append(result)
+                on_finished(result[0], result[1], i)
                 if status_callback:
                     status_callback(f"✅ Erfolgreich: {result[1][:40]}...")
             else:  # Fehlgeschlagener Download
@@ -1442,142 +3985,638 @@ def download_multiple_videos(video_urls, progress_callback=None, status_callback
             completed += 1
             if progress_callback:
                 progress_callback(int((completed / total_videos) * 100))
-                
+        
+        except DownloadCancelled:
+            raise
         except Exception as e:
             failed_downloads.append(f"Fehler: {str(e)}")
             completed += 1
             if progress_callback:
                 progress_callback(int((completed / total_videos) * 100))
     
-    return downloaded_files, failed_downloads
+    downloaded_files.sort(key=lambda item: item[0])
+    return [item for _, item in downloaded_files], failed_downloads
+
+# ===== BATCH-CHECKPOINTS =====
+@st.cache_resource(show_spinner=False)
+def get_checkpoint_registry():
+    """Checkpoints, die gerade von einem Batch dieses Prozesses benutzt werden"""
+    return {
+        'lock': threading.Lock(),
+        'active': set()
+    }
 
-def create_zip_file(file_paths_and_titles, zip_name="playlist_download.zip"):
-    """Erstelle ZIP-Datei mit verbesserter Fehlerbehandlung"""
-    zip_buffer = io.BytesIO()
+def open_batch_checkpoint(video_urls, owner=None):
+    """Journal für einen Batch öffnen. Derselbe Batch (gleiche URLs in gleicher
+    Reihenfolge) desselben Besitzers (Session/IP, siehe new_cancel_token) findet
+    nach Abbruch, Neustart oder Reconnect dasselbe Journal - fremde Nutzer mit
+    derselben Playlist bekommen eigene Checkpoints.
     
-    try:
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zip_file:
-            for i, (file_path, title) in enumerate(file_paths_and_titles):
-                if os.path.exists(file_path):
-                    # Bereinige Dateinamen und verhindere Duplikate
-                    safe_filename = clean_filename(f"{i+1:02d}_{title}.mp3")
-                    
-                    # Prüfe ob Datei zu groß ist
-                    file_size = os.path.getsize(file_path)
-                    if file_size > MAX_FILE_SIZE_MB * 1024 * 1024:
-                        print(f"Datei zu groß, überspringe: {safe_filename}")
-                        continue
-                    
-                    zip_file.write(file_path, safe_filename)
-                    print(f"Zu ZIP hinzugefügt: {safe_filename}")
-                    
-                    # Lösche temporäre Datei
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                else:
-                    print(f"Datei nicht gefunden: {file_path}")
-        
-        zip_buffer.seek(0)
-        zip_data = zip_buffer.getvalue()
-        
-        # Prüfe ZIP-Größe
-        zip_size_mb = len(zip_data) / (1024 * 1024)
-        print(f"ZIP erstellt: {zip_size_mb:.2f} MB")
-        
-        return zip_data
-        
-    except Exception as e:
-        print(f"Fehler beim Erstellen der ZIP-Datei: {str(e)}")
-        return None
-    finally:
-        zip_buffer.close()
+    Liefert None, wenn derselbe Batch in diesem Prozess bereits läuft.
+    """
+    scope = "\n".join([owner or ''] + [url for url, _ in video_urls])
+    key = hashlib.sha256(scope.encode('utf-8')).hexdigest()[:32]
+    registry = get_checkpoint_registry()
+    with registry['lock']:
+        if key in registry['active']:
+            return None
+        registry['active'].add(key)
+    
+    checkpoint_dir = os.path.join(BATCH_CHECKPOINT_DIR, key)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint = {
+        'key': key,
+        'dir': checkpoint_dir,
+        'journal': os.path.join(checkpoint_dir, 'journal.jsonl'),
+        'done': {},
+        'permanent': set()
+    }
+    if os.path.exists(checkpoint['journal']):
+        with open(checkpoint['journal'], encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Abgeschnittene letzte Zeile nach einem Absturz
+                checkpoint['done'][entry['url']] = entry
+        print(f"Checkpoint {key}: {len(checkpoint['done'])} fertige Titel im Journal")
+    return checkpoint
 
-def create_zip_download_link(zip_data, filename="playlist_download.zip"):
-    """Erstelle Download-Link für ZIP-Datei mit verbessertem Handling"""
-    try:
-        # Prüfe ZIP-Größe
-        zip_size_mb = len(zip_data) / (1024 * 1024)
-        print(f"ZIP-Größe: {zip_size_mb:.2f} MB")
-        
-        if zip_size_mb > MAX_ZIP_SIZE_MB:  # Limit für Browser-Download
-            return None, f"ZIP-Datei zu groß ({zip_size_mb:.1f}MB). Maximum für automatischen Download: {MAX_ZIP_SIZE_MB}MB"
-        
-        b64_data = base64.b64encode(zip_data).decode()
-        
-        download_script = f"""
-        <script>
-        function autoDownloadZip() {{
-            try {{
-                const link = document.createElement('a');
-                link.href = 'data:application/zip;base64,{b64_data}';
-                link.download = '{filename}';
-                link.style.display = 'none';
-                document.body.appendChild(link);
-                
-                // Trigger download
-                link.click();
-                
-                // Clean up
-                setTimeout(function() {{
-                    document.body.removeChild(link);
-                }}, 1000);
-                
-                console.log('ZIP download triggered successfully');
-            }} catch (error) {{
-                console.error('ZIP download failed:', error);
-                alert('Download fehlgeschlagen. Bitte verwenden Sie den Download-Button.');
-            }}
-        }}
-        
-        // Multiple attempts to ensure download
-        setTimeout(autoDownloadZip, 500);
-        setTimeout(autoDownloadZip, 2000);
-        </script>
-        """
-        
-        return download_script, None
-        
-    except Exception as e:
-        return None, f"Fehler beim Erstellen des Downloads: {str(e)}"
+def lookup_batch_checkpoint(checkpoint, url):
+    """(pfad, titel) eines bereits fertigen Tracks oder None"""
+    entry = checkpoint['done'].get(url)
+    if entry and os.path.exists(entry['path']):
+        return entry['path'], entry['title']
+    return None
+
+def record_batch_checkpoint(checkpoint, url, file_path, title, index):
+    """Fertigen Track in das Checkpoint-Verzeichnis verschieben und im Journal vermerken"""
+    target = os.path.join(checkpoint['dir'], f"{index + 1:03d}_{os.path.basename(file_path)}")
+    shutil.move(file_path, target)
+    shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    
+    entry = {'url': url, 'title': title, 'path': target, 'finished_at': time.time()}
+    with open(checkpoint['journal'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    checkpoint['done'][url] = entry
+    return target
+
+def mark_batch_checkpoint_permanent(checkpoint, url):
+    """Track als endgültig gescheitert merken (privat, entfernt, zu lang usw.)"""
+    checkpoint['permanent'].add(url)
+
+def batch_checkpoint_settled(checkpoint, video_urls):
+    """Ist jeder Track fertig oder endgültig gescheitert? Dann lohnt kein weiterer Lauf."""
+    return all(
+        lookup_batch_checkpoint(checkpoint, url) or url in checkpoint['permanent']
+        for url, _ in video_urls
+    )
+
+def close_batch_checkpoint(checkpoint, completed):
+    """Checkpoint freigeben; nach abgeschlossenem Lauf (siehe batch_checkpoint_settled) samt Dateien löschen"""
+    registry = get_checkpoint_registry()
+    with registry['lock']:
+        registry['active'].discard(checkpoint['key'])
+    if completed:
+        shutil.rmtree(checkpoint['dir'], ignore_errors=True)
+
+def cleanup_batch_checkpoints():
+    """Verwaiste Checkpoints (kein Fortschritt seit BATCH_CHECKPOINT_TTL_SECONDS) entfernen"""
+    if not os.path.isdir(BATCH_CHECKPOINT_DIR):
+        return
+    registry = get_checkpoint_registry()
+    cutoff = time.time() - BATCH_CHECKPOINT_TTL_SECONDS
+    for key in os.listdir(BATCH_CHECKPOINT_DIR):
+        checkpoint_dir = os.path.join(BATCH_CHECKPOINT_DIR, key)
+        with registry['lock']:
+            if key in registry['active']:
+                continue
+        try:
+            if os.path.getmtime(checkpoint_dir) < cutoff:
+                shutil.rmtree(checkpoint_dir, ignore_errors=True)
+                print(f"Checkpoint entfernt: {key}")
+        except OSError:
+            pass
+
+# ===== MEHRTEILIGE ZIP-AUSGABE =====
+def open_zip_volumes(base_name, work_dir, max_mb=None):
+    """Zustand für größenbegrenzte, eigenständige ZIP-Teile im Arbeitsverzeichnis"""
+    return {
+        'base_name': clean_filename(base_name) or 'playlist_download',
+        'work_dir': work_dir,
+        'max_bytes': (max_mb or get_setting('MAX_ZIP_SIZE_MB')) * 1024 * 1024,
+        'volumes': [],
+        'current': None
+    }
+
+def _start_zip_volume(state):
+    number = len(state['volumes']) + 1
+    name = f"{state['base_name']} - Teil {number}.zip"
+    path = os.path.join(state['work_dir'], name)
+    state['current'] = {
+        'number': number,
+        'name': name,
+        'path': path,
+        'tracks': [],
+        'size': 0,
+        'zip': zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6)
+    }
+    return state['current']
+
+def _finish_zip_volume(state, final=False):
+    """Manifest schreiben und den aktuellen Teil schließen"""
+    volume = state['current']
+    state['current'] = None
+    manifest = {
+        'source': state['base_name'],
+        'volume': volume['number'],
+        'final': final,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'tracks': volume['tracks']
+    }
+    volume['zip'].writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    volume['zip'].close()
+    del volume['zip']
+    volume['size'] = os.path.getsize(volume['path'])
+    state['volumes'].append(volume)
+    print(f"ZIP-Teil {volume['number']} fertig: {volume['name']} ({volume['size'] / (1024 * 1024):.2f} MB, {len(volume['tracks'])} Titel)")
+    return volume
+
+def file_sha256(file_path):
+    """SHA-256 einer Datei blockweise berechnen"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+@profile_section('add_to_zip_volumes')
+def add_to_zip_volumes(state, file_path, title, track_number, remove_source=True):
+    """Track in den laufenden Teil schreiben (Quelldatei wird danach gelöscht,
+    außer remove_source=False - z.B. wenn sie zu einem Checkpoint gehört).
+    
+    Würde der Teil MAX_ZIP_SIZE_MB überschreiten, wird er vorher abgeschlossen
+    und zurückgegeben, damit er sofort ausgeliefert werden kann; sonst None.
+    """
+    if not file_path or not os.path.exists(file_path):
+        print(f"Datei nicht gefunden: {file_path}")
+        return None
+    
+    entry_name = clean_filename(f"{track_number:02d}_{title}.mp3")
+    file_size = os.path.getsize(file_path)
+    if file_size > get_setting('MAX_FILE_SIZE_MB') * 1024 * 1024:
+        print(f"Datei zu groß, überspringe: {entry_name}")
+        if remove_source:
+            os.remove(file_path)
+        return None
+    
+    finished = None
+    current = state['current']
+    if current and current['tracks'] and current['size'] + file_size > state['max_bytes']:
+        finished = _finish_zip_volume(state)
+    current = state['current'] or _start_zip_volume(state)
+    
+    sha256 = file_sha256(file_path)
+    current['zip'].write(file_path, entry_name)
+    current['size'] += file_size
+    current['tracks'].append({
+        'track': track_number,
+        'title': title,
+        'file': entry_name,
+        'size_bytes': file_size,
+        'sha256': sha256
+    })
+    print(f"Zu ZIP-Teil {current['number']} hinzugefügt: {entry_name}")
+    
+    if remove_source:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+    return finished
 
-def create_streamlit_download_button(zip_data, filename="playlist_download.zip"):
-    """Erstelle Streamlit Download-Button als Fallback"""
+@profile_section('close_zip_volumes')
+def close_zip_volumes(state):
+    """Letzten Teil abschließen; bei nur einem Teil trägt er den Namen ohne Teilnummer"""
+    if not state['current']:
+        return None
+    volume = _finish_zip_volume(state, final=True)
+    if volume['number'] == 1:
+        single_path = os.path.join(state['work_dir'], f"{state['base_name']}.zip")
+        os.replace(volume['path'], single_path)
+        volume['path'] = single_path
+        volume['name'] = os.path.basename(single_path)
+    return volume
+
+@profile_section('download_batch_as_volumes')
+def download_batch_as_volumes(video_urls, base_name, work_dir, progress_callback=None, status_callback=None, volume_callback=None, cancel_token=None):
+    """Batch laden und fertige Tracks sofort in ZIP-Teile schreiben.
+    
+    volume_callback(volume) wird für jeden abgeschlossenen Teil aufgerufen,
+    der erste Teil ist also fertig, lange bevor der letzte Track geladen ist.
+    Liefert (volumes, failed_downloads).
+    """
+    state = open_zip_volumes(base_name, work_dir)
+    # Fertige Tracks überleben Abbruch/Neustart im Checkpoint und werden erst gelöscht,
+    # wenn jeder Track fertig oder endgültig gescheitert ist
+    checkpoint = open_batch_checkpoint(video_urls, cancel_token['owner'] if cancel_token else None)
+    completed = False
+    
+    def on_file(file_path, title, index):
+        raise_if_cancelled(cancel_token)
+        enter_stage(cancel_token, 'archive')
+        finished = add_to_zip_volumes(state, file_path, title, index + 1, remove_source=checkpoint is None)
+        enter_stage(cancel_token, None)
+        if finished and volume_callback:
+            volume_callback(finished)
+    
     try:
-        return st.download_button(
-            label="📥 ZIP-Datei herunterladen",
-            data=zip_data,
-            file_name=filename,
+        _, failed_downloads = download_multiple_videos(
+            video_urls, progress_callback, status_callback, file_callback=on_file, checkpoint=checkpoint,
+            cancel_token=cancel_token
+        )
+        completed = checkpoint is not None and batch_checkpoint_settled(checkpoint, video_urls)
+    finally:
+        last = close_zip_volumes(state)
+        if checkpoint:
+            close_batch_checkpoint(checkpoint, completed)
+    if last and volume_callback:
+        volume_callback(last)
+    return state['volumes'], failed_downloads
+
+def render_zip_volume(volume):
+    """Einen fertigen ZIP-Teil als Download-Button anbieten.
+    
+    Streamlit liest die Datei einmal aus dem Handle; ein zusätzlicher Base64-Auto-Download
+    würde jeden Teil (bis MAX_ZIP_SIZE_MB) ein weiteres Mal im Speicher halten.
+    """
+    st.markdown(f"**📦 {volume['name']}** - {len(volume['tracks'])} Titel, {volume['size'] / (1024 * 1024):.1f} MB")
+    with open(volume['path'], 'rb') as f:
+        st.download_button(
+            label=f"📥 {volume['name']} herunterladen",
+            data=f,
+            file_name=volume['name'],
             mime="application/zip",
             use_container_width=True,
-            type="primary"
+            key=f"zip_volume_{volume['path']}"
         )
-    except Exception as e:
-        st.error(f"Download-Button Fehler: {str(e)}")
-        return False
+
+def render_zip_volume_ready(volume):
+    """Fertigen Teil während des Batches nur ankündigen - ein Download-Button würde beim
+    Klick das Skript neu starten und damit den laufenden Batch abbrechen"""
+    st.markdown(f"**📦 {volume['name']}** fertig - {len(volume['tracks'])} Titel, {volume['size'] / (1024 * 1024):.1f} MB (Download nach Abschluss)")
+
+# ===== ZIP-ERGEBNISSE DER UI =====
+@st.cache_resource(show_spinner=False)
+def get_ui_result_registry():
+    """Arbeitsverzeichnisse mit fertigen ZIP-Teilen der UI-Sessions (Pfad -> Anlagezeitpunkt)"""
+    return {
+        'lock': threading.Lock(),
+        'dirs': {}
+    }
+
+def new_ui_result_dir():
+    """Arbeitsverzeichnis für einen Batch der UI anlegen und für die Haushaltung vormerken"""
+    work_dir = tempfile.mkdtemp(prefix='ytac_zip_')
+    registry = get_ui_result_registry()
+    with registry['lock']:
+        registry['dirs'][work_dir] = time.time()
+    return work_dir
+
+def remove_ui_result_dir(work_dir):
+    """Arbeitsverzeichnis samt ZIP-Teilen löschen"""
+    registry = get_ui_result_registry()
+    with registry['lock']:
+        registry['dirs'].pop(work_dir, None)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+def store_zip_results(title, work_dir, volumes, summary):
+    """Fertige ZIP-Teile in der Session ablegen; render_zip_results zeigt sie bei jedem Rerun"""
+    st.session_state.zip_results = {
+        'title': title,
+        'work_dir': work_dir,
+        'volumes': volumes,
+        'summary': summary,
+        'auto_download_triggered': False
+    }
+
+def discard_zip_results():
+    """Ergebnisse der Session verwerfen (neuer Batch oder Schließen-Knopf)"""
+    results = st.session_state.get('zip_results')
+    if results:
+        remove_ui_result_dir(results['work_dir'])
+    st.session_state.zip_results = None
+
+def cleanup_ui_results():
+    """Ergebnisverzeichnisse nach UI_RESULT_TTL_SECONDS entfernen (auch verlassener Sessions)"""
+    registry = get_ui_result_registry()
+    cutoff = time.time() - UI_RESULT_TTL_SECONDS
+    with registry['lock']:
+        expired = [work_dir for work_dir, created in registry['dirs'].items() if created < cutoff]
+    for work_dir in expired:
+        remove_ui_result_dir(work_dir)
+        print(f"ZIP-Ergebnis entfernt: {work_dir}")
+
+def render_zip_results():
+    """ZIP-Teile des letzten Batches anbieten - bei jedem Rerun, denn ein Klick auf einen
+    Download-Button startet das Skript neu und darf die übrigen Teile nicht verlieren"""
+    results = st.session_state.get('zip_results')
+    if not results:
+        return
+    volumes = [volume for volume in results['volumes'] if os.path.exists(volume['path'])]
+    if not volumes:
+        # Von der Haushaltung entfernt
+        st.session_state.zip_results = None
+        return
+    
+    st.markdown(f"### 📦 {results['title']}")
+    st.info(results['summary'])
+    for volume in volumes:
+        render_zip_volume(volume)
+    
+    if len(volumes) == 1 and not results['auto_download_triggered']:
+        # Auto-Download über den Button selbst (Streamlit liefert die Datei aus, kein Base64)
+        label = json.dumps(volumes[0]['name']).replace('</', '<\\/')
+        st.components.v1.html(f"""
+        <script>
+        setTimeout(function() {{
+            const buttons = window.parent.document.querySelectorAll('[data-testid="stDownloadButton"] button');
+            for (const button of buttons) {{
+                if (button.innerText.includes({label})) {{ button.click(); break; }}
+            }}
+        }}, 500);
+        </script>
+        """, height=0)
+        results['auto_download_triggered'] = True
+    
+    if st.button("🗑️ Ergebnis schließen", key="close_zip_results"):
+        discard_zip_results()
+        st.rerun()
+
+# ===== UI-JOBS (HINTERGRUND-THREAD) =====
+def start_ui_job(kind, cancel_token, work, **fields):
+    """Download der UI in einem eigenen Thread starten; der Skriptlauf endet sofort.
+    
+    work(job) läuft ohne Streamlit-Kontext und schreibt Fortschritt und Ergebnis nur
+    in das Job-Dict (wie der Playlist-Stream). Da der Skript-Thread frei bleibt, kann
+    ein normaler Streamlit-Button den Job über cancel_job abbrechen (siehe render_ui_job).
+    """
+    job = {
+        'id': cancel_token['id'],
+        'kind': kind,
+        'token': cancel_token,
+        'state': 'running',  # running | done | cancelled | failed
+        'progress': 0,
+        'status': "Download wird gestartet...",
+        'detail': '',
+        'volumes': [],
+        'result': None,
+        'error': None,
+        **fields
+    }
+    
+    def run():
+        profile = None
+        try:
+            # UI-Jobs nur über PROFILE_SLOW_SECONDS (die UI kennt keine Admin-Anmeldung)
+            profile = start_job_profile(cancel_token['id'])
+            job['result'] = work(job)
+            job['state'] = 'cancelled' if is_cancelled(cancel_token) else 'done'
+        except DownloadCancelled:
+            job['state'] = 'cancelled'
+        except Exception as e:
+            job['error'] = str(e)
+            job['state'] = 'failed'
+        finally:
+            finish_job_profile(profile)
+            release_cancel_token(cancel_token)
+    
+    st.session_state.ui_job = job
+    threading.Thread(target=run, name=f"ui-job-{job['id'][:8]}", daemon=True).start()
+    return job
+
+def run_batch_ui_job(job, videos):
+    """Batch im Hintergrund-Thread: fertige ZIP-Teile landen sofort in job['volumes']"""
+    def on_progress(percent):
+        job['progress'] = percent
+        job['status'] = f"{job['download_label']} läuft... {percent}%"
+    
+    def on_status(message):
+        job['detail'] = message
+    
+    job['status'] = f"Starte {job['download_label']}..."
+    volumes, failed_downloads = download_batch_as_volumes(
+        videos, job['title'], job['work_dir'], on_progress, on_status, job['volumes'].append,
+        cancel_token=job['token']
+    )
+    return {'volumes': volumes, 'failed': failed_downloads}
+
+def run_video_ui_job(job, clip):
+    """Einzelvideo im Hintergrund-Thread; das MP3 wandert ins Arbeitsverzeichnis des Jobs,
+    damit die Haushaltung es auch dann entfernt, wenn die Session nie zurückkommt"""
+    def on_progress(percent):
+        job['progress'] = percent
+        job['status'] = f"Download läuft... {percent}%" if percent < 100 else "Download abgeschlossen!"
+    
+    file_path, result = convert_video(job['url'], on_progress, clip, job['token'])
+    if not file_path or not os.path.exists(file_path):
+        return {'file_path': None, 'error': result}
+    
+    job['status'] = "Datei wird vorbereitet..."
+    target = os.path.join(job['work_dir'], job['filename'])
+    shutil.move(file_path, target)
+    shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    return {'file_path': target, 'filename': job['filename']}
+
+def is_ui_job_running():
+    """Läuft in dieser Session bereits ein Download im Hintergrund?"""
+    job = st.session_state.get('ui_job')
+    return bool(job and job['state'] == 'running')
+
+def render_ui_job():
+    """Laufenden UI-Job anzeigen bzw. einen beendeten Job abschließen.
+    Liefert den in diesem Lauf abgeschlossenen Job oder None."""
+    job = st.session_state.get('ui_job')
+    if not job:
+        return None
+    if job['state'] == 'running':
+        _poll_ui_job()
+        return None
+    
+    st.session_state.ui_job = None
+    release_download_slot()
+    if job['kind'] == 'batch':
+        finish_batch_job(job)
+    else:
+        finish_video_job(job)
+    return job
+
+@st.experimental_fragment(run_every=UI_JOB_POLL_SECONDS)
+def _poll_ui_job():
+    """Fortschritt und Abbrechen-Knopf; stößt nach Job-Ende einen App-Rerun an"""
+    job = st.session_state.get('ui_job')
+    if not job:
+        return
+    if job['state'] != 'running':
+        st.rerun()
+    
+    if job.get('title'):
+        st.write(f"**{job['title']}**")
+    st.progress(min(int(job['progress']), 100))
+    st.text(job['status'])
+    if job['detail']:
+        st.caption(job['detail'])
+    for volume in list(job['volumes']):
+        render_zip_volume_ready(volume)
+    if is_cancelled(job['token']):
+        st.caption("⏹️ Wird abgebrochen...")
+    elif st.button("⏹️ Abbrechen", key=f"cancel_{job['id']}", use_container_width=True):
+        cancel_job(job['token'], "vom Nutzer abgebrochen")
+        st.caption("⏹️ Wird abgebrochen...")
+
+def finish_batch_job(job):
+    """Ergebnis eines Batch-Jobs anzeigen und die fertigen ZIP-Teile ablegen"""
+    st.session_state.batch_download_in_progress = False
+    volumes = (job['result'] or {}).get('volumes') or []
+    if job['state'] == 'cancelled':
+        remove_ui_result_dir(job['work_dir'])
+        st.warning("⏹️ Download abgebrochen - bereits fertige Titel werden beim nächsten Start übernommen")
+        return
+    if job['state'] == 'failed':
+        remove_ui_result_dir(job['work_dir'])
+        st.error(f"❌ Batch-Download Fehler: {job['error']}")
+        return
+    if not volumes:
+        remove_ui_result_dir(job['work_dir'])
+        st.error("❌ Alle Downloads fehlgeschlagen")
+        return
+    
+    success_count = sum(len(volume['tracks']) for volume in volumes)
+    total_size_mb = sum(volume['size'] for volume in volumes) / (1024 * 1024)
+    content_info = f"📊 ZIP-Größe: {total_size_mb:.2f} MB in {len(volumes)} Datei(en) | {job['content_type']}: {success_count}"
+    if job['is_mix'] and not job['selection']:
+        content_info += " | 🎵 Mix-Songs von YouTube generiert"
+    # Teile überdauern Reruns (Klick auf einen Download-Button) bis zur Haushaltung
+    store_zip_results(job['title'], job['work_dir'], volumes, f"✅ {job['ready_message']} {content_info}")
+    
+    st.session_state.selected_videos = set()
+    if not job['selection']:
+        # Komplett-Download: Session zurücksetzen; die Auswahl behält die Playlist für weitere Auswahl
+        st.session_state.playlist_videos = []
+        cancel_playlist_stream()
+        st.session_state.clear_input = True
+        st.session_state.input_key += 1
+    st.rerun()
+
+def finish_video_job(job):
+    """Ergebnis eines Einzelvideo-Jobs anzeigen (Auto-Download bzw. Fehleranalyse)"""
+    st.session_state.current_download = False
+    st.session_state.download_finished = True
+    result = job['result'] or {}
+    
+    if job['state'] == 'done' and result.get('file_path'):
+        st.session_state.download_completed = True
+        st.session_state.download_count += 1
+        file_path = result['file_path']
+        file_size = os.path.getsize(file_path) / (1024 * 1024)
+        print(f"Download erfolgreich: {file_path} ({file_size:.2f} MB)")
+        
+        if not st.session_state.auto_download_triggered:
+            download_script = create_download_link_and_clear_input(file_path, result['filename'])
+            st.components.v1.html(download_script, height=0)
+            st.session_state.auto_download_triggered = True
+            st.session_state.file_saved = True
+        remove_ui_result_dir(job['work_dir'])
+        
+        st.success("✅ Download erfolgreich!")
+        st.info(f"📊 Dateigröße: {file_size:.2f} MB")
+        
+        # Input-Feld leeren
+        st.session_state.clear_input = True
+        st.session_state.input_key += 1
+        st.session_state.cleaned_url = ""
+        
+        time.sleep(2)
+        st.rerun()
+    
+    remove_ui_result_dir(job['work_dir'])
+    if job['state'] == 'cancelled':
+        st.warning("⏹️ Download abgebrochen")
+        return
+    
+    if job['state'] == 'failed':
+        # Unerwartete Ausnahme im Job
+        error_msg = job['error']
+        st.error(f"❌ Kritischer Fehler: {error_msg}")
+        with st.expander("🐛 Debug-Informationen"):
+            st.code(f"Fehler: {error_msg}")
+            st.code(f"URL: {job['url']}")
+            st.code(f"Video-ID: {job['video_id']}")
+            issues = diagnose_download_issues()
+            if issues:
+                st.write("**System-Probleme:**")
+                for issue in issues:
+                    st.error(f"• {issue}")
+        return
+    
+    # Detaillierte Fehleranalyse
+    error_details = result.get('error') or "Unbekannter Fehler"
+    st.error(f"❌ Download fehlgeschlagen: {error_details}")
+    
+    # Hilfreiche Tipps basierend auf dem Fehler
+    if "unavailable" in error_details.lower():
+        st.info("💡 **Tipp:** Video wurde möglicherweise entfernt oder ist privat")
+    elif "region" in error_details.lower():
+        st.info("💡 **Tipp:** Video ist in Ihrer Region gesperrt")
+    elif "age" in error_details.lower():
+        st.info("💡 **Tipp:** Altersverifizierung erforderlich")
+    elif "timeout" in error_details.lower():
+        st.info("💡 **Tipp:** Versuchen Sie es bei besserer Internetverbindung erneut")
+    else:
+        st.info("💡 **Tipp:** Überprüfen Sie die URL und versuchen Sie es erneut")
+    
+    # Debug-Button für detaillierte Diagnose
+    if st.button("🔧 Detaillierte Diagnose"):
+        issues = diagnose_download_issues()
+        if issues:
+            st.error("System-Probleme gefunden:")
+            for issue in issues:
+                st.error(f"• {issue}")
+        else:
+            st.info("System-Komponenten scheinen in Ordnung zu sein")
 
 def get_video_info(url):
     """Hole Video-Informationen ohne Download mit Sicherheitschecks"""
+    # Negativ-Cache vor der Client-Auswahl - ein Treffer darf keinen Probe verbrauchen
+    if lookup_negative(url, where='video_info'):
+        return None
+    # Gleiche adaptive Client-Reihenfolge wie im Downloader für Konsistenz
+    player_clients = order_player_clients(DEFAULT_PLAYER_CLIENTS)
+    failed_clients = set()
     try:
         ydl_opts = {
             'quiet': True,
-            'no_warnings': True,
+            'no_warnings': False,  # Warnungen werden vom Logger ausgewertet, nicht ausgegeben
+            'logger': make_client_logger(failed_clients, quiet=True),
             'extract_flat': False,
-            'socket_timeout': 30,
+            'socket_timeout': get_setting('YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS'),
             'extractor_args': {
                 'youtube': {
-                    # Gleiche Client-Reihenfolge wie im Downloader für Konsistenz
-                    'player_client': ['web', 'web_embedded', 'ios', 'tv', 'web_creator', 'android'],
+                    'player_client': player_clients,
                 }
             }
         }
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            extract_start = time.time()
             info = ydl.extract_info(url, download=False)
+            record_client_results(player_clients, True, time.time() - extract_start, failed_clients)
             
             # Dauer-Check
             duration = info.get('duration', 0)
             if duration and duration > MAX_VIDEO_DURATION:
+                remember_negative(url, 'too_long', "Video zu lang (max. 1 Stunde)")
                 return None
             
             # Sichere Dauer-Behandlung
@@ -1589,10 +4628,16 @@ def get_video_info(url):
                 'duration': duration,
                 'uploader': info.get('uploader', 'Unbekannt'),
                 'view_count': info.get('view_count', 0),
-                'thumbnail': info.get('thumbnail', '')
+                'thumbnail': info.get('thumbnail', ''),
+                'estimated_size_mb': predict_mp3_size_mb(duration)
             }
     except Exception as e:
+        record_client_failure(player_clients, str(e), failed_clients)
+        remember_negative_error(url, e)
         return None
+    finally:
+        # Nicht gewerteter Probe (z.B. Video nicht verfügbar, Streamlit-Stop) wird wieder frei
+        release_client_probes(player_clients)
 
 def format_duration(seconds):
     """Formatiere Dauer in MM:SS Format - korrigierte Version"""
@@ -1607,6 +4652,57 @@ def format_duration(seconds):
             return "00:00"
     return "00:00"
 
+def parse_timestamp(value):
+    """Zeitangabe (Sekunden, MM:SS oder HH:MM:SS) in Sekunden umwandeln; leer -> None"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Ungültige Zeitangabe")
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        parts = str(value).strip().split(':')
+        if len(parts) > 3:
+            raise ValueError(f"Ungültige Zeitangabe: {value}")
+        try:
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError(f"Ungültige Zeitangabe: {value}")
+        if any(float(part) >= 60 for part in parts[1:]):
+            raise ValueError(f"Ungültige Zeitangabe: {value}")
+    if seconds < 0 or seconds != seconds:
+        raise ValueError(f"Ungültige Zeitangabe: {value}")
+    return seconds
+
+def parse_clip_range(start, end):
+    """Start/Ende eines Ausschnitts prüfen. Liefert (start, ende|None) oder None für das ganze Video"""
+    start_seconds = parse_timestamp(start)
+    end_seconds = parse_timestamp(end)
+    if start_seconds is None and end_seconds is None:
+        return None
+    start_seconds = start_seconds or 0.0
+    if end_seconds is not None and end_seconds <= start_seconds:
+        raise ValueError("Das Ende muss nach dem Start liegen")
+    return start_seconds, end_seconds
+
+def resolve_clip_range(clip, duration):
+    """Ausschnitt an die tatsächliche Videolänge anpassen (offenes Ende = Videoende)"""
+    start, end = clip
+    if duration:
+        if start >= duration:
+            raise Exception(f"Startzeit {format_duration(start)} liegt hinter dem Videoende ({format_duration(duration)})")
+        end = min(end, duration) if end is not None else duration
+    elif end is None:
+        raise Exception("Videolänge unbekannt - bitte ein Ende für den Ausschnitt angeben")
+    return start, end
+
+def format_clip_label(clip):
+    """Kurzform eines Ausschnitts für Dateinamen, z.B. '(01.30-04.05)'"""
+    start, end = clip
+    return f"({format_duration(start).replace(':', '.')}-{format_duration(end).replace(':', '.')})"
+
 def is_valid_youtube_url(url):
     """YouTube URL Validierung - unterstützt Video+Playlist Kombinationen"""
     if not url or len(url) < 10:
@@ -1720,6 +4816,15 @@ def inject_hidden_ad_slots():
     </div>
     """
 
+@st.cache_resource(show_spinner=False)
+def get_static_assets():
+    """Statische HTML/CSS-Blöcke einmal pro Prozess aufbauen"""
+    return {
+        'css': HIDE_STREAMLIT_STYLE,
+        # Werbeplätze und Analytics teilen sich ein einziges unsichtbares iframe
+        'hidden_html': inject_hidden_ad_slots() + ANALYTICS_SNIPPET
+    }
+
 def main():
     st.set_page_config(
         page_title="YouTube Audio Converter",
@@ -1728,115 +4833,37 @@ def main():
         initial_sidebar_state="collapsed"
     )
     
-    # CSS zum Verstecken des Deploy Buttons, Menüs und Streamlit Branding
-    hide_streamlit_style = """
-    <style>
-    .stDeployButton {
-        display: none !important;
-    }
-    
-    header[data-testid="stHeader"] {
-        display: none !important;
-    }
-    
-    [data-testid="stToolbar"] {
-        display: none !important;
-    }
-    
-    .stAppHeader {
-        display: none !important;
-    }
-    
-    footer {
-        visibility: hidden !important;
-        height: 0% !important;
-    }
-    
-    #MainMenu {
-        visibility: hidden !important;
-    }
-    
-    .stAppFooter {
-        display: none !important;
-    }
-    
-    [data-testid="stDecoration"] {
-        display: none !important;
-    }
-    
-    [data-testid="stStatusWidget"] {
-        display: none !important;
-    }
-    
-    .viewerBadge_container__1QSob {
-        display: none !important;
-    }
-    
-    .stAppViewContainer > .main .block-container {
-        padding-top: 1rem !important;
-    }
-    
-    .stActionButton {
-        display: none !important;
-    }
-    
-    .video-item {
-        border: 1px solid #ddd;
-        border-radius: 8px;
-        padding: 10px;
-        margin: 5px 0;
-        background-color: #f9f9f9;
-    }
-    
-    .selected-video {
-        background-color: #e3f2fd !important;
-        border-color: #2196f3 !important;
-    }
-    
-    .download-section {
-        background-color: #f0f8ff;
-        padding: 20px;
-        border-radius: 10px;
-        border: 2px solid #4CAF50;
-        margin: 20px 0;
-    }
+    # Bereinigung/GC laufen im Hintergrund statt bei jedem Rerun
+    start_housekeeping_scheduler()
+    if API_ENABLED:
+        start_api_server()
     
-    .special-url-info {
-        background-color: #fff3cd;
-        padding: 15px;
-        border-radius: 8px;
-        border-left: 4px solid #ffc107;
-        margin: 15px 0;
-    }
-    
-    .mix-info {
-        background-color: #e8f5e8;
-        padding: 15px;
-        border-radius: 8px;
-        border-left: 4px solid #28a745;
-        margin: 15px 0;
-    }
-    </style>
-    """
-    
-    st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+    rerun_start = time.perf_counter()
+    try:
+        render_app()
+    finally:
+        record_rerun_duration((time.perf_counter() - rerun_start) * 1000)
+
+def render_app():
+    """Baue die Oberfläche für einen Rerun auf"""
+    assets = get_static_assets()
     
-    # Periodische Bereinigung alter Daten
-    cleanup_old_tracking_data()
+    # CSS zum Verstecken des Deploy Buttons, Menüs und Streamlit Branding
+    st.markdown(assets['css'], unsafe_allow_html=True)
     
     # Session ID generieren
     if 'session_id' not in st.session_state:
         st.session_state.session_id = hashlib.md5(str(time.time()).encode()).hexdigest()
     
-    # Versteckte Werbeplatzhalter einfügen
-    st.components.v1.html(inject_hidden_ad_slots(), height=0)
+    # Versteckte Werbeplatzhalter und Analytics einfügen (ein iframe)
+    st.components.v1.html(assets['hidden_html'], height=0)
     
     # Header
     st.title("🎵 YouTube Audio Converter")
     st.markdown("**Schneller MP3 Download von YouTube Videos, Playlists und Mixes**")
     
     # Versteckter Header-Werbeplatz
-    st.components.v1.html("<!-- AD_HEADER_PLACEHOLDER -->", height=0)
+    st.markdown("<!-- AD_HEADER_PLACEHOLDER -->", unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -1865,8 +4892,12 @@ def main():
         st.session_state.is_playlist_mode = False
     
     # Sicherheitschecks
-    client_ip = get_client_ip()
+    # IP bzw. ohne erkennbare IP die Session: Schlüssel für IP-Limits und Download-Pool
+    client_key = get_client_key()
     session_id = get_session_id()
+    scheduler_owner = client_key
+    # Sofort-Wiedergabe nur, wenn der Browser den Stream-Endpunkt erreicht
+    progressive_available = api_reachable_from_browser()
     
     # Systemressourcen prüfen
     resources_ok, resource_msg = check_system_resources()
@@ -1886,6 +4917,24 @@ def main():
             key=f"url_input_{st.session_state.input_key}",
             value="" if st.session_state.clear_input else st.session_state.get("last_url", "")
         )
+        if progressive_available:
+            st.toggle(
+                "⚡ Sofort-Wiedergabe: MP3 wird gestreamt, während es noch konvertiert wird",
+                key="progressive_mode",
+                help="Nur Einzelvideos. Wiedergabe und Speichern beginnen nach wenigen Sekunden."
+            )
+        with st.expander("✂️ Nur einen Ausschnitt laden (Einzelvideos)"):
+            clip_col1, clip_col2 = st.columns(2)
+            with clip_col1:
+                st.text_input("Start", key="clip_start", placeholder="z.B. 12:30")
+            with clip_col2:
+                st.text_input("Ende", key="clip_end", placeholder="leer = bis zum Ende")
+            st.caption("Es werden nur die benötigten Daten dieses Zeitraums geladen und konvertiert.")
+        
+        # Laufender Download (Fortschritt, Abbrechen) bzw. Abschluss eines fertigen
+        finished_job = render_ui_job()
+        # ZIP-Teile des letzten Batches bleiben über Reruns hinweg abrufbar
+        render_zip_results()
         
         # Reset clear_input flag
         if st.session_state.clear_input:
@@ -1921,7 +4970,7 @@ def main():
                         st.code(f"Bereinigt: {cleaned_url}")
                         st.code(f"Typ: {special_info['type']}")
                         st.code(f"Aktion: Mix-Extraktion")
-                        st.code(f"Max Songs: {MAX_MIX_SIZE}")
+                        st.code(f"Max Songs: {get_setting('MAX_MIX_SIZE')}")
                         
                 elif converted_url:
                     # Andere spezielle URLs - verwende konvertierte URL für Einzelvideo-Download
@@ -1973,156 +5022,62 @@ def main():
                 if dl_mode == "Komplette Playlist/Mix herunterladen":
                     # Hinweis und Direktladung
                     if is_mix:
-                        st.info("🎵 Mix-URL erkannt - extrahiere bis zu {0} Songs...".format(MAX_MIX_SIZE))
+                        st.info("🎵 Mix-URL erkannt - extrahiere bis zu {0} Songs...".format(get_setting('MAX_MIX_SIZE')))
                     else:
-                        st.info("📋 Playlist-URL erkannt - lade bis zu {0} Videos...".format(MAX_PLAYLIST_SIZE))
+                        st.info("📋 Playlist-URL erkannt - lade bis zu {0} Videos...".format(get_setting('MAX_PLAYLIST_SIZE')))
 
                     if handle_playlist_url(cleaned_url) and st.session_state.playlist_videos:
                         # Standard: alle Elemente vorselektieren
-                        st.session_state.selected_videos = list(range(len(st.session_state.playlist_videos)))
+                        st.session_state.selected_videos = set(range(len(st.session_state.playlist_videos)))
 
+                        render_preflight_report(st.session_state.playlist_videos)
+                        
                         # Direkt-Download-Button für komplette Auswahl
                         total_items = len(st.session_state.playlist_videos)
                         content_type = "Songs" if is_mix else "Videos"
                         button_text = f"⬇️ Komplette {('Mix' if is_mix else 'Playlist')} als ZIP herunterladen ({total_items} {content_type})"
 
-                        if st.button(button_text, type="primary", use_container_width=True, key="download_all_playlist"):
+                        if is_ui_job_running():
+                            st.info("⏳ Es läuft bereits ein Download - bitte warten oder abbrechen.")
+                        elif st.button(button_text, type="primary", use_container_width=True, key="download_all_playlist"):
                             # Rate Limiting prüfen
-                            rate_ok, rate_msg = check_rate_limit(client_ip, session_id)
+                            rate_ok, rate_msg = check_rate_limit(client_key, session_id)
                             if not rate_ok:
                                 st.warning(f"🚫 {rate_msg}")
                                 return
 
                             # Batch starten
                             st.session_state.batch_download_in_progress = True
-                            update_download_tracking(client_ip, session_id)
+                            update_download_tracking(client_key, session_id)
+
+                            # Komplett-Download braucht alle Einträge der Playlist
+                            wait_for_playlist_stream()
 
                             videos_to_download = [
                                 (item['url'], item['title'])
                                 for item in st.session_state.playlist_videos
                             ]
 
-                            # Progress-Anzeige
-                            progress_bar = st.progress(0)
-                            status_text = st.empty()
-                            detail_text = st.empty()
-
-                            def update_batch_progress(percent):
-                                progress_bar.progress(percent)
-                                download_type = "Mix-Download" if is_mix else "Playlist-Download"
-                                status_text.text(f"{download_type} läuft... {percent}%")
-
-                            def update_status(message):
-                                detail_text.text(message)
-
-                            status_text.text(f"Starte {('Mix' if is_mix else 'Playlist')}-Download...")
-
-                            try:
-                                downloaded_files, failed_downloads = download_multiple_videos(
-                                    videos_to_download, update_batch_progress, update_status
-                                )
-
-                                if downloaded_files:
-                                    status_text.text("Erstelle ZIP-Datei...")
-                                    detail_text.text("Komprimiere heruntergeladene Dateien...")
-
-                                    # ZIP-Dateiname anhand Playlisten-/Mixtitel wählen
-                                    playlist_title = None
-                                    try:
-                                        if is_mix:
-                                            mix_info = extract_mix_playlist_info(cleaned_url)
-                                            if mix_info and mix_info.get('title'):
-                                                playlist_title = mix_info['title']
-                                        else:
-                                            pl_info = extract_playlist_info(cleaned_url)
-                                            if pl_info and pl_info.get('title'):
-                                                playlist_title = pl_info['title']
-                                    except Exception:
-                                        playlist_title = None
-
-                                    if not playlist_title:
-                                        filename_prefix = "mix" if is_mix else "playlist"
-                                        playlist_title = f"{filename_prefix}_download"
-
-                                    zip_filename = clean_filename(f"{playlist_title}")
-                                    zip_data = create_zip_file(downloaded_files, f"{zip_filename}.zip")
-
-                                    if zip_data:
-                                        progress_bar.progress(100)
-                                        status_text.text("ZIP-Datei erstellt!")
-                                        detail_text.text("Bereite Download vor...")
-
-                                        st.markdown('<div class="download-section">', unsafe_allow_html=True)
-                                        download_title = "🎵 Ihr Mix-Download ist bereit!" if is_mix else "📥 Ihr Playlist-Download ist bereit!"
-                                        st.markdown(f"### {download_title}")
-
-                                        download_script, error = create_zip_download_link(zip_data, f"{zip_filename}.zip")
-
-                                        if download_script:
-                                            st.components.v1.html(download_script, height=0)
-                                            st.success("✅ Automatischer Download gestartet!")
-                                            st.info("💡 Falls der Download nicht automatisch startet, verwenden Sie den Button unten:")
-                                            _ = create_streamlit_download_button(zip_data, f"{zip_filename}.zip")
-                                        else:
-                                            st.warning(f"⚠️ Automatischer Download via JS-Snippet nicht möglich: {error}")
-                                            st.info("Starte alternativen Auto-Download...")
-                                            import base64 as _b64
-                                            alt_b64 = _b64.b64encode(zip_data).decode()
-                                            alt_name = f"{zip_filename}.zip"
-                                            alt_js = f"""
-                                            <script>
-                                            (function() {{
-                                                try {{
-                                                    const link = document.createElement('a');
-                                                    link.href = 'data:application/zip;base64,{alt_b64}';
-                                                    link.download = '{alt_name}';
-                                                    link.style.display = 'none';
-                                                    document.body.appendChild(link);
-                                                    link.click();
-                                                    setTimeout(function() {{
-                                                        try {{ document.body.removeChild(link); }} catch(e) {{}}
-                                                    }}, 1000);
-                                                }} catch (e) {{
-                                                    console.error('Alt-Auto-Download Fehler:', e);
-                                                    alert('Automatischer Download fehlgeschlagen. Bitte nutzen Sie den Button.');
-                                                }}
-                                            }})();
-                                            </script>
-                                            """
-                                            st.components.v1.html(alt_js, height=0)
-                                            _ = create_streamlit_download_button(zip_data, f"{zip_filename}.zip")
-
-                                        st.markdown('</div>', unsafe_allow_html=True)
-
-                                        success_count = len(downloaded_files)
-                                        total_count = len(videos_to_download)
-                                        content_info = f"📊 ZIP-Größe: {len(zip_data)/(1024*1024):.2f} MB | {content_type}: {success_count}"
-                                        if is_mix:
-                                            content_info += " | 🎵 Mix-Songs von YouTube generiert"
-                                        st.info(content_info)
-
-                                    else:
-                                        st.error("❌ ZIP-Erstellung fehlgeschlagen")
-
-                                    # Session zurücksetzen
-                                    st.session_state.selected_videos = []
-                                    st.session_state.playlist_videos = []
-                                    st.session_state.clear_input = True
-                                    st.session_state.input_key += 1
-                                else:
-                                    st.error("❌ Alle Downloads fehlgeschlagen")
-
-                            except Exception as e:
-                                st.error(f"❌ Batch-Download Fehler: {str(e)}")
-                            finally:
-                                st.session_state.batch_download_in_progress = False
-                                try:
-                                    progress_bar.empty()
-                                    status_text.empty()
-                                    detail_text.empty()
-                                except:
-                                    pass
-                                gc.collect()
+                            # ZIP-Dateiname anhand Playlisten-/Mixtitel wählen (beim Laden gemerkt)
+                            playlist_title = st.session_state.get('playlist_title')
+                            if not playlist_title:
+                                filename_prefix = "mix" if is_mix else "playlist"
+                                playlist_title = f"{filename_prefix}_download"
+                            discard_zip_results()
+                            start_ui_job(
+                                'batch',
+                                new_cancel_token(get_streamlit_session_id(), scheduler_owner, PRIORITY_PLAYLIST),
+                                lambda job, videos=videos_to_download: run_batch_ui_job(job, videos),
+                                title=playlist_title,
+                                work_dir=new_ui_result_dir(),
+                                is_mix=is_mix,
+                                selection=False,
+                                content_type=content_type,
+                                download_label="Mix-Download" if is_mix else "Playlist-Download",
+                                ready_message="🎵 Ihr Mix-Download ist bereit!" if is_mix else "📥 Ihr Playlist-Download ist bereit!",
+                                detail=f"Vorab-Prüfung: {format_preflight_summary(st.session_state.playlist_videos, st.session_state.get('playlist_dropped', []))}"
+                            )
+                            st.rerun()
 
                 else:
                     # Einzelne Songs auswählen
@@ -2136,147 +5091,55 @@ def main():
                     if handle_playlist_url(cleaned_url):
                         if st.session_state.playlist_videos:
                             st.markdown("### 🎛️ Einzelne Titel auswählen:")
-
-                            col_select1, col_select2, col_select3 = st.columns([1, 1, 2])
-                            with col_select1:
-                                if st.button("✅ Alle auswählen", use_container_width=True, key="pick_all"):
-                                    st.session_state.selected_videos = list(range(len(st.session_state.playlist_videos)))
-                                    st.rerun()
-
-                            with col_select2:
-                                if st.button("❌ Alle abwählen", use_container_width=True, key="pick_none"):
-                                    st.session_state.selected_videos = []
-                                    st.rerun()
-
-                            with col_select3:
-                                if st.session_state.selected_videos:
-                                    content_type = "Songs" if is_mix else "Videos"
-                                    st.write(f"🎵 {len(st.session_state.selected_videos)} {content_type} ausgewählt")
-
-                            # Liste rendern (wie bisher)
-                            for i, video in enumerate(st.session_state.playlist_videos):
-                                col_checkbox, col_info = st.columns([1, 10])
-                                with col_checkbox:
-                                    is_selected = i in st.session_state.selected_videos
-                                    if st.checkbox("Video auswählen", value=is_selected, key=f"video_pick_{i}", label_visibility="collapsed"):
-                                        if i not in st.session_state.selected_videos:
-                                            st.session_state.selected_videos.append(i)
-                                    else:
-                                        if i in st.session_state.selected_videos:
-                                            st.session_state.selected_videos.remove(i)
-                                with col_info:
-                                    css_class = "selected-video" if is_selected else "video-item"
-                                    track_number = f"Track {i+1}: " if is_mix else ""
-                                    st.markdown(f"""
-                                    <div class="{css_class}">
-                                        <strong>{track_number}{video['title']}</strong><br>
-                                        <small>⏱️ {format_duration(video['duration'])} | 👤 {video['uploader']}</small>
-                                    </div>
-                                    """, unsafe_allow_html=True)
+                            render_selection_table(st.session_state.playlist_videos, is_mix)
+                            selected_list = [
+                                st.session_state.playlist_videos[i]
+                                for i in sorted(st.session_state.selected_videos)
+                                if i < len(st.session_state.playlist_videos)
+                            ]
+                            render_preflight_report(selected_list)
 
                             # Download nur ausgewählte
-                            if st.session_state.selected_videos and not st.session_state.batch_download_in_progress:
+                            if st.session_state.selected_videos and not is_ui_job_running():
                                 content_type = "Songs" if is_mix else "Videos"
-                                button_text = f"🎵 {len(st.session_state.selected_videos)} ausgewählte {content_type} als ZIP herunterladen"
+                                button_text = f"🎵 {len(selected_list)} ausgewählte {content_type} als ZIP herunterladen"
 
                                 if st.button(button_text, type="primary", use_container_width=True, key="download_selected"):
-                                    rate_ok, rate_msg = check_rate_limit(client_ip, session_id)
+                                    rate_ok, rate_msg = check_rate_limit(client_key, session_id)
                                     if not rate_ok:
                                         st.warning(f"🚫 {rate_msg}")
                                         return
 
                                     st.session_state.batch_download_in_progress = True
-                                    update_download_tracking(client_ip, session_id)
+                                    update_download_tracking(client_key, session_id)
 
                                     videos_to_download = [
-                                        (st.session_state.playlist_videos[i]['url'],
-                                         st.session_state.playlist_videos[i]['title'])
-                                        for i in st.session_state.selected_videos
+                                        (item['url'], item['title'])
+                                        for item in selected_list
                                     ]
 
-                                    progress_bar = st.progress(0)
-                                    status_text = st.empty()
-                                    detail_text = st.empty()
-
-                                    def update_batch_progress(percent):
-                                        progress_bar.progress(percent)
-                                        download_type = "Mix-Download" if is_mix else "Playlist-Download"
-                                        status_text.text(f"{download_type} (Auswahl) läuft... {percent}%")
-
-                                    def update_status(message):
-                                        detail_text.text(message)
-
-                                    status_text.text(f"Starte Download der Auswahl...")
-
-                                    try:
-                                        downloaded_files, failed_downloads = download_multiple_videos(
-                                            videos_to_download, update_batch_progress, update_status
-                                        )
-
-                                        if downloaded_files:
-                                            status_text.text("Erstelle ZIP-Datei...")
-                                            detail_text.text("Komprimiere heruntergeladene Dateien...")
-
-                                            # ZIP-Dateiname anhand Playlisten-/Mixtitel wählen
-                                            playlist_title = None
-                                            try:
-                                                if is_mix:
-                                                    mix_info = extract_mix_playlist_info(cleaned_url)
-                                                    if mix_info and mix_info.get('title'):
-                                                        playlist_title = f"{mix_info['title']} (Auswahl)"
-                                                else:
-                                                    pl_info = extract_playlist_info(cleaned_url)
-                                                    if pl_info and pl_info.get('title'):
-                                                        playlist_title = f"{pl_info['title']} (Auswahl)"
-                                            except Exception:
-                                                playlist_title = None
-
-                                            if not playlist_title:
-                                                filename_prefix = "mix_selection" if is_mix else "playlist_selection"
-                                                playlist_title = filename_prefix
-
-                                            zip_filename = clean_filename(f"{playlist_title}")
-                                            zip_data = create_zip_file(downloaded_files, f"{zip_filename}.zip")
-
-                                            if zip_data:
-                                                progress_bar.progress(100)
-                                                status_text.text("ZIP-Datei erstellt!")
-                                                detail_text.text("Bereite Download vor...")
-
-                                                st.markdown('<div class="download-section">', unsafe_allow_html=True)
-                                                download_title = "🎵 Ihr Auswahl-Download ist bereit!"
-                                                st.markdown(f"### {download_title}")
-
-                                                download_script, error = create_zip_download_link(zip_data, f"{zip_filename}.zip")
-                                                if download_script:
-                                                    st.components.v1.html(download_script, height=0)
-                                                    st.success("✅ Automatischer Download gestartet!")
-                                                    st.info("💡 Falls der Download nicht automatisch startet, verwenden Sie den Button unten:")
-                                                    _ = create_streamlit_download_button(zip_data, f"{zip_filename}.zip")
-                                                else:
-                                                    st.warning(f"⚠️ Automatischer Download via JS-Snippet nicht möglich: {error}")
-                                                    _ = create_streamlit_download_button(zip_data, f"{zip_filename}.zip")
-
-                                                st.markdown('</div>', unsafe_allow_html=True)
-                                            else:
-                                                st.error("❌ ZIP-Erstellung fehlgeschlagen")
-
-                                            # Zurücksetzen nur Auswahl (Playlist behalten, falls weitere Auswahl gewünscht)
-                                            st.session_state.selected_videos = []
-                                        else:
-                                            st.error("❌ Alle Downloads fehlgeschlagen")
-
-                                    except Exception as e:
-                                        st.error(f"❌ Batch-Download Fehler: {str(e)}")
-                                    finally:
-                                        st.session_state.batch_download_in_progress = False
-                                        try:
-                                            progress_bar.empty()
-                                            status_text.empty()
-                                            detail_text.empty()
-                                        except:
-                                            pass
-                                        gc.collect()
+                                    # ZIP-Dateiname anhand Playlisten-/Mixtitel wählen (beim Laden gemerkt)
+                                    if st.session_state.get('playlist_title'):
+                                        playlist_title = f"{st.session_state.playlist_title} (Auswahl)"
+                                    else:
+                                        playlist_title = "mix_selection" if is_mix else "playlist_selection"
+                                    discard_zip_results()
+                                    start_ui_job(
+                                        'batch',
+                                        new_cancel_token(
+                                            get_streamlit_session_id(), scheduler_owner,
+                                            batch_priority(len(videos_to_download))
+                                        ),
+                                        lambda job, videos=videos_to_download: run_batch_ui_job(job, videos),
+                                        title=playlist_title,
+                                        work_dir=new_ui_result_dir(),
+                                        is_mix=is_mix,
+                                        selection=True,
+                                        content_type=content_type,
+                                        download_label=f"{'Mix' if is_mix else 'Playlist'}-Download (Auswahl)",
+                                        ready_message="🎵 Ihr Auswahl-Download ist bereit!"
+                                    )
+                                    st.rerun()
                     else:
                         st.markdown("---")
                         suggest_alternative_playlists()
@@ -2287,15 +5150,23 @@ def main():
                 st.session_state.is_playlist_mode = False
                 video_id = extract_video_id(cleaned_url)
                 
-                if video_id and (video_id != st.session_state.last_video_id or st.session_state.download_finished) and not st.session_state.current_download:
+                # Nicht im selben Lauf neu starten, in dem ein Job dieser Session gerade abgeschlossen wurde
+                if video_id and (video_id != st.session_state.last_video_id or st.session_state.download_finished) and not st.session_state.current_download and not finished_job and not is_ui_job_running():
+                    # Ausschnitt vor allen Limits prüfen - Eingabefehler kosten keinen Download
+                    try:
+                        clip = parse_clip_range(st.session_state.get('clip_start'), st.session_state.get('clip_end'))
+                    except ValueError as e:
+                        st.error(f"❌ Ausschnitt: {str(e)}")
+                        return
+                    
                     # Rate Limiting prüfen
-                    rate_ok, rate_msg = check_rate_limit(client_ip, session_id)
+                    rate_ok, rate_msg = check_rate_limit(client_key, session_id)
                     if not rate_ok:
                         st.warning(f"🚫 {rate_msg}")
                         return
                     
                     # Download-Tracking aktualisieren
-                    update_download_tracking(client_ip, session_id)
+                    update_download_tracking(client_key, session_id)
                     
                     st.session_state.last_video_id = video_id
                     st.session_state.download_completed = False
@@ -2310,11 +5181,30 @@ def main():
                     if not info:
                         st.session_state.current_download = False
                         st.session_state.download_finished = True
-                        if st.session_state.active_downloads > 0:
-                            st.session_state.active_downloads -= 1
+                        release_download_slot()
                         st.error("❌ Video nicht verfügbar oder zu lang (max. 1 Stunde)")
                         return
                     
+                    st.session_state.progressive_stream = None
+                    
+                    if clip:
+                        try:
+                            clip = resolve_clip_range(clip, info['duration'])
+                        except Exception as e:
+                            st.session_state.current_download = False
+                            st.session_state.download_finished = True
+                            release_download_slot()
+                            st.error(f"❌ Ausschnitt: {str(e)}")
+                            return
+                        info['estimated_size_mb'] = predict_mp3_size_mb(clip[1] - clip[0])
+                    
+                    if exceeds_mp3_size_limit(clip[1] - clip[0] if clip else info['duration']):
+                        st.session_state.current_download = False
+                        st.session_state.download_finished = True
+                        release_download_slot()
+                        st.error(f"❌ MP3 wäre voraussichtlich zu groß (ca. {info['estimated_size_mb']:.0f} MB, max. {get_setting('MAX_FILE_SIZE_MB')} MB)")
+                        return
+                    
                     # Video-Details
                     col_info1, col_info2 = st.columns([1, 2])
                     with col_info1:
@@ -2325,114 +5215,50 @@ def main():
                         st.write(f"**{info['title']}**")
                         st.write(f"**Kanal:** {info['uploader']}")
                         st.write(f"**Dauer:** {format_duration(info['duration'])}")
+                        if clip:
+                            st.write(f"**Ausschnitt:** {format_duration(clip[0])} - {format_duration(clip[1])}")
                         if info['view_count']:
                             st.write(f"**Aufrufe:** {info['view_count']:,}")
                     
                     st.markdown("---")
                     
-                    # Progress
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    def update_progress(percent):
-                        progress_bar.progress(percent)
-                        if percent < 100:
-                            status_text.text(f"Download läuft... {percent}%")
-                        else:
-                            status_text.text("Download abgeschlossen!")
-                    
-                    status_text.text("Download wird gestartet...")
-                    
-                    try:
-                        file_path, result = download_audio_with_progress(cleaned_url, update_progress)
-                        
-                        if file_path and os.path.exists(file_path):
-                            st.session_state.download_completed = True
-                            st.session_state.download_count += 1
-                            
-                            filename = clean_filename(f"{info['title']}.mp3")
-                            
-                            status_text.text("Datei wird vorbereitet...")
-                            
-                            # Debug-Info
-                            file_size = os.path.getsize(file_path) / (1024 * 1024)
-                            print(f"Download erfolgreich: {file_path} ({file_size:.2f} MB)")
-                            
-                            if not st.session_state.auto_download_triggered:
-                                download_script = create_download_link_and_clear_input(file_path, filename)
-                                st.components.v1.html(download_script, height=0)
-                                st.session_state.auto_download_triggered = True
-                                st.session_state.file_saved = True
-                            
-                            try:
-                                os.remove(file_path)
-                                print(f"Temp-Datei gelöscht: {file_path}")
-                            except Exception as e:
-                                print(f"Warnung: Temp-Datei konnte nicht gelöscht werden: {e}")
-                            
-                            st.session_state.download_finished = True
-                            st.session_state.current_download = False
-                            
-                            st.success("✅ Download erfolgreich!")
-                            st.info(f"📊 Dateigröße: {file_size:.2f} MB")
-                            
-                            # Input-Feld leeren
-                            st.session_state.clear_input = True
-                            st.session_state.input_key += 1
-                            st.session_state.cleaned_url = ""
-                            
-                            time.sleep(2)
-                            st.rerun()
-                            
-                        else:
-                            st.session_state.current_download = False
-                            st.session_state.download_finished = True
-                            
-                            # Detaillierte Fehleranalyse
-                            error_details = result if result else "Unbekannter Fehler"
-                            st.error(f"❌ Download fehlgeschlagen: {error_details}")
-                            
-                            # Hilfreiche Tipps basierend auf dem Fehler
-                            if "unavailable" in error_details.lower():
-                                st.info("💡 **Tipp:** Video wurde möglicherweise entfernt oder ist privat")
-                            elif "region" in error_details.lower():
-                                st.info("💡 **Tipp:** Video ist in Ihrer Region gesperrt")
-                            elif "age" in error_details.lower():
-                                st.info("💡 **Tipp:** Altersverifizierung erforderlich")
-                            elif "timeout" in error_details.lower():
-                                st.info("💡 **Tipp:** Versuchen Sie es bei besserer Internetverbindung erneut")
-                            else:
-                                st.info("💡 **Tipp:** Überprüfen Sie die URL und versuchen Sie es erneut")
-                            
-                            # Debug-Button für detaillierte Diagnose
-                            if st.button("🔧 Detaillierte Diagnose"):
-                                issues = diagnose_download_issues()
-                                if issues:
-                                    st.error("System-Probleme gefunden:")
-                                    for issue in issues:
-                                        st.error(f"• {issue}")
-                                else:
-                                    st.info("System-Komponenten scheinen in Ordnung zu sein")
-                            
-                    except Exception as e:
+                    progressive_mode = progressive_available and st.session_state.get('progressive_mode')
+                    if progressive_mode and clip:
+                        st.info("ℹ️ Ausschnitte werden regulär konvertiert - die Sofort-Wiedergabe gilt nur für ganze Videos.")
+                    elif progressive_mode:
+                        # Kein Download im Skriptlauf: der Browser holt das MP3 direkt vom Stream-Endpunkt
+                        st.session_state.progressive_stream = {
+                            'video_id': video_id,
+                            'ticket': create_stream_ticket(cleaned_url, info['title']),
+                            'filename': clean_filename(f"{info['title']}.mp3")
+                        }
                         st.session_state.current_download = False
-                        st.session_state.download_finished = True
-                        
-                        error_msg = str(e)
-                        st.error(f"❌ Kritischer Fehler: {error_msg}")
-                        
-                        # Debug-Informationen
-                        with st.expander("🐛 Debug-Informationen"):
-                            st.code(f"Fehler: {error_msg}")
-                            st.code(f"URL: {cleaned_url}")
-                            st.code(f"Video-ID: {video_id}")
-                            
-                            # System-Check
-                            issues = diagnose_download_issues()
-                            if issues:
-                                st.write("**System-Probleme:**")
-                                for issue in issues:
-                                    st.error(f"• {issue}")
+                        st.session_state.download_count += 1
+                        release_download_slot()
+                        render_progressive_player(
+                            st.session_state.progressive_stream['ticket'],
+                            st.session_state.progressive_stream['filename']
+                        )
+                        return
+                    
+                    # Download im Hintergrund-Thread; Fortschritt und Abbrechen-Knopf zeigt render_ui_job
+                    filename = clean_filename(f"{info['title']}{' ' + format_clip_label(clip) if clip else ''}.mp3")
+                    start_ui_job(
+                        'video',
+                        new_cancel_token(get_streamlit_session_id(), scheduler_owner, PRIORITY_INTERACTIVE),
+                        lambda job, clip=clip: run_video_ui_job(job, clip),
+                        title=info['title'],
+                        url=cleaned_url,
+                        video_id=video_id,
+                        filename=filename,
+                        work_dir=new_ui_result_dir()
+                    )
+                    st.rerun()
+                
+                # Progressive Auslieferung: Player bleibt sichtbar, bis eine neue URL kommt
+                progressive = st.session_state.get('progressive_stream')
+                if progressive and progressive['video_id'] == video_id:
+                    render_progressive_player(progressive['ticket'], progressive['filename'])
             
             elif not is_valid:
                 st.error("🚫 Ungültige YouTube URL")
@@ -2441,39 +5267,1509 @@ def main():
         # Rechte Spalte bewusst leer gelassen (seitliche Elemente entfernt)
         pass
     
+    # Live-Messwerte des Ressourcen-Governors - verraten Last und Nutzung, daher nur für Admins
+    if is_admin_viewer():
+        st.markdown("---")
+        with st.expander("📈 Server-Metriken", expanded=False):
+            st.code(render_metrics_text(), language="text")
+    
     # Versteckter Footer-Werbeplatz
-    st.markdown("---")
-    st.components.v1.html("<!-- AD_FOOTER_PLACEHOLDER -->", height=0)
+    st.markdown("<!-- AD_FOOTER_PLACEHOLDER -->", unsafe_allow_html=True)
 
     # Abschnitt 'Lokale Videodatei in MP3 konvertieren' wurde gemäß Anforderung entfernt.
 
-    # Analytics (versteckt)
-    st.components.v1.html("""
-    <script>
-    // Google Analytics / Tracking Code hier einfügen
-    // gtag('config', 'GA_MEASUREMENT_ID');
+# ===== VERTEILTER WORKER-MODUS =====
+@st.cache_resource(show_spinner=False)
+def init_job_queue():
+    """Lege das Schema der gemeinsamen SQLite-Queue an (einmal pro Prozess)"""
+    os.makedirs(os.path.dirname(QUEUE_DB_PATH) or '.', exist_ok=True)
+    os.makedirs(SHARED_RESULTS_DIR, exist_ok=True)
+    conn = sqlite3.connect(QUEUE_DB_PATH, timeout=30)
+    try:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                title TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires REAL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                result_path TEXT,
+                result_title TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                host TEXT,
+                current_job TEXT,
+                last_seen REAL NOT NULL
+            );
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+@contextmanager
+def open_job_queue():
+    """Verbindung zur gemeinsamen Queue (Autocommit, Transaktionen explizit)"""
+    init_job_queue()
+    conn = sqlite3.connect(QUEUE_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def enqueue_queue_job(url, title=None):
+    """Stelle einen Track-Job in die gemeinsame Queue und liefere die Job-ID"""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with open_job_queue() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, url, title, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, url, title, now, now)
+        )
+    return job_id
+
+def lease_queue_job(worker_id):
+    """Übernimm den ältesten offenen Job oder einen mit abgelaufener Lease"""
+    now = time.time()
+    with open_job_queue() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs toter Worker, die ihr Versuchslimit erreicht haben, endgültig abbrechen
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                ("Worker ausgefallen (Lease abgelaufen)", now, now, JOB_MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row:
+                if row['status'] == 'leased':
+                    print(f"Queue: Job {row['id']} von ausgefallenem Worker {row['worker_id']} wird neu zugestellt")
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + JOB_LEASE_SECONDS, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return dict(row) if row else None
+
+def heartbeat_queue_job(job_id, worker_id, progress):
+    """Verlängere die Lease; False, wenn der Job inzwischen einem anderen Worker gehört"""
+    now = time.time()
+    with open_job_queue() as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET lease_expires = ?, progress = ?, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+            (now + JOB_LEASE_SECONDS, int(progress), now, job_id, worker_id)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO workers (id, host, current_job, last_seen) VALUES (?, ?, ?, ?)",
+            (worker_id, socket.gethostname(), job_id, now)
+        )
+        return cursor.rowcount == 1
+
+def finish_queue_job(job_id, worker_id, result_path=None, result_title=None, error=None, retry=False):
+    """Schließe einen Job ab. Nur der aktuelle Lease-Inhaber darf das Ergebnis setzen"""
+    now = time.time()
+    with open_job_queue() as conn:
+        if error is None:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', progress = 100, result_path = ?, result_title = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (result_path, result_title, now, job_id, worker_id)
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "worker_id = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (1 if retry else 0, JOB_MAX_ATTEMPTS, error, now, job_id, worker_id)
+            )
+        conn.execute(
+            "UPDATE workers SET current_job = NULL, last_seen = ? WHERE id = ?",
+            (now, worker_id)
+        )
+        return cursor.rowcount == 1
+
+def get_queue_jobs(job_ids):
+    """Aktueller Stand mehrerer Jobs als Dict id -> Zeile"""
+    if not job_ids:
+        return {}
+    with open_job_queue() as conn:
+        placeholders = ",".join("?" for _ in job_ids)
+        rows = conn.execute(f"SELECT * FROM jobs WHERE id IN ({placeholders})", list(job_ids)).fetchall()
+    return {row['id']: dict(row) for row in rows}
+
+def iter_finished_queue_jobs(job_ids, progress_callback=None, timeout=JOB_WAIT_TIMEOUT_SECONDS):
+    """Liefere Jobs, sobald sie fertig/gescheitert sind; nach Timeout als gescheitert"""
+    pending = set(job_ids)
+    deadline = time.time() + timeout
+    while pending:
+        jobs = get_queue_jobs(pending)
+        for job_id in list(pending):
+            job = jobs.get(job_id)
+            if job and job['status'] in ('done', 'failed'):
+                pending.discard(job_id)
+                yield job
+        
+        if progress_callback and pending:
+            progress_callback(jobs)
+        
+        if pending and time.time() > deadline:
+            for job_id in pending:
+                yield {'id': job_id, 'status': 'failed', 'error': 'Zeitüberschreitung beim Warten auf Worker'}
+            return
+        if pending:
+            time.sleep(1)
+
+def convert_video(url, progress_callback=None, clip=None, cancel_token=None):
+    """Konvertiere ein Video lokal oder - im verteilten Modus - über die Worker-Queue"""
+    # Ausschnitte sind kurz und die Queue kennt keine Zeitbereiche - daher immer lokal
+    if not DISTRIBUTED_MODE or clip:
+        return download_audio_with_progress(url, progress_callback, clip, cancel_token)
+    
+    try:
+        job_id = enqueue_queue_job(url)
+        
+        def report(jobs):
+            # Abbruch beendet nur das Warten; der Worker läuft bis zu seinem Ende weiter
+            raise_if_cancelled(cancel_token)
+            if progress_callback and job_id in jobs:
+                progress_callback(min(jobs[job_id]['progress'], 99))
+        
+        for job in iter_finished_queue_jobs([job_id], report):
+            if job['status'] == 'done':
+                if progress_callback:
+                    progress_callback(100)
+                return job['result_path'], job['result_title']
+            return None, job.get('error') or "Download fehlgeschlagen"
+        return None, "Job nicht gefunden"
+    except Exception as e:
+        print(f"Queue-Fehler: {str(e)}")
+        return None, str(e)
+    finally:
+        release_download_slot()
+
+def download_multiple_videos_distributed(video_urls, progress_callback=None, status_callback=None, file_callback=None, cancel_token=None, failure_callback=None):
+    """Batch über die Queue: alle Tracks sofort einstellen, Ergebnisse einsammeln.
+    failure_callback(index, fehler) erhält jeden gescheiterten Track."""
+    downloaded = []
+    failed_downloads = []
+    total_videos = len(video_urls)
+    
+    try:
+        job_ids = [enqueue_queue_job(url, title) for url, title in video_urls]
+        positions = {job_id: i for i, job_id in enumerate(job_ids)}
+        if status_callback:
+            status_callback(f"{total_videos} Tracks an Worker verteilt...")
+        
+        for job in iter_finished_queue_jobs(job_ids, lambda jobs: raise_if_cancelled(cancel_token)):
+            index = positions[job['id']]
+            title = video_urls[index][1]
+            if job['status'] == 'done':
+                downloaded.append((index, (job['result_path'], job.get('result_title') or title)))
+                if file_callback:
+                    file_callback(job['result_path'], job.get('result_title') or title, index)
+                if status_callback:
+                    status_callback(f"✅ Erfolgreich: {title[:40]}...")
+            else:
+                failed_downloads.append(f"Download fehlgeschlagen: {title} ({job.get('error')})")
+                if failure_callback:
+                    failure_callback(index, job.get('error') or '')
+                if status_callback:
+                    status_callback(f"❌ Fehlgeschlagen: {title[:40]}...")
+            
+            if progress_callback:
+                progress_callback(int(((len(downloaded) + len(failed_downloads)) / total_videos) * 100))
+    except DownloadCancelled:
+        raise
+    except Exception as e:
+        failed_downloads.append(f"Queue-Fehler: {str(e)}")
+    finally:
+        release_download_slot()
+    
+    # Reihenfolge der Playlist für die ZIP-Nummerierung beibehalten
+    downloaded.sort(key=lambda item: item[0])
+    return [item for _, item in downloaded], failed_downloads
+
+def process_queue_job(job, worker_id):
+    """Führe einen geleasten Job aus, mit Heartbeats während der Laufzeit"""
+    progress = {'value': 0}
+    finished = threading.Event()
+    
+    def heartbeat_loop():
+        while not finished.wait(WORKER_HEARTBEAT_SECONDS):
+            try:
+                alive = heartbeat_queue_job(job['id'], worker_id, progress['value'])
+            except sqlite3.Error as e:
+                # z.B. "database is locked" - die Lease läuft erst nach JOB_LEASE_SECONDS ab,
+                # also beim nächsten Takt erneut versuchen statt den Thread zu beenden
+                print(f"Worker {worker_id}: Heartbeat für Job {job['id']} fehlgeschlagen: {str(e)}")
+                continue
+            if not alive:
+                print(f"Worker {worker_id}: Lease für Job {job['id']} verloren")
+                return
+    
+    threading.Thread(target=heartbeat_loop, name=f'heartbeat-{job["id"][:8]}', daemon=True).start()
+    print(f"Worker {worker_id}: starte Job {job['id']} (Versuch {job['attempts'] + 1}): {job['url']}")
+    
+    try:
+        file_path, result = download_audio_with_progress(
+            job['url'], lambda percent: progress.__setitem__('value', percent)
+        )
+        if not file_path:
+            # Permanente Fehler (privat, entfernt, zu lang) nicht erneut zustellen
+            retry = classify_download_error(result) != 'permanent' and not lookup_negative(job['url'])
+            finish_queue_job(job['id'], worker_id, error=result, retry=retry)
+            return
+        
+        # Ergebnis in den gemeinsamen Speicher veröffentlichen
+        target_dir = os.path.join(SHARED_RESULTS_DIR, job['id'])
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, clean_filename(f"{result}.mp3"))
+        shutil.move(file_path, target)
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+        
+        if not finish_queue_job(job['id'], worker_id, result_path=target, result_title=result):
+            # Lease zwischenzeitlich verloren - anderer Worker liefert das Ergebnis
+            shutil.rmtree(target_dir, ignore_errors=True)
+    except Exception as e:
+        print(f"Worker {worker_id}: Job {job['id']} fehlgeschlagen: {str(e)}")
+        finish_queue_job(job['id'], worker_id, error=str(e), retry=True)
+    finally:
+        finished.set()
+
+def run_queue_worker(worker_id, stop_event):
+    """Worker-Schleife: Jobs leasen und abarbeiten, bis stop_event gesetzt ist"""
+    while not stop_event.is_set():
+        try:
+            job = lease_queue_job(worker_id)
+        except sqlite3.Error as e:
+            print(f"Worker {worker_id}: Queue nicht erreichbar: {str(e)}")
+            job = None
+        
+        if job:
+            process_queue_job(job, worker_id)
+        else:
+            stop_event.wait(WORKER_POLL_SECONDS)
+
+def cleanup_job_queue():
+    """Entferne alte abgeschlossene Jobs und nicht abgeholte Ergebnisse"""
+    cutoff = time.time() - QUEUE_RETENTION_SECONDS
+    with open_job_queue() as conn:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+        ).fetchall()
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+        conn.execute("DELETE FROM workers WHERE last_seen < ?", (cutoff,))
+        counts = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        live_workers = conn.execute(
+            "SELECT COUNT(*) FROM workers WHERE last_seen > ?", (time.time() - 2 * JOB_LEASE_SECONDS,)
+        ).fetchone()[0]
+    
+    for row in rows:
+        shutil.rmtree(os.path.join(SHARED_RESULTS_DIR, row['id']), ignore_errors=True)
+    
+    by_status = {row['status']: row['n'] for row in counts}
+    for status in ('queued', 'leased', 'done', 'failed'):
+        set_gauge(f"ytac_queue_jobs_{status}", by_status.get(status, 0))
+    set_gauge('ytac_queue_live_workers', live_workers)
+
+def run_worker_cli(argv):
+    """Worker-Prozess für den verteilten Modus"""
+    parser = argparse.ArgumentParser(
+        prog='main.py worker',
+        description='Jobs aus der gemeinsamen Queue abarbeiten'
+    )
+    default_concurrency = get_setting('MAX_CONCURRENT_DOWNLOADS')
+    parser.add_argument('-c', '--concurrency', type=int, default=default_concurrency,
+                        help=f'Parallele Jobs in diesem Prozess (Default: {default_concurrency})')
+    args = parser.parse_args(argv)
+    
+    stop_event = threading.Event()
+    worker_ids = [f"{socket.gethostname()}:{os.getpid()}:{i}" for i in range(max(1, args.concurrency))]
+    threads = [
+        threading.Thread(target=run_queue_worker, args=(worker_id, stop_event), name=worker_id, daemon=True)
+        for worker_id in worker_ids
+    ]
+    print(f"🛠️  Starte {len(threads)} Worker auf {QUEUE_DB_PATH}, Ergebnisse in {SHARED_RESULTS_DIR}")
+    for thread in threads:
+        thread.start()
+    
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Beende Worker nach laufenden Jobs...")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+    return 0
+
+# ===== INKREMENTELLER PLAYLIST-SYNC =====
+def extract_playlist_id(url):
+    """Playlist-ID (list=...) aus einer URL oder None"""
+    match = re.search(r'[?&]list=([a-zA-Z0-9_-]+)', url or '')
+    return match.group(1) if match else None
+
+def sync_manifest_path(sync_dir, playlist_id):
+    return os.path.join(sync_dir, f"{playlist_id}.json")
+
+def load_sync_manifest(sync_dir, playlist_id):
+    """Manifest einer Playlist laden (leer, wenn noch nie synchronisiert)"""
+    path = sync_manifest_path(sync_dir, playlist_id)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Sync-Manifest unlesbar, starte neu: {path} ({e})")
+    return {'playlist_id': playlist_id, 'title': None, 'updated_at': None, 'items': {}}
+
+def save_sync_manifest(sync_dir, manifest):
+    """Manifest atomar schreiben (temporäre Datei + Umbenennen)"""
+    os.makedirs(sync_dir, exist_ok=True)
+    manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    path = sync_manifest_path(sync_dir, manifest['playlist_id'])
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+def sync_item_key(video_url):
+    """Schlüssel eines Titels im Manifest (Video-ID, sonst die URL)"""
+    return extract_video_id(video_url) or video_url
+
+def diff_sync_manifest(manifest, videos, output_dir):
+    """Neue Titel der aktuellen flachen Extraktion gegenüber dem Manifest.
     
-    function trackDownload(filename) {
-        // Analytics Event
+    Bereits synchronisierte Titel zählen nur, solange ihre Datei noch im
+    Ausgabeverzeichnis liegt (bzw. in einem Delta-ZIP ausgeliefert wurde).
+    Liefert (neue_titel, anzahl_bekannt).
+    """
+    new_videos = []
+    known = 0
+    for video in videos:
+        item = manifest['items'].get(sync_item_key(video['url']))
+        if item and (item.get('zip') or os.path.exists(os.path.join(output_dir, item['file']))):
+            known += 1
+        else:
+            new_videos.append(video)
+    return new_videos, known
+
+def record_sync_item(manifest, video_url, title, relative_file, file_path):
+    """Fertigen Titel mit Inhalts-Hash im Manifest vermerken"""
+    manifest['items'][sync_item_key(video_url)] = {
+        'title': title,
+        'file': relative_file,
+        'zip': None,
+        'size_bytes': os.path.getsize(file_path),
+        'sha256': file_sha256(file_path),
+        'synced_at': datetime.now().isoformat(timespec='seconds')
     }
+
+def record_sync_zip(manifest, volume, item_keys):
+    """Titel eines abgeschlossenen Delta-ZIP-Teils als ausgeliefert vermerken.
+    
+    Erst nach dem Schließen - ein abgebrochener Lauf hinterlässt sonst Titel,
+    die als ausgeliefert gelten, aber in keinem lesbaren ZIP stecken.
+    item_keys: Tracknummer -> Manifest-Schlüssel der noch offenen Titel.
+    """
+    for track in volume['tracks']:
+        key = item_keys.pop(track['track'], None)
+        if key in manifest['items']:
+            manifest['items'][key]['zip'] = volume['name']
+
+# ===== HEADLESS BATCH-CLI =====
+def read_batch_urls(args):
+    """Sammle URLs aus Argumenten, Datei ('-' = stdin) oder einer Pipe"""
+    lines = list(args.urls)
+    if args.input:
+        if args.input == '-':
+            lines.extend(sys.stdin.read().splitlines())
+        else:
+            with open(args.input, encoding='utf-8') as f:
+                lines.extend(f.read().splitlines())
+    elif not lines and not sys.stdin.isatty():
+        lines.extend(sys.stdin.read().splitlines())
     
-    function trackPlaylistDownload(count) {
-        // Playlist Download Tracking
+    # Leerzeilen und Kommentare ignorieren, Reihenfolge beibehalten
+    return list(dict.fromkeys(
+        line.strip() for line in lines
+        if line.strip() and not line.strip().startswith('#')
+    ))
+
+def expand_batch_urls(urls, output_dir=None, sync_dir=None):
+    """Löse Playlists/Mixe zu Einzeltracks auf: Liste von (url, titel, zielordner, prefix, playlist_id).
+    
+    Mit sync_dir werden nur Titel eingeplant, die laut Sync-Manifest der
+    Playlist noch fehlen; playlist_id ist dann gesetzt, sonst None.
+    """
+    jobs = []
+    for raw_url in urls:
+        cleaned_url = clean_youtube_url(raw_url)
+        if not cleaned_url or not is_valid_youtube_url(cleaned_url):
+            print(f"⚠️  Übersprungen (keine gültige YouTube-URL): {raw_url}")
+            continue
+        
+        if is_playlist_url(cleaned_url):
+            playlist_info = extract_playlist_info(cleaned_url)
+            if not playlist_info or playlist_info.get('error') or not playlist_info.get('videos'):
+                message = playlist_info.get('message') if playlist_info else 'keine Einträge'
+                print(f"⚠️  Playlist übersprungen ({message}): {raw_url}")
+                continue
+            
+            folder = clean_filename(playlist_info['title'])
+            print(f"📋 {playlist_info['title']}: {format_preflight_summary(playlist_info['videos'], playlist_info.get('dropped', []))}")
+            for item in playlist_info.get('dropped', []):
+                print(f"   ⛔ {item['title']} ({PREFLIGHT_REASON_LABELS[item['reason']]})")
+            
+            videos = playlist_info['videos']
+            playlist_id = extract_playlist_id(cleaned_url) if sync_dir else None
+            if playlist_id:
+                manifest = load_sync_manifest(sync_dir, playlist_id)
+                new_videos, known = diff_sync_manifest(manifest, videos, output_dir)
+                print(f"🔄 Sync {playlist_id}: {len(new_videos)} neu, {known} bereits vorhanden")
+                videos = new_videos
+            
+            # Track-Nummern bleiben die Position in der Playlist, auch beim Sync
+            positions = {video['url']: i for i, video in enumerate(playlist_info['videos'])}
+            for video in videos:
+                jobs.append((video['url'], video['title'], folder, f"{positions[video['url']] + 1:02d}_", playlist_id))
+        else:
+            jobs.append((cleaned_url, None, '', '', None))
+    return jobs
+
+def unique_output_path(directory, filename):
+    """Freier Dateiname im Zielordner (hängt bei Bedarf ' (2)', ' (3)' ... an)"""
+    base, ext = os.path.splitext(filename)
+    candidate = os.path.join(directory, filename)
+    counter = 2
+    while os.path.exists(candidate):
+        candidate = os.path.join(directory, f"{base} ({counter}){ext}")
+        counter += 1
+    return candidate
+
+def convert_batch_job(job, output_dir):
+    """Lade einen Track und verschiebe das MP3 in das Ausgabeverzeichnis"""
+    url, title, folder, prefix, _ = job
+    start = time.time()
+    file_path, result = convert_video(url)
+    if not file_path:
+        return {'url': url, 'title': title or url, 'ok': False, 'error': result, 'seconds': time.time() - start}
+    
+    target_dir = os.path.join(output_dir, folder)
+    os.makedirs(target_dir, exist_ok=True)
+    target = unique_output_path(target_dir, clean_filename(f"{prefix}{result}.mp3"))
+    shutil.move(file_path, target)
+    # Temp-Verzeichnis des Downloads entfernen
+    shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+    
+    return {
+        'url': url,
+        'title': result,
+        'ok': True,
+        'path': target,
+        'size_mb': os.path.getsize(target) / (1024 * 1024),
+        'seconds': time.time() - start
     }
+
+def run_batch_cli(argv):
+    """Headless-Massenkonvertierung ohne Streamlit-Oberfläche"""
+    parser = argparse.ArgumentParser(
+        prog='main.py batch',
+        description='YouTube-Videos, Playlists und Mixe headless in MP3 konvertieren'
+    )
+    parser.add_argument('urls', nargs='*', help='YouTube-URLs (Video, Playlist oder Mix)')
+    parser.add_argument('-i', '--input', help="Datei mit einer URL pro Zeile ('-' für stdin)")
+    parser.add_argument('-o', '--output-dir', default='downloads', help='Ausgabeverzeichnis (Default: downloads)')
+    default_workers = get_setting('MAX_CONCURRENT_DOWNLOADS')
+    parser.add_argument('-w', '--workers', type=int, default=default_workers,
+                        help=f'Parallele Downloads (Default: {default_workers})')
+    parser.add_argument('--sync', action='store_true',
+                        help='Playlists inkrementell abgleichen: nur Titel laden, die seit dem letzten Lauf neu sind')
+    parser.add_argument('--delta-zip', action='store_true',
+                        help='Mit --sync: neue Titel je Playlist als ZIP (Delta) statt als Einzeldateien ablegen')
+    args = parser.parse_args(argv)
+    if args.delta_zip and not args.sync:
+        parser.error('--delta-zip nur zusammen mit --sync')
     
-    function trackMixDownload(count) {
-        // Mix Download Tracking
+    urls = read_batch_urls(args)
+    if not urls:
+        parser.error('keine URLs angegeben')
+    
+    batch_start = time.time()
+    sync_dir = os.path.join(args.output_dir, SYNC_MANIFEST_DIRNAME) if args.sync else None
+    jobs = expand_batch_urls(urls, args.output_dir, sync_dir)
+    if not jobs:
+        if args.sync:
+            print("✅ Alles synchronisiert - keine neuen Titel")
+            return 0
+        print("❌ Keine konvertierbaren Einträge gefunden")
+        return 1
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    workers = max(1, args.workers)
+    print(f"🚀 Starte Batch: {len(jobs)} Tracks, {workers} Worker, Ziel: {args.output_dir}")
+    
+    results = []
+    manifests = {}
+    delta_zips = {}
+    delta_items = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+        futures = {executor.submit(convert_batch_job, job, args.output_dir): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'url': '?', 'title': '?', 'ok': False, 'error': str(e), 'seconds': 0}
+            results.append(result)
+            
+            if result['ok']:
+                print(f"[{len(results)}/{len(jobs)}] ✅ {result['title']} ({result['size_mb']:.1f} MB, {result['seconds']:.1f}s)")
+            else:
+                print(f"[{len(results)}/{len(jobs)}] ❌ {result['title']}: {result['error']}")
+            
+            url, _, folder, prefix, playlist_id = futures[future]
+            if result['ok'] and playlist_id:
+                # Manifest nach jedem Titel sichern - ein Abbruch verliert keine fertigen Titel
+                if playlist_id not in manifests:
+                    manifests[playlist_id] = load_sync_manifest(sync_dir, playlist_id)
+                manifest = manifests[playlist_id]
+                manifest['title'] = folder
+                relative_file = os.path.relpath(result['path'], args.output_dir)
+                record_sync_item(manifest, url, result['title'], relative_file, result['path'])
+                if args.delta_zip:
+                    # Als ausgeliefert gilt der Titel erst, wenn sein ZIP-Teil geschlossen ist
+                    if playlist_id not in delta_zips:
+                        delta_zips[playlist_id] = open_zip_volumes(
+                            f"{folder} (neu {datetime.now():%Y-%m-%d %H%M})", args.output_dir
+                        )
+                        delta_items[playlist_id] = {}
+                    track_number = int(prefix.rstrip('_'))
+                    delta_items[playlist_id][track_number] = sync_item_key(url)
+                    finished = add_to_zip_volumes(delta_zips[playlist_id], result['path'], result['title'], track_number)
+                    if finished:
+                        record_sync_zip(manifest, finished, delta_items[playlist_id])
+                save_sync_manifest(sync_dir, manifest)
+    
+    for playlist_id, state in delta_zips.items():
+        last = close_zip_volumes(state)
+        if last:
+            record_sync_zip(manifests[playlist_id], last, delta_items[playlist_id])
+            save_sync_manifest(sync_dir, manifests[playlist_id])
+        for volume in state['volumes']:
+            print(f"📦 Delta-ZIP: {volume['path']} ({len(volume['tracks'])} Titel)")
+    
+    elapsed = max(time.time() - batch_start, 0.001)
+    succeeded = [r for r in results if r['ok']]
+    total_mb = sum(r['size_mb'] for r in succeeded)
+    print("=" * 60)
+    print(f"📊 Erfolgreich: {len(succeeded)}/{len(results)} | Fehlgeschlagen: {len(results) - len(succeeded)}")
+    print(f"⏱️  Dauer: {elapsed:.1f}s | {len(succeeded) / (elapsed / 60):.1f} Tracks/min | "
+          f"{total_mb:.1f} MB ({total_mb / elapsed:.2f} MB/s)")
+    
+    return 0 if len(succeeded) == len(results) else 1
+
+# ===== JSON HTTP-API =====
+@st.cache_resource(show_spinner=False)
+def get_api_job_store():
+    """Prozessweiter Speicher aller API-Jobs"""
+    return {
+        'lock': threading.Lock(),
+        'jobs': {}
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_api_executor():
+    """Worker-Pool für API-Jobs"""
+    # Großzügig bemessen: wie viele Tracks wirklich laufen, entscheidet der Fair-Share-Scheduler.
+    # Lange Playlists blockieren so keine Einzelvideos bereits vor dem Start.
+    return ThreadPoolExecutor(max_workers=API_MAX_RUNNING_JOBS, thread_name_prefix='api-job')
+
+def get_api_job(job_id):
+    """Kopie eines API-Jobs oder None"""
+    store = get_api_job_store()
+    with store['lock']:
+        job = store['jobs'].get(job_id)
+        return dict(job) if job else None
+
+def update_api_job(job_id, **fields):
+    """Aktualisiere Felder eines API-Jobs"""
+    store = get_api_job_store()
+    with store['lock']:
+        if job_id in store['jobs']:
+            store['jobs'][job_id].update(fields)
+
+def api_job_to_json(job):
+    """Öffentliche Sicht auf einen Job (ohne interne Pfade)"""
+    payload = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'url': job['url'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error'],
+        'failed': job['failed'],
+        'status_url': f"/api/jobs/{job['id']}"
     }
+    if job['clip']:
+        payload['start'], payload['end'] = job['clip']
+    if job.get('preflight'):
+        payload['preflight'] = job['preflight']
+    if job.get('stage_timeouts'):
+        payload['stage_timeouts'] = job['stage_timeouts']
+    if job.get('profiled'):
+        # Artefakte liegen auf dem Server unter PROFILE_DIR/<Job-ID>
+        payload['profiled'] = True
+    if job['status'] == 'done':
+        payload['result_name'] = job['result_name']
+        payload['result_size_mb'] = round(job['result_size'] / (1024 * 1024), 2)
+        payload['result_url'] = f"/api/jobs/{job['id']}/result"
+        if len(job.get('volumes') or []) > 1:
+            payload['volumes'] = [
+                {
+                    'number': volume['number'],
+                    'name': volume['name'],
+                    'size_mb': round(volume['size'] / (1024 * 1024), 2),
+                    'url': f"/api/jobs/{job['id']}/result/{volume['number']}"
+                }
+                for volume in job['volumes']
+            ]
+    return payload
+
+def submit_api_job(url, tracks=None, client_ip='unknown', start=None, end=None, profile=None):
+    """Lege einen API-Job an. Liefert (job, None) oder (None, (http_status, meldung))"""
+    cleaned_url = clean_youtube_url(url) if isinstance(url, str) else None
+    if not cleaned_url or not is_valid_youtube_url(cleaned_url):
+        return None, (400, "Ungültige URL. Nur YouTube URLs sind erlaubt.")
+    
+    is_playlist = is_playlist_url(cleaned_url)
+    if tracks is not None:
+        if not is_playlist:
+            return None, (400, "'tracks' ist nur für Playlists und Mixe erlaubt")
+        if not isinstance(tracks, list) or not tracks or not all(isinstance(n, int) and n > 0 for n in tracks):
+            return None, (400, "'tracks' muss eine Liste von Track-Nummern (ab 1) sein")
+    
+    try:
+        clip = parse_clip_range(start, end)
+    except ValueError as e:
+        return None, (400, f"Ausschnitt: {str(e)}")
+    if clip and is_playlist:
+        return None, (400, "'start'/'end' sind nur für Einzelvideos erlaubt")
+    
+    kind = 'selection' if tracks else ('playlist' if is_playlist else 'video')
+    if kind == 'video':
+        priority = PRIORITY_INTERACTIVE
+    else:
+        priority = batch_priority(len(tracks) if tracks else 0, full_playlist=not tracks)
+    # Sitzungsschlüssel serverseitig aus der (nur über vertrauenswürdige Proxys übernommenen) IP
+    session_id = f"api:{client_ip}"
+    
+    # Gleiche Limits wie in der UI (IP/Stunde, Mindestabstand, gleichzeitige Jobs)
+    rate_ok, rate_msg = check_shared_rate_limit(client_ip, session_id)
+    if not rate_ok:
+        return None, (429, rate_msg)
+    
+    store = get_api_job_store()
+    with store['lock']:
+        active = sum(
+            1 for job in store['jobs'].values()
+            if job['client_ip'] == client_ip and job['status'] in ('queued', 'running')
+        )
+        if active >= get_setting('MAX_CONCURRENT_DOWNLOADS'):
+            return None, (429, "Zu viele gleichzeitige Downloads. Bitte warten Sie.")
+        
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'url': cleaned_url,
+            'tracks': tracks,
+            'clip': clip,
+            'profile': profile,
+            'cancel_token': new_cancel_token(owner=client_ip, priority=priority),
+            'client_ip': client_ip,
+            'status': 'queued',
+            'progress': 0,
+            'message': 'In Warteschlange',
+            'created_at': time.time(),
+            'finished_at': None,
+            'error': None,
+            'failed': [],
+            'work_dir': None,
+            'result_path': None,
+            'result_name': None,
+            'result_mime': None,
+            'result_size': 0
+        }
+        store['jobs'][job['id']] = job
+    
+    record_shared_download(client_ip, session_id)
+    get_api_executor().submit(run_api_job, job['id'])
+    return dict(job), None
+
+def run_api_job(job_id):
+    """Führe einen API-Job auf dem gemeinsamen Download-Kern aus"""
+    job = get_api_job(job_id)
+    if not job:
+        return
+    
+    cancel_token = job['cancel_token']
+    if is_cancelled(cancel_token):
+        release_cancel_token(cancel_token)
+        return
+    work_dir = tempfile.mkdtemp(prefix='ytac_api_')
+    update_api_job(job_id, status='running', message='Download läuft', work_dir=work_dir)
+    profile = None
+    
+    def on_progress(percent):
+        update_api_job(job_id, progress=min(int(percent), 99))
+    
+    def on_status(message):
+        update_api_job(job_id, message=message)
+    
+    try:
+        profile = start_job_profile(job_id, job['profile'])
+        if job['kind'] == 'video':
+            file_path, result = convert_video(job['url'], on_progress, job['clip'], cancel_token)
+            if not file_path:
+                raise Exception(result)
+            
+            target = os.path.join(work_dir, clean_filename(f"{result}.mp3"))
+            shutil.move(file_path, target)
+            shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+            mime = 'audio/mpeg'
+            failed = []
+        else:
+            playlist_info = extract_playlist_info(job['url'])
+            if not playlist_info or playlist_info.get('error') or not playlist_info.get('videos'):
+                raise Exception(playlist_info.get('message') if playlist_info else "Playlist konnte nicht geladen werden")
+            
+            videos = playlist_info['videos']
+            if job['tracks']:
+                videos = [videos[n - 1] for n in job['tracks'] if n <= len(videos)]
+            if not videos:
+                raise Exception("Keine gültigen Tracks ausgewählt")
+            
+            dropped = playlist_info.get('dropped', [])
+            update_api_job(
+                job_id,
+                message=f"Vorab-Prüfung: {format_preflight_summary(videos, dropped)}",
+                preflight=dict(estimate_batch(videos), dropped=[
+                    {'title': item['title'], 'reason': item['reason'], 'url': item['url']} for item in dropped
+                ])
+            )
+            
+            suffix = " (Auswahl)" if job['kind'] == 'selection' else ""
+            volumes, failed = download_batch_as_volumes(
+                [(video['url'], video['title']) for video in videos],
+                f"{playlist_info['title']}{suffix}", work_dir, on_progress, on_status,
+                cancel_token=cancel_token
+            )
+            if not volumes:
+                raise Exception("Alle Downloads fehlgeschlagen")
+            
+            # Teil 1 bleibt das Standard-Ergebnis, weitere Teile über /result/<n>
+            update_api_job(job_id, volumes=[
+                {'number': volume['number'], 'path': volume['path'], 'name': volume['name'], 'size': volume['size']}
+                for volume in volumes
+            ])
+            target = volumes[0]['path']
+            mime = 'application/zip'
+        
+        update_api_job(
+            job_id,
+            status='done',
+            progress=100,
+            message='Fertig',
+            failed=failed,
+            result_path=target,
+            result_name=os.path.basename(target),
+            result_mime=mime,
+            result_size=os.path.getsize(target),
+            finished_at=time.time()
+        )
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if is_cancelled(cancel_token):
+            print(f"API-Job {job_id} abgebrochen")
+            update_api_job(job_id, status='cancelled', message='Abgebrochen', error=cancel_token['reason'], finished_at=time.time())
+        else:
+            print(f"API-Job {job_id} fehlgeschlagen: {str(e)}")
+            update_api_job(job_id, status='failed', message='Fehlgeschlagen', error=str(e), finished_at=time.time())
+    finally:
+        if cancel_token['timeouts']:
+            update_api_job(job_id, stage_timeouts=list(cancel_token['timeouts']))
+        if finish_job_profile(profile):
+            update_api_job(job_id, profiled=True)
+        release_cancel_token(cancel_token)
+
+def cancel_api_job(job_id):
+    """API-Job abbrechen. Liefert den Job oder None, wenn unbekannt"""
+    job = get_api_job(job_id)
+    if not job:
+        return None
+    if job['status'] in ('queued', 'running'):
+        cancel_job(job['cancel_token'], "über die API abgebrochen")
+        if job['status'] == 'queued':
+            update_api_job(job_id, status='cancelled', message='Abgebrochen', error="über die API abgebrochen", finished_at=time.time())
+    return get_api_job(job_id)
+
+def cleanup_api_jobs():
+    """Entferne abgelaufene API-Jobs samt Ergebnisdateien"""
+    cutoff = time.time() - API_RESULT_TTL_SECONDS
+    store = get_api_job_store()
+    with store['lock']:
+        expired = [
+            job_id for job_id, job in store['jobs'].items()
+            if job['finished_at'] and job['finished_at'] < cutoff
+        ]
+        expired_jobs = [store['jobs'].pop(job_id) for job_id in expired]
     
-    function trackAdClick(slot) {
-        // Ad Click Tracking
+    for job in expired_jobs:
+        if job['work_dir']:
+            shutil.rmtree(job['work_dir'], ignore_errors=True)
+
+# ===== PROGRESSIVE MP3-AUSLIEFERUNG =====
+# Direkt abspielbare Quellen bevorzugen - FFmpeg liest sie ohne yt-dlp-Downloader
+STREAM_SOURCE_FORMAT = "bestaudio[protocol^=http][protocol!*=dash]/bestaudio[protocol*=m3u8]/best[protocol^=http][protocol!*=dash]"
+
+@st.cache_resource(show_spinner=False)
+def get_stream_store():
+    """Prozessweite Stream-Tickets der UI und Zähler aktiver Streams"""
+    return {
+        'lock': threading.Lock(),
+        'tickets': {},
+        'active': 0
     }
+
+def create_stream_ticket(url, title):
+    """Ticket für einen bereits in der UI geprüften und gezählten Stream"""
+    store = get_stream_store()
+    token = uuid.uuid4().hex
+    with store['lock']:
+        store['tickets'][token] = {
+            'url': url,
+            'title': title,
+            'uses': 0,
+            'expires': time.time() + STREAM_TICKET_TTL_SECONDS
+        }
+    return token
+
+def redeem_stream_ticket(token):
+    """Ticket einlösen; None wenn unbekannt, abgelaufen oder aufgebraucht"""
+    store = get_stream_store()
+    with store['lock']:
+        ticket = store['tickets'].get(token)
+        if not ticket or ticket['expires'] <= time.time() or ticket['uses'] >= STREAM_TICKET_MAX_USES:
+            return None
+        ticket['uses'] += 1
+        return dict(ticket)
+
+def cleanup_stream_tickets():
+    """Abgelaufene Stream-Tickets entfernen"""
+    store = get_stream_store()
+    now = time.time()
+    with store['lock']:
+        for token in [key for key, ticket in store['tickets'].items() if ticket['expires'] <= now]:
+            del store['tickets'][token]
+
+def acquire_stream_slot():
+    """Einen der STREAM_MAX_ACTIVE Stream-Plätze belegen"""
+    store = get_stream_store()
+    with store['lock']:
+        if store['active'] >= STREAM_MAX_ACTIVE:
+            return False
+        store['active'] += 1
+        set_gauge('ytac_active_streams', store['active'])
+        return True
+
+def release_stream_slot():
+    store = get_stream_store()
+    with store['lock']:
+        store['active'] = max(0, store['active'] - 1)
+        set_gauge('ytac_active_streams', store['active'])
+
+def resolve_stream_source(url):
+    """Löse die Audio-Quelle für FFmpeg auf: (info, media_url, http_headers).
     
-    function trackSpecialUrlConversion(type) {
-        // Track special URL conversions
+    Es gelten dieselben Vorab-Prüfungen wie beim Download (Negativ-Cache,
+    Dauer, Größenschätzung); Fehler werden als Exception gemeldet.
+    """
+    negative = lookup_negative(url, where='download')
+    if negative:
+        raise Exception(negative['message'])
+    
+    player_clients = order_player_clients(DEFAULT_PLAYER_CLIENTS)
+    failed_clients = set()
+    ydl_opts = {
+        'format': STREAM_SOURCE_FORMAT,
+        'quiet': True,
+        'no_warnings': False,
+        'logger': make_client_logger(failed_clients, quiet=True),
+        'socket_timeout': get_setting('YTDLP_FLAT_SOCKET_TIMEOUT_SECONDS'),
+        'extractor_args': {'youtube': {'player_client': player_clients}}
     }
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            extract_start = time.time()
+            info = ydl.extract_info(url, download=False)
+            record_client_results(player_clients, True, time.time() - extract_start, failed_clients)
+    except Exception as e:
+        record_client_failure(player_clients, str(e), failed_clients)
+        remember_negative_error(url, e)
+        raise
+    finally:
+        release_client_probes(player_clients)
+    
+    duration = info.get('duration') or 0
+    if duration > MAX_VIDEO_DURATION:
+        remember_negative(url, 'too_long', "Video zu lang (max. 1 Stunde)")
+        raise Exception("Video zu lang (max. 1 Stunde)")
+    max_file_size_mb = get_setting('MAX_FILE_SIZE_MB')
+    if exceeds_mp3_size_limit(duration, max_file_size_mb):
+        raise Exception(f"Datei zu groß (voraussichtlich {predict_mp3_size_mb(duration):.1f}MB). Maximum: {max_file_size_mb}MB")
+    if not info.get('url'):
+        raise Exception("Keine direkt abspielbare Audio-Quelle gefunden")
+    return info, info['url'], info.get('http_headers') or {}
+
+def open_mp3_transcoder(media_url, http_headers):
+    """FFmpeg liest die Quelle selbst und schreibt MP3 fortlaufend nach stdout"""
+    import subprocess
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if http_headers:
+        cmd += ["-headers", "".join(f"{name}: {value}\r\n" for name, value in http_headers.items())]
+    cmd += ["-i", media_url, "-vn", "-codec:a", "libmp3lame", "-q:a", "0", "-f", "mp3", "pipe:1"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+def render_progressive_player(ticket, filename):
+    """Audio-Player und Speichern-Link, die direkt vom Stream-Endpunkt der API lesen"""
+    path = f"/api/stream/{ticket}"
+    # JSON-Literale für das Skript; '</' maskieren, damit Titel das Skript nicht beenden
+    js_base = json.dumps(API_PUBLIC_URL)
+    js_label = json.dumps(f"💾 {filename} speichern").replace('</', '<\\/')
+    player_html = f"""
+    <audio id="player" controls autoplay preload="none" style="width:100%"></audio>
+    <div><a id="save" target="_blank" style="font-family:sans-serif;font-size:14px"></a></div>
+    <script>
+    let base = {js_base};
+    if (!base) {{
+        let loc = window.location;
+        try {{ loc = window.parent.location; }} catch (e) {{}}
+        base = loc.protocol + '//' + loc.hostname + ':{API_PORT}';
+    }}
+    document.getElementById('player').src = base + '{path}';
+    const save = document.getElementById('save');
+    save.href = base + '{path}?download=1';
+    save.textContent = {js_label};
     </script>
-    """, height=0)
+    """
+    st.success("⚡ Stream gestartet - die Wiedergabe beginnt, sobald die ersten Sekunden konvertiert sind.")
+    st.components.v1.html(player_html, height=90)
+
+# ===== VORSCHAU-CLIPS =====
+@st.cache_resource(show_spinner=False)
+def get_preview_cache():
+    """Prozessweiter Kurzzeit-Cache der Vorschau-MP3s (Schlüssel: Video-ID)"""
+    return {
+        'lock': threading.Lock(),
+        'entries': {},
+        'active': 0
+    }
+
+def cleanup_preview_cache():
+    """Abgelaufene Vorschauen entfernen"""
+    cache = get_preview_cache()
+    cutoff = time.time() - PREVIEW_CACHE_TTL_SECONDS
+    with cache['lock']:
+        for key in [key for key, entry in cache['entries'].items() if entry['created'] < cutoff]:
+            del cache['entries'][key]
+        set_gauge('ytac_preview_cache_entries', len(cache['entries']))
+
+def fetch_preview_source(info, media_url, http_headers):
+    """Nur den Anfang der Quelle laden: Range-Request für HTTP-Formate, sonst None.
+    
+    Die Byte-Zahl ergibt sich aus der Bitrate des gewählten Formats; HLS-Quellen
+    liest FFmpeg selbst und bricht nach PREVIEW_SECONDS ab.
+    """
+    if not str(info.get('protocol') or '').startswith('http'):
+        return None
+    kbps = info.get('abr') or info.get('tbr') or PREVIEW_SOURCE_DEFAULT_KBPS
+    byte_count = int(kbps * 125 * (PREVIEW_SECONDS + PREVIEW_FETCH_MARGIN_SECONDS)) + 65536
+    request = urllib.request.Request(media_url, headers=dict(http_headers, Range=f"bytes=0-{byte_count - 1}"))
+    with urllib.request.urlopen(request, timeout=PREVIEW_TIMEOUT_SECONDS) as response:
+        # Server ohne Range-Unterstützung liefern 200 - trotzdem nicht mehr als nötig lesen
+        return response.read(byte_count)
+
+def encode_preview_clip(source_data, media_url, http_headers):
+    """Vorschau als MP3 mit niedriger Bitrate kodieren (aus Bytes oder direkt von der URL)"""
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if source_data is None:
+        if http_headers:
+            cmd += ["-headers", "".join(f"{name}: {value}\r\n" for name, value in http_headers.items())]
+        cmd += ["-i", media_url]
+    else:
+        cmd += ["-i", "pipe:0"]
+    cmd += ["-t", str(PREVIEW_SECONDS), "-vn", "-codec:a", "libmp3lame", "-b:a", f"{PREVIEW_BITRATE_KBPS}k", "-f", "mp3", "pipe:1"]
+    clip = run_ffmpeg(cmd, timeout=PREVIEW_TIMEOUT_SECONDS, input_data=source_data)
+    if not clip:
+        raise Exception("Vorschau konnte nicht kodiert werden")
+    return clip
+
+class PreviewQuotaExceeded(Exception):
+    """Kontingent MAX_PREVIEWS_PER_IP der IP ist für diese Stunde aufgebraucht"""
+
+def get_preview_clip(url, client_ip):
+    """Vorschau-MP3 eines Videos liefern: (bytes, None) oder (None, fehlermeldung).
+    
+    Belegt keinen Download-Platz und zählt nicht gegen das Download-Limit. Jede
+    neu erzeugte Vorschau kostet eine Extraktion bei YouTube und geht daher auf
+    das Kontingent MAX_PREVIEWS_PER_IP (sonst PreviewQuotaExceeded); gleichzeitig
+    laufen höchstens PREVIEW_MAX_ACTIVE. Abgelehnte oder gescheiterte Vorschauen
+    kosten kein Kontingent.
+    """
+    video_id = extract_video_id(url) or url
+    cache = get_preview_cache()
+    with cache['lock']:
+        entry = cache['entries'].get(video_id)
+        if entry and entry['created'] >= time.time() - PREVIEW_CACHE_TTL_SECONDS:
+            inc_counter('ytac_preview_cache_hits_total')
+            return entry['data'], None
+    
+    # Erst freie Kapazität, dann Kontingent - eine abgewiesene Anfrage bucht nichts
+    with cache['lock']:
+        if cache['active'] >= PREVIEW_MAX_ACTIVE:
+            return None, "Zu viele gleichzeitige Vorschauen. Bitte gleich erneut versuchen."
+        cache['active'] += 1
+    
+    try:
+        quota_ok, quota_msg = reserve_preview(client_ip)
+        if not quota_ok:
+            inc_counter('ytac_preview_rejected_total')
+            raise PreviewQuotaExceeded(quota_msg)
+        inc_counter('ytac_preview_cache_misses_total')
+        return _create_preview_clip(url, video_id, client_ip)
+    finally:
+        with cache['lock']:
+            cache['active'] = max(0, cache['active'] - 1)
+
+def _create_preview_clip(url, video_id, client_ip):
+    """Vorschau erzeugen und cachen; bei Fehlern wird die Buchung zurückgegeben"""
+    cache = get_preview_cache()
+    try:
+        info, media_url, http_headers = resolve_stream_source(url)
+        start = time.time()
+        source_data = fetch_preview_source(info, media_url, http_headers)
+        clip = encode_preview_clip(source_data, media_url, http_headers)
+        print(f"Vorschau erzeugt: {video_id} ({len(source_data or b'') / 1024:.0f} KB Quelle, "
+              f"{len(clip) / 1024:.0f} KB MP3, {time.time() - start:.1f}s)")
+        
+        with cache['lock']:
+            if len(cache['entries']) >= PREVIEW_CACHE_MAX_ENTRIES:
+                oldest = min(cache['entries'], key=lambda key: cache['entries'][key]['created'])
+                del cache['entries'][oldest]
+            cache['entries'][video_id] = {'data': clip, 'created': time.time()}
+            set_gauge('ytac_preview_cache_entries', len(cache['entries']))
+        return clip, None
+    except Exception as e:
+        print(f"Vorschau fehlgeschlagen für {url}: {str(e)}")
+        refund_preview(client_ip)
+        return None, str(e)
+
+def render_preview_player(videos, indices, key):
+    """Vorschau für einen Titel der aktuellen Seite auswählen und direkt abspielen"""
+    if not indices:
+        return
+    col_pick, col_play = st.columns([3, 1])
+    with col_pick:
+        index = st.selectbox(
+            "🎧 Vorschau",
+            indices,
+            format_func=lambda i: f"{i + 1}. {videos[i]['title']}",
+            key=f"preview_pick_{key}"
+        )
+    with col_play:
+        st.write("")
+        if st.button(f"▶️ {PREVIEW_SECONDS}s anhören", use_container_width=True, key=f"preview_play_{key}"):
+            with st.spinner("Vorschau wird erzeugt..."):
+                try:
+                    data, error = get_preview_clip(videos[index]['url'], get_client_key())
+                except PreviewQuotaExceeded as e:
+                    data, error = None, str(e)
+            st.session_state.preview_clip = {'url': videos[index]['url'], 'data': data, 'error': error}
+    
+    preview = st.session_state.get('preview_clip')
+    if preview and preview['url'] == videos[index]['url']:
+        if preview['data']:
+            st.audio(preview['data'], format="audio/mpeg")
+        else:
+            st.warning(f"⚠️ Vorschau nicht möglich: {preview['error']}")
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """JSON-Endpunkte für Jobs, Status und Ergebnis-Download"""
+    server_version = "YouTubeAudioConverterAPI/1.0"
+    # HTTP/1.1 für Chunked Transfer (Stream-Endpunkt); Keep-Alive gibt es trotzdem nicht, siehe end_headers
+    protocol_version = 'HTTP/1.1'
+    
+    def end_headers(self):
+        # Eine Anfrage je Verbindung wie unter HTTP/1.0 - nicht gelesene Request-Bodies
+        # (z.B. nach 401/404) können so nie als nächste Anfrage gelesen werden
+        self.send_header('Connection', 'close')
+        super().end_headers()
+    
+    def log_message(self, format, *args):
+        print(f"API {self.client_ip()} - {format % args}")
+    
+    def client_ip(self):
+        """Client-Adresse; X-Forwarded-For zählt nur, wenn der direkte Peer ein vertrauenswürdiger Proxy ist"""
+        peer = self.client_address[0]
+        forwarded = self.headers.get('X-Forwarded-For') if self.headers else None
+        if not forwarded or peer not in API_TRUSTED_PROXIES:
+            return peer
+        # Von rechts: der erste Eintrag, den nicht einer unserer Proxys angehängt hat
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        for hop in reversed(hops):
+            if hop not in API_TRUSTED_PROXIES:
+                return hop
+        return peer
+    
+    def bearer_token(self):
+        return (self.headers.get('Authorization') or '').removeprefix('Bearer ').strip()
+    
+    def check_api_access(self):
+        """Job-Endpunkte: mit API_TOKEN nur gegen Token, sonst nur direkte lokale Clients.
+        Bei Ablehnung Antwort senden und False liefern. Das Admin-Token gilt ebenfalls."""
+        if self.is_admin():
+            return True
+        if API_TOKEN:
+            if hmac.compare_digest(self.bearer_token().encode('utf-8'), API_TOKEN.encode('utf-8')):
+                return True
+            self.send_json(401, {'error': 'API-Token fehlt oder ist falsch'})
+            return False
+        if self.is_local_client():
+            return True
+        self.send_json(403, {'error': 'API nur lokal erreichbar; für externen Zugriff YTAC_API_TOKEN setzen'})
+        return False
+    
+    def send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def read_json_body(self):
+        """JSON-Objekt aus dem Request lesen; bei Fehlern Antwort senden und None liefern"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > API_MAX_BODY_BYTES:
+            self.send_json(413, {'error': 'Request zu groß'})
+            return None
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("JSON-Objekt erwartet")
+        except ValueError as e:
+            self.send_json(400, {'error': f'Ungültiges JSON: {str(e)}'})
+            return None
+        return payload
+    
+    def is_local_client(self):
+        """Direkter lokaler Client? Über einen Proxy weitergereichte Anfragen sind nie lokal,
+        auch wenn der Peer es ist."""
+        return ipaddress.ip_address(self.client_address[0]).is_loopback and not self.headers.get('X-Forwarded-For')
+    
+    def is_admin(self):
+        """Trägt die Anfrage das Admin-Token? (ohne Antwort, für optionale Admin-Funktionen)"""
+        return bool(ADMIN_TOKEN) and hmac.compare_digest(self.bearer_token().encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+    
+    def check_admin(self):
+        """Admin-Token prüfen; bei Ablehnung Antwort senden und False liefern"""
+        if not ADMIN_TOKEN:
+            self.send_json(404, {'error': 'Admin-Endpunkte deaktiviert (YTAC_ADMIN_TOKEN nicht gesetzt)'})
+            return False
+        if not self.is_admin():
+            self.send_json(403, {'error': 'Admin-Token fehlt oder ist falsch'})
+            return False
+        return True
+    
+    def send_text(self, status, text):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_result_file(self, job, volume_number=None):
+        """Ergebnis (oder einen ZIP-Teil) in Blöcken von der Platte streamen (kein Komplettpuffer)"""
+        result_path, result_name = job['result_path'], job['result_name']
+        if volume_number is not None:
+            volume = next((v for v in job.get('volumes') or [] if v['number'] == volume_number), None)
+            if not volume:
+                self.send_json(404, {'error': 'ZIP-Teil nicht gefunden'})
+                return
+            result_path, result_name = volume['path'], volume['name']
+        
+        if not result_path or not os.path.exists(result_path):
+            self.send_json(410, {'error': 'Ergebnis nicht mehr verfügbar'})
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', job['result_mime'])
+        self.send_header('Content-Length', str(os.path.getsize(result_path)))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(result_name)}")
+        self.end_headers()
+        with open(result_path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, 64 * 1024)
+    
+    def send_mp3_stream(self, url, title, as_attachment):
+        """MP3 per Chunked Transfer ausliefern, während FFmpeg noch konvertiert"""
+        if not acquire_stream_slot():
+            self.send_json(503, {'error': 'Zu viele gleichzeitige Streams. Bitte warten Sie.'})
+            return
+        
+        process = None
+        try:
+            try:
+                info, media_url, http_headers = resolve_stream_source(url)
+            except Exception as e:
+                status = 422 if classify_download_error(e) == 'permanent' else 502
+                self.send_json(status, {'error': str(e)})
+                return
+            
+            process = open_mp3_transcoder(media_url, http_headers)
+            # Erst auf die ersten Bytes warten - scheitert FFmpeg sofort, gibt es noch einen Fehlerstatus
+            chunk = process.stdout.read1(STREAM_CHUNK_BYTES)
+            if not chunk:
+                self.send_json(502, {'error': 'Konvertierung fehlgeschlagen'})
+                return
+            
+            filename = clean_filename(f"{title or info.get('title') or 'audio'}.mp3")
+            disposition = 'attachment' if as_attachment else 'inline'
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Content-Disposition', f"{disposition}; filename*=UTF-8''{quote(filename)}")
+            self.end_headers()
+            
+            sent = 0
+            max_file_size_mb = get_setting('MAX_FILE_SIZE_MB')
+            limit = max_file_size_mb * 1024 * 1024
+            while chunk:
+                sent += len(chunk)
+                if sent > limit:
+                    # Ohne abschließenden 0-Chunk erkennt der Client die Antwort als unvollständig
+                    # und behält keine abgeschnittene Datei als scheinbar fertigen Download
+                    print(f"Stream abgebrochen: Größenlimit {max_file_size_mb}MB überschritten")
+                    inc_counter('ytac_streams_aborted_total')
+                    return
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(chunk), chunk))
+                chunk = process.stdout.read1(STREAM_CHUNK_BYTES)
+            self.wfile.write(b"0\r\n\r\n")
+            inc_counter('ytac_streams_total')
+            inc_counter('ytac_stream_bytes_total', sent)
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Stream vom Client beendet: {url}")
+        finally:
+            self.close_connection = True
+            if process:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+            release_stream_slot()
+    
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/')
+        
+        if path == '/api/health':
+            self.send_json(200, {'status': 'ok'})
+            return
+        if path == '/metrics':
+            # Nur für lokale Scraper oder mit Admin-Token (Authorization: Bearer)
+            if not (self.is_local_client() or self.is_admin()):
+                self.send_json(403, {'error': 'Metriken nur lokal oder mit Admin-Token'})
+                return
+            self.send_text(200, render_metrics_text())
+            return
+        if path == '/api/admin/config':
+            if self.check_admin():
+                self.send_json(200, describe_runtime_config())
+            return
+        
+        if path.startswith('/api/stream'):
+            query = parse_qs(parsed.query)
+            as_attachment = query.get('download', ['0'])[0] == '1'
+            match = re.fullmatch(r'/api/stream/([0-9a-f]{32})', path)
+            if match:
+                # Ticket aus der UI - Limits wurden dort bereits geprüft und gezählt
+                ticket = redeem_stream_ticket(match.group(1))
+                if not ticket:
+                    self.send_json(404, {'error': 'Stream-Ticket unbekannt oder abgelaufen'})
+                    return
+                self.send_mp3_stream(ticket['url'], ticket['title'], as_attachment)
+                return
+            
+            if path != '/api/stream':
+                self.send_json(404, {'error': 'Unbekannter Endpunkt'})
+                return
+            if not self.check_api_access():
+                return
+            cleaned_url = clean_youtube_url(query.get('url', [''])[0])
+            if not cleaned_url or not is_valid_youtube_url(cleaned_url) or is_playlist_url(cleaned_url):
+                self.send_json(400, {'error': 'Ungültige URL. Nur einzelne YouTube-Videos können gestreamt werden.'})
+                return
+            client_ip = self.client_ip()
+            # Sitzungsschlüssel serverseitig - ein Client-Header würde das Intervall-Limit aushebeln
+            session_id = f"api:{client_ip}"
+            rate_ok, rate_msg = check_shared_rate_limit(client_ip, session_id)
+            if not rate_ok:
+                self.send_json(429, {'error': rate_msg})
+                return
+            record_shared_download(client_ip, session_id)
+            self.send_mp3_stream(cleaned_url, None, as_attachment)
+            return
+        
+        if path == '/api/preview':
+            # Kurze Vorschau - nur für API-Clients (die UI erzeugt Vorschauen im eigenen Prozess),
+            # zählt nicht als Download, aber gegen das Vorschau-Kontingent der IP
+            if not self.check_api_access():
+                return
+            cleaned_url = clean_youtube_url(parse_qs(parsed.query).get('url', [''])[0])
+            if not cleaned_url or not is_valid_youtube_url(cleaned_url) or is_playlist_url(cleaned_url):
+                self.send_json(400, {'error': 'Ungültige URL. Vorschau nur für einzelne YouTube-Videos.'})
+                return
+            try:
+                data, error = get_preview_clip(cleaned_url, self.client_ip())
+            except PreviewQuotaExceeded as e:
+                self.send_json(429, {'error': str(e)})
+                return
+            if not data:
+                self.send_json(422 if classify_download_error(error) == 'permanent' else 503, {'error': error})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Cache-Control', f"max-age={PREVIEW_CACHE_TTL_SECONDS}")
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        
+        match = re.fullmatch(r'/api/jobs/([0-9a-f]{32})(/result(?:/(\d+))?)?', path)
+        if not match:
+            self.send_json(404, {'error': 'Unbekannter Endpunkt'})
+            return
+        if not self.check_api_access():
+            return
+        
+        job = get_api_job(match.group(1))
+        if not job:
+            self.send_json(404, {'error': 'Job nicht gefunden'})
+        elif not match.group(2):
+            self.send_json(200, api_job_to_json(job))
+        elif job['status'] != 'done':
+            self.send_json(409, {'error': 'Job noch nicht fertig', 'status': job['status']})
+        else:
+            self.send_result_file(job, int(match.group(3)) if match.group(3) else None)
+    
+    def do_DELETE(self):
+        path = urlparse(self.path).path.rstrip('/')
+        match = re.fullmatch(r'/api/jobs/([0-9a-f]{32})', path)
+        if not match:
+            self.send_json(404, {'error': 'Unbekannter Endpunkt'})
+            return
+        if not self.check_api_access():
+            return
+        job = cancel_api_job(match.group(1))
+        if not job:
+            self.send_json(404, {'error': 'Job nicht gefunden'})
+            return
+        self.send_json(202 if job['status'] in ('queued', 'running') else 200, api_job_to_json(job))
+    
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/')
+        if path in ('/api/admin/config', '/api/admin/config/reload'):
+            # Limits ohne Neustart ändern; laufende Jobs arbeiten weiter
+            if not self.check_admin():
+                return
+            if path.endswith('/reload'):
+                changes, errors = reload_runtime_config()
+            else:
+                payload = self.read_json_body()
+                if payload is None:
+                    return
+                changes, errors = set_runtime_overrides(payload)
+            if errors:
+                self.send_json(400, {'error': 'Konfiguration abgelehnt', 'details': errors})
+                return
+            self.send_json(200, {'changed': changes, **describe_runtime_config()})
+            return
+        if path != '/api/jobs':
+            self.send_json(404, {'error': 'Unbekannter Endpunkt'})
+            return
+        if not self.check_api_access():
+            return
+        
+        payload = self.read_json_body()
+        if payload is None:
+            return
+        
+        # Gezieltes Profiling schaltet u. a. tracemalloc prozessweit ein - nur für Admins
+        profile = None
+        if self.is_admin():
+            profile = self.headers.get('X-Profile') or parse_qs(parsed.query).get('profile', [None])[0]
+        job, error = submit_api_job(
+            payload.get('url'),
+            payload.get('tracks'),
+            client_ip=self.client_ip(),
+            start=payload.get('start'),
+            end=payload.get('end'),
+            profile=profile
+        )
+        if error:
+            self.send_json(error[0], {'error': error[1]})
+            return
+        
+        self.send_json(202, api_job_to_json(job), {'Location': f"/api/jobs/{job['id']}"})
+
+def create_api_server(host=API_HOST, port=API_PORT):
+    """Erzeuge den HTTP-Server der JSON-API"""
+    return ThreadingHTTPServer((host, port), ApiRequestHandler)
+
+@st.cache_resource(show_spinner=False)
+def start_api_server(host=API_HOST, port=API_PORT):
+    """Starte die JSON-API einmal pro Prozess neben der Streamlit-UI"""
+    try:
+        server = create_api_server(host, port)
+    except OSError as e:
+        print(f"⚠️  JSON-API konnte nicht gestartet werden ({host}:{port}): {str(e)}")
+        return None
+    
+    threading.Thread(target=server.serve_forever, name='api-server', daemon=True).start()
+    print(f"🔌 JSON-API läuft auf http://{host}:{port}/api/jobs")
+    return server
 
 def run_server():
     """Starte den Server auf Port 8080"""
@@ -2483,6 +6779,28 @@ def run_server():
     print("🔄 Server starting...")
 
 if __name__ == "__main__":
+    # Headless-Batchmodus: python main.py batch [URLs...] [-i datei] [-o ordner] [-w worker]
+    if len(sys.argv) > 1 and sys.argv[1] in ('batch', 'worker', 'api'):
+        install_config_reload_signal()
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(run_batch_cli(sys.argv[2:]))
+    
+    # Worker für den verteilten Modus: python main.py worker [-c parallele_jobs]
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        sys.exit(run_worker_cli(sys.argv[2:]))
+    
+    # Nur JSON-API ohne UI: python main.py api [port] [host]
+    if len(sys.argv) > 1 and sys.argv[1] == 'api':
+        api_port = int(sys.argv[2]) if len(sys.argv) > 2 else API_PORT
+        api_host = sys.argv[3] if len(sys.argv) > 3 else API_HOST
+        start_housekeeping_scheduler()
+        print(f"🔌 JSON-API läuft auf http://{api_host}:{api_port}/api/jobs")
+        try:
+            create_api_server(api_host, api_port).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    
     # Server-Start-Meldungen
     run_server()
     